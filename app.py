@@ -1,11 +1,46 @@
-from flask import Flask, render_template, request, jsonify  # type: ignore
-from tourism_system import TourismAIAgent
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context  # type: ignore
+from metrics import CONTENT_TYPE, REGISTRY
+from tourism_system import CIRCUIT_BREAKERS, CONFIG, HEDGING, RATE_LIMITER, STRUCTURED_FIELDS, TourismAIAgent
+import json
 import os
 from datetime import datetime
 
 app = Flask(__name__)
 agent = TourismAIAgent()
 
+# Accept header value that selects a structured /chat response (same as ?format=structured)
+STRUCTURED_MEDIA_TYPE = 'application/vnd.tourism+json'
+
+def structured_options(args, accept: str):
+    """(fields, places_limit) for a structured /chat response, or None for the plain text one.
+    
+    args is the query string as a mapping: format=structured|text, fields=weather,places,...
+    and limit=N (top N places). Raises ValueError for values the API does not accept.
+    """
+    mode = args.get('format')
+    if mode not in (None, 'structured', 'text'):
+        raise ValueError("format must be 'structured' or 'text'")
+    structured = mode == 'structured' or (mode is None and STRUCTURED_MEDIA_TYPE in (accept or ''))
+    if not structured:
+        return None
+    
+    fields = None
+    if args.get('fields'):
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in STRUCTURED_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"fields must be a comma-separated subset of {', '.join(STRUCTURED_FIELDS)}")
+    
+    limit = None
+    if args.get('limit') is not None:
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            limit = -1
+        if limit < 0:
+            raise ValueError('limit must be a non-negative integer')
+    return fields, limit
+
 @app.route('/')
 def home():
     return '''
@@ -458,6 +493,7 @@ def home():
                 
                 chat.appendChild(messageDiv);
                 scrollToBottom();
+                return messageDiv.querySelector('.message-bubble');
             }
             
             function formatMessage(message) {
@@ -494,18 +530,17 @@ def home():
                 showTypingIndicator();
                 
                 try {
-                    const response = await fetch('/chat', {
+                    const response = await fetch('/chat/stream', {
                         method: 'POST',
                         headers: { 'Content-Type': 'application/json' },
                         body: JSON.stringify({ message: message })
                     });
                     
-                    const data = await response.json();
-                    
-                    if (data.error) {
-                        addMessage('❌ ' + data.error);
+                    if (!response.ok || !response.body) {
+                        const data = await response.json();
+                        addMessage(data.error ? '❌ ' + data.error : data.response);
                     } else {
-                        addMessage(data.response);
+                        await readStream(response.body);
                     }
                 } catch (error) {
                     addMessage('❌ Error: Unable to connect to server. Please try again.');
@@ -516,6 +551,55 @@ def home():
                 }
             }
             
+            async function readStream(body) {
+                // One JSON event per line; agent results are shown as they arrive,
+                // then replaced by the final combined response
+                const reader = body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                let bubble = null;
+                let parts = [];
+                let remaining = 0;
+                
+                const render = (text) => {
+                    if (bubble) {
+                        bubble.innerHTML = formatMessage(text);
+                        scrollToBottom();
+                    } else {
+                        bubble = addMessage(text);
+                    }
+                };
+                
+                const handle = (event) => {
+                    if (event.type === 'start') {
+                        remaining = event.agents.length;
+                    } else if (event.type === 'weather' || event.type === 'places') {
+                        removeTypingIndicator();
+                        parts.push(event.text);
+                        remaining -= 1;
+                        render(parts.join('\\n\\n'));
+                        if (remaining > 0) showTypingIndicator();
+                    } else if (event.type === 'response') {
+                        removeTypingIndicator();
+                        render(event.text);
+                    } else if (event.type === 'error') {
+                        removeTypingIndicator();
+                        render('❌ ' + event.error);
+                    }
+                };
+                
+                while (true) {
+                    const { done, value } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+                    const lines = buffer.split('\\n');
+                    buffer = lines.pop();
+                    lines.filter(line => line.trim()).forEach(line => handle(JSON.parse(line)));
+                }
+                if (buffer.trim()) handle(JSON.parse(buffer));
+                if (!bubble) addMessage('❌ Error: Empty response from server. Please try again.');
+            }
+            
             function sendExample(exampleText) {
                 const input = document.getElementById('message');
                 input.value = exampleText;
@@ -543,13 +627,82 @@ def chat():
     user_input = request.json.get('message', '')
     if not user_input:
         return jsonify({'error': 'No message provided'}), 400
+    try:
+        options = structured_options(request.args, request.headers.get('Accept', ''))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
+        if options is not None:
+            fields, limit = options
+            return jsonify(agent.process_structured(user_input, fields, limit))
         response = agent.process_request(user_input)
         return jsonify({'response': response})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """Answer a list of messages in one request; responses come back in input order"""
+    if not isinstance(request.json, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    messages = request.json.get('messages')
+    if not isinstance(messages, list) or not messages:
+        return jsonify({'error': 'No messages provided'}), 400
+    if len(messages) > CONFIG['BATCH_MAX_MESSAGES']:
+        return jsonify({'error': f"At most {CONFIG['BATCH_MAX_MESSAGES']} messages per batch"}), 400
+    if not all(isinstance(message, str) and message for message in messages):
+        return jsonify({'error': 'Messages must be non-empty strings'}), 400
+    
+    try:
+        return jsonify({'responses': agent.process_batch(messages)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/chat/explain', methods=['POST'])
+def chat_explain():
+    """Dry run of /chat: the execution plan and the upstream calls it would make, without making them"""
+    user_input = request.json.get('message', '')
+    if not user_input:
+        return jsonify({'error': 'No message provided'}), 400
+    
+    try:
+        return jsonify(agent.explain(user_input))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Newline-delimited JSON events: each agent's result as soon as it is ready, then the full response"""
+    user_input = request.json.get('message', '')
+    if not user_input:
+        return jsonify({'error': 'No message provided'}), 400
+    
+    def generate():
+        try:
+            for event in agent.stream_request(user_input):
+                yield json.dumps(event) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+    
+    # X-Accel-Buffering stops nginx-style proxies from holding the chunks back
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint: stage and upstream latency histograms, status codes, cache hit rates"""
+    return Response(REGISTRY.render(), mimetype=CONTENT_TYPE)
+
+@app.route('/upstreams')
+def upstreams():
+    """Per-host circuit breaker state, Overpass hedging counters and rate-limit waits"""
+    return jsonify({
+        'circuit_breakers': CIRCUIT_BREAKERS.stats(),
+        'hedging': HEDGING.stats(),
+        'rate_limits': RATE_LIMITER.stats()
+    })
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
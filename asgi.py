@@ -0,0 +1,121 @@
+"""ASGI entry point: /chat and /chat/stream are served by the async agents, everything else by the Flask app.
+
+Run with:  uvicorn asgi:app --host 0.0.0.0 --port $PORT
+       or  gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+"""
+import json
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app as flask_app, structured_options
+from async_tourism_system import AsyncTourismAIAgent
+
+agent = AsyncTourismAIAgent()
+wsgi_app = WsgiToAsgi(flask_app)
+
+
+async def _read_body(receive) -> bytes:
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return body
+
+
+async def _send_json(send, payload, status: int = 200):
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _read_message(receive, send) -> str:
+    """The chat message from the request body; sends a 400 and returns '' if there is none"""
+    try:
+        user_input = json.loads(await _read_body(receive) or b'{}').get('message', '')
+    except (ValueError, AttributeError):
+        await _send_json(send, {'error': 'Invalid JSON body'}, 400)
+        return ''
+    if not user_input:
+        await _send_json(send, {'error': 'No message provided'}, 400)
+    return user_input
+
+
+def _structured_options(scope):
+    """structured_options() for an ASGI scope; the first value wins for repeated query parameters, as in Flask"""
+    args = dict(reversed(parse_qsl(scope.get('query_string', b'').decode('latin-1'))))
+    accept = b', '.join(value for name, value in scope.get('headers', []) if name.lower() == b'accept')
+    return structured_options(args, accept.decode('latin-1'))
+
+
+async def chat(scope, receive, send):
+    user_input = await _read_message(receive, send)
+    if not user_input:
+        return
+    try:
+        options = _structured_options(scope)
+    except ValueError as e:
+        await _send_json(send, {'error': str(e)}, 400)
+        return
+
+    try:
+        if options is not None:
+            fields, limit = options
+            await _send_json(send, await agent.process_structured(user_input, fields, limit))
+            return
+        response = await agent.process_request(user_input)
+        await _send_json(send, {'response': response})
+    except Exception as e:
+        await _send_json(send, {'error': str(e)}, 500)
+
+
+async def chat_stream(scope, receive, send):
+    """Newline-delimited JSON events: each agent's result as soon as it is ready, then the full response"""
+    user_input = await _read_message(receive, send)
+    if not user_input:
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'application/x-ndjson'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no')]
+    })
+    try:
+        async for event in agent.stream_request(user_input):
+            await send({'type': 'http.response.body', 'body': (json.dumps(event) + '\n').encode('utf-8'),
+                        'more_body': True})
+    except Exception as e:
+        await send({'type': 'http.response.body', 'body': (json.dumps({'type': 'error', 'error': str(e)}) + '\n').encode('utf-8'),
+                    'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await agent.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(scope, receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/chat' and scope['method'] == 'POST':
+        await chat(scope, receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/chat/stream' and scope['method'] == 'POST':
+        await chat_stream(scope, receive, send)
+    else:
+        await wsgi_app(scope, receive, send)
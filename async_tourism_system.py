@@ -0,0 +1,493 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+import httpx
+
+from batcher import AsyncMicroBatcher
+from cache import MISS, AsyncBackgroundRefresher, normalize_key
+from http_client import AsyncHTTPClient
+from metrics import STAGE_SECONDS
+from overpass import OverpassElementStream
+from records import Attraction, Coordinates, CurrentWeather, PlacesResult, WeatherResult
+from singleflight import AsyncSingleFlight
+from tourism_system import (CIRCUIT_BREAKERS, CONFIG, HEDGING, RATE_LIMITER, UNFINISHED, GeocodingService,
+                            PlacesAgent, TourismAIAgent, WeatherAgent, _PlaceRanking, logger)
+
+# One pooled async client per process; it shares the per-host rate limits with the sync agents
+ASYNC_HTTP_CLIENT = AsyncHTTPClient(RATE_LIMITER,
+                                    pool_maxsize=CONFIG['HTTP_POOL_MAXSIZE'],
+                                    retries=CONFIG['HTTP_RETRIES'],
+                                    backoff_factor=CONFIG['HTTP_BACKOFF'],
+                                    breakers=CIRCUIT_BREAKERS,
+                                    hedging=HEDGING)
+
+ASYNC_SINGLE_FLIGHT = AsyncSingleFlight()
+
+ASYNC_WEATHER_REFRESHER = AsyncBackgroundRefresher()
+
+
+async def _map_bounded(fn, items: List, workers: int, deadline: Optional[float] = None) -> List:
+    """asyncio counterpart of tourism_system._map_bounded: coroutine fn over items, at most `workers` at a time.
+
+    Items not done by deadline are UNFINISHED; calls already running carry on and still fill the caches,
+    calls not started yet are cancelled.
+    """
+    if not items:
+        return []
+    semaphore = asyncio.Semaphore(max(1, workers))
+    started = set()
+
+    async def run(index: int, item):
+        async with semaphore:
+            started.add(index)
+            return await fn(item)
+
+    tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(items)]
+    await asyncio.wait(tasks, timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+    for i, task in enumerate(tasks):
+        if not task.done() and i not in started:
+            task.cancel()
+    return [task.result() if task.done() and not task.cancelled() else UNFINISHED for task in tasks]
+
+
+class AsyncGeocodingService(GeocodingService):
+    """Non-blocking variant of GeocodingService"""
+
+    def __init__(self):
+        super().__init__()
+        self.async_http = ASYNC_HTTP_CLIENT
+        self.async_single_flight = ASYNC_SINGLE_FLIGHT
+
+    async def get_coordinates(self, place: str) -> Optional[Coordinates]:
+        """Get latitude and longitude for a place"""
+        _, cached = await self.aprobe(place)
+        if cached is not MISS:
+            return cached
+
+        key = normalize_key(place)
+        return await self.async_single_flight.do(f"geocode:{key}", lambda: self._lookup(place, key))
+
+    async def aprobe(self, place: str) -> Tuple[Optional[str], Any]:
+        """probe() without blocking the event loop on the shared cache tier"""
+        local = self._from_gazetteer(place)
+        if local:
+            return 'gazetteer', local
+        cached = self._cached(place, await self.cache.aget(normalize_key(place)))
+        return (None, MISS) if cached is MISS else ('cache', cached)
+
+    async def _lookup(self, place: str, key: str) -> Optional[Coordinates]:
+        """Ask Nominatim for a place and cache the answer"""
+        try:
+            response = await self.async_http.get(CONFIG['NOMINATIM_URL'], params=self._build_params(place), timeout=10)
+            response.raise_for_status()
+            coordinates, ttl = self._parse(place, response.json())
+            await self.cache.aset(key, coordinates, ttl)
+            return coordinates
+
+        except httpx.HTTPError as e:
+            logger.warning("Geocoding error: %s", e)
+            return None
+        except (KeyError, ValueError) as e:
+            logger.warning("Data parsing error: %s", e)
+            return None
+
+
+class AsyncWeatherAgent(WeatherAgent):
+    """Non-blocking variant of WeatherAgent"""
+
+    def __init__(self):
+        super().__init__()
+        self.async_http = ASYNC_HTTP_CLIENT
+        self.async_single_flight = ASYNC_SINGLE_FLIGHT
+
+    async def make_request(self, url: str, params: Dict) -> Optional[Dict]:
+        """Make HTTP request with rate limiting"""
+        try:
+            response = await self.async_http.get(url, params=params, timeout=10)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            logger.warning("Request error for %s: %s", url, e)
+            return None
+
+    async def execute(self, place: str, coordinates: Tuple[float, float]) -> WeatherResult:
+        """Get current weather and forecast"""
+        with STAGE_SECONDS.time('weather'):
+            return WeatherResult(place, await self.get_weather(coordinates))
+
+    async def execute_uncached(self, place: str, coordinates: Tuple[float, float]) -> WeatherResult:
+        """execute() for coordinates that probe() found no cached weather for"""
+        with STAGE_SECONDS.time('weather'):
+            return WeatherResult(place, await self._load(self._cache_key(coordinates), coordinates))
+
+    async def get_weather(self, coordinates: Tuple[float, float]) -> Optional[CurrentWeather]:
+        """Current weather for one location, cached per grid cell until the next model update"""
+        key = self._cache_key(coordinates)
+        _, cached = await self.aprobe(coordinates)
+        if cached is not MISS:
+            return cached
+        return await self._load(key, coordinates)
+
+    async def aprobe(self, coordinates: Tuple[float, float]) -> Tuple[Optional[str], Any]:
+        """probe() without blocking the event loop on the shared cache tier"""
+        key = self._cache_key(coordinates)
+        return self._probe_entry(key, coordinates, await self.cache.aget(key))
+
+    async def _load(self, key: str, coordinates: Tuple[float, float]) -> Optional[CurrentWeather]:
+        return await self.async_single_flight.do(f"weather:{key}", lambda: self._fetch_and_cache(key, coordinates))
+
+    async def get_weather_many(self, coordinates: List[Tuple[float, float]]) -> List[Optional[CurrentWeather]]:
+        """Like get_weather for many locations; cache misses are fetched in multi-location calls"""
+        keys = [self._cache_key(coords) for coords in coordinates]
+        entries = await asyncio.gather(*(self.cache.aget(key) for key in keys))
+        results = [self._probe_entry(key, coords, entry)[1] for key, coords, entry in zip(keys, coordinates, entries)]
+        missing = [i for i, result in enumerate(results) if result is MISS]
+        for i, data in zip(missing, await self.fetch_many([coordinates[i] for i in missing])):
+            results[i] = await self._store(keys[i], data)
+        return results
+
+    async def execute_many(self, targets: List[Tuple[str, Tuple[float, float]]]) -> List[WeatherResult]:
+        """Weather for many (place, coordinates) pairs, fetched in multi-location calls"""
+        coordinates = list(dict.fromkeys(coords for _, coords in targets))
+        weather = dict(zip(coordinates, await self.get_weather_many(coordinates)))
+        return [WeatherResult(place, weather[coords]) for place, coords in targets]
+
+    async def _fetch_and_cache(self, key: str, coordinates: Tuple[float, float]) -> Optional[CurrentWeather]:
+        return await self._store(key, await self.fetch(coordinates))
+
+    async def _store(self, key: str, data: Optional[Dict]) -> Optional[CurrentWeather]:
+        """Parse an Open-Meteo answer and cache it until the next model update (plus the stale window)"""
+        parsed = self._parse(data)
+        if parsed is None:
+            return None
+        entry, ttl = parsed
+        await self.cache.aset(key, entry, ttl)
+        return entry['weather']
+
+    def _revalidate(self, key: str, coordinates: Tuple[float, float]):
+        ASYNC_WEATHER_REFRESHER.submit(key, lambda: self.async_single_flight.do(
+            f"weather:{key}", lambda: self._fetch_and_cache(key, coordinates)))
+
+    async def fetch(self, coordinates: Tuple[float, float]) -> Optional[Dict]:
+        """Open-Meteo data for one location, micro-batched with concurrent lookups when enabled"""
+        if CONFIG['WEATHER_BATCH_WINDOW'] > 0:
+            return await ASYNC_WEATHER_BATCHER.call(coordinates)
+        return await self.make_request(CONFIG['OPENMETEO_URL'], self._build_params(coordinates))
+
+    async def fetch_many(self, coordinates: List[Tuple[float, float]]) -> List[Optional[Dict]]:
+        """Open-Meteo data for each coordinate pair, WEATHER_BATCH_SIZE locations per request"""
+        size = max(1, CONFIG['WEATHER_BATCH_SIZE'])
+        chunks = [coordinates[start:start + size] for start in range(0, len(coordinates), size)]
+        responses = await asyncio.gather(*(self.make_request(CONFIG['OPENMETEO_URL'], self._build_params(*chunk))
+                                           for chunk in chunks))
+        results = []
+        for chunk, data in zip(chunks, responses):
+            # One location comes back as an object, several as a list in request order
+            if isinstance(data, dict):
+                data = [data]
+            if not isinstance(data, list) or len(data) != len(chunk):
+                data = [None] * len(chunk)
+            results.extend(data)
+        return results
+
+
+ASYNC_WEATHER_BATCHER = AsyncMicroBatcher(lambda coordinates: AsyncWeatherAgent().fetch_many(coordinates),
+                                          window=CONFIG['WEATHER_BATCH_WINDOW'],
+                                          max_size=CONFIG['WEATHER_BATCH_SIZE'])
+
+
+class AsyncPlacesAgent(PlacesAgent):
+    """Non-blocking variant of PlacesAgent"""
+
+    def __init__(self):
+        super().__init__()
+        self.async_http = ASYNC_HTTP_CLIENT
+        self.async_single_flight = ASYNC_SINGLE_FLIGHT
+
+    async def execute(self, place: str, coordinates: Tuple[float, float],
+                      categories: Optional[Tuple[str, ...]] = None) -> PlacesResult:
+        """Get tourist attractions using Overpass API"""
+        try:
+            return PlacesResult(place, await self.get_places(coordinates, categories))
+        except httpx.HTTPError as e:
+            return PlacesResult(place, error=f"Error fetching places data: {e}")
+        except Exception as e:
+            return PlacesResult(place, error=f"Error processing places data: {e}")
+
+    async def execute_uncached(self, place: str, coordinates: Tuple[float, float],
+                               categories: Optional[Tuple[str, ...]] = None) -> PlacesResult:
+        """execute() for coordinates that probe() found no precomputed or cached places for"""
+        try:
+            return PlacesResult(place, await self._load(self._cache_key(coordinates, categories), coordinates,
+                                                        categories))
+        except httpx.HTTPError as e:
+            return PlacesResult(place, error=f"Error fetching places data: {e}")
+        except Exception as e:
+            return PlacesResult(place, error=f"Error processing places data: {e}")
+
+    async def get_places(self, coordinates: Tuple[float, float],
+                         categories: Optional[Tuple[str, ...]] = None) -> List[Attraction]:
+        """Ranked attraction names around coordinates: precomputed tile, else cached, else fetched"""
+        key = self._cache_key(coordinates, categories)
+        _, cached = await self._aprobe(key)
+        if cached is not MISS:
+            return cached
+        return await self._load(key, coordinates, categories)
+
+    async def aprobe(self, coordinates: Tuple[float, float],
+                     categories: Optional[Tuple[str, ...]] = None) -> Tuple[Optional[str], Any]:
+        """probe() without blocking the event loop on the shared cache tier"""
+        return await self._aprobe(self._cache_key(coordinates, categories))
+
+    async def _aprobe(self, key: str) -> Tuple[Optional[str], Any]:
+        # Tiles are a local memory map, cheap enough to read inline
+        precomputed = self._from_tiles(key)
+        if precomputed is not None:
+            return 'tiles', precomputed
+        cached = await self.cache.aget(key)
+        return (None, MISS) if cached is MISS else ('cache', cached)
+
+    async def _load(self, key: str, coordinates: Tuple[float, float],
+                    categories: Optional[Tuple[str, ...]] = None) -> List[Attraction]:
+        return await self.async_single_flight.do(f"places:{key}",
+                                                 lambda: self._fetch_and_cache(key, coordinates, categories))
+
+    async def _fetch_and_cache(self, key: str, coordinates: Tuple[float, float],
+                               categories: Optional[Tuple[str, ...]] = None) -> List[Attraction]:
+        lat, lon = coordinates
+        places = self._from_index(coordinates, categories)
+        if places is None:
+            places = await self._fetch_places(lat, lon, categories)
+        await self.cache.aset(key, places, CONFIG['PLACES_CACHE_TTL'])
+        return places
+
+    async def _fetch_places(self, lat: float, lon: float,
+                            categories: Optional[Tuple[str, ...]] = None) -> List[Attraction]:
+        """Query Overpass and rank the results"""
+        streaming = CONFIG['OVERPASS_STREAMING']
+        with STAGE_SECONDS.time('places_fetch'):
+            response = await self.async_http.post(CONFIG['OVERPASS_URL'],
+                                                  data={'data': self._build_query(lat, lon, categories)},
+                                                  timeout=CONFIG['OVERPASS_TIMEOUT'],
+                                                  stream=streaming,
+                                                  mirrors=CONFIG['OVERPASS_MIRRORS'])
+        try:
+            with STAGE_SECONDS.time('places_parse'):
+                response.raise_for_status()
+                if not streaming:
+                    return self._extract_place_names(response.json())
+                parser = OverpassElementStream()
+                ranking = _PlaceRanking(self._get_english_name)
+                async for chunk in response.aiter_bytes(CONFIG['OVERPASS_CHUNK_SIZE']):
+                    for element in parser.feed(chunk):
+                        ranking.add(element)
+                parser.close()
+                return ranking.top()
+        finally:
+            await response.aclose()
+
+
+class AsyncTourismAIAgent(TourismAIAgent):
+    """asyncio variant of TourismAIAgent for ASGI serving; process_request is a coroutine"""
+
+    def __init__(self):
+        # No thread pool: agents run as concurrent tasks on the event loop
+        self.geocoding_service = AsyncGeocodingService()
+        self.weather_agent = AsyncWeatherAgent()
+        self.places_agent = AsyncPlacesAgent()
+
+    async def process_request(self, user_input: str) -> str:
+        """Main method to process user request"""
+        reply, plan = await self._prepare(user_input)
+        if reply:
+            return reply
+
+        weather_result, places_result = await self._run_agents(plan['place'], plan['coordinates'], plan['run_weather'],
+                                                               plan['run_places'], plan['categories'])
+
+        with STAGE_SECONDS.time('format'):
+            return self._format_response(plan['place'], plan['intent'], weather_result, places_result)
+
+    async def stream_request(self, user_input: str) -> AsyncIterator[Dict]:
+        """Like process_request, but yields each agent's result as soon as it is ready"""
+        reply, plan = await self._prepare(user_input)
+        if reply:
+            yield {'type': 'response', 'text': reply}
+            return
+
+        agents = [agent for agent, selected in (('weather', plan['run_weather']), ('places', plan['run_places']))
+                  if selected]
+        yield {'type': 'start', 'place': plan['place'], 'agents': agents}
+
+        results = {}
+        async for agent, result in self._iter_agents(plan['place'], plan['coordinates'], plan['run_weather'],
+                                                     plan['run_places'], plan['categories']):
+            results[agent] = result
+            yield {'type': agent, 'text': self._format_result(result)}
+
+        with STAGE_SECONDS.time('format'):
+            text = self._format_response(plan['place'], plan['intent'], results.get('weather'), results.get('places'))
+        yield {'type': 'response', 'text': text}
+
+    async def process_structured(self, user_input: str, fields: Optional[Iterable[str]] = None,
+                                 places_limit: Optional[int] = None) -> Dict:
+        """Like process_request, but returns the agents' typed results as a JSON-ready dict"""
+        reply, plan = await self._prepare(user_input)
+        if reply:
+            return self._structured_reply(reply, fields)
+
+        run_weather, run_places = self._structured_agents(plan, fields)
+        weather_result, places_result = await self._run_agents(plan['place'], plan['coordinates'], run_weather,
+                                                               run_places, plan['categories'])
+
+        with STAGE_SECONDS.time('format'):
+            return self._structured_payload(plan, fields, places_limit, weather_result, places_result)
+
+    async def explain(self, user_input: str) -> Dict:
+        """Dry run of process_request; see TourismAIAgent.explain.
+
+        The dry-run probes read the shared cache tier, so they run in a worker thread.
+        """
+        return await asyncio.to_thread(super().explain, user_input)
+
+    async def process_batch(self, messages: List[str]) -> List[str]:
+        """Answer many messages at once, returning responses in input order; see TourismAIAgent.process_batch"""
+        logger.debug("Processing batch of %d messages", len(messages))
+        deadline = time.monotonic() + CONFIG['BATCH_DEADLINE']
+        places = [self.extract_place(message) for message in messages]
+
+        unique_places = {}
+        for place in places:
+            if place:
+                unique_places.setdefault(normalize_key(place), place)
+        geocoded = dict(zip(unique_places, await _map_bounded(self.geocoding_service.get_coordinates,
+                                                              list(unique_places.values()),
+                                                              CONFIG['BATCH_GEOCODE_WORKERS'], deadline)))
+        replies, plans = self._batch_plans(messages, places, geocoded)
+
+        weather_coordinates = list(dict.fromkeys(plan['coordinates'] for plan in plans if plan and plan['run_weather']))
+        fetched = await _map_bounded(self.weather_agent.get_weather_many,
+                                     [weather_coordinates] if weather_coordinates else [], 1, deadline)
+        if fetched and fetched[0] is not UNFINISHED:
+            weather = dict(zip(weather_coordinates, fetched[0]))
+        else:
+            weather = dict.fromkeys(weather_coordinates, UNFINISHED)
+
+        places_jobs = list(dict.fromkeys((plan['coordinates'], plan['categories'])
+                                         for plan in plans if plan and plan['run_places']))
+        found = dict(zip(places_jobs, await _map_bounded(self._get_places_or_error, places_jobs,
+                                                         CONFIG['BATCH_PLACES_WORKERS'], deadline)))
+        return self._batch_replies(replies, plans, weather, found)
+
+    async def _get_places_or_error(self, job: Tuple[Tuple[float, float], Optional[Tuple[str, ...]]]):
+        """Places for one batch job; errors are returned so one failure does not sink the batch"""
+        coordinates, categories = job
+        try:
+            return await self.places_agent.get_places(coordinates, categories)
+        except Exception as e:
+            return e
+
+    async def _prepare(self, user_input: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """Resolve place, coordinates and intent; returns (early reply, None) or (None, plan)"""
+        logger.debug("Processing: %s", user_input)
+
+        with STAGE_SECONDS.time('extract_place'):
+            place = self.extract_place(user_input)
+
+        if not place:
+            return "I couldn't determine which place you're interested in. Please specify a location like 'Paris' or 'What to see in London?'", None
+
+        logger.debug("Identified place: %s", place)
+
+        plan = self._plan(user_input, place)
+
+        with STAGE_SECONDS.time('geocode'):
+            coordinates = await self.geocoding_service.get_coordinates(place)
+
+        if not coordinates:
+            return f"It doesn't know this place exist.", None
+
+        plan['coordinates'] = coordinates
+        return None, plan
+
+    async def _run_agents(self, place: str, coordinates: Tuple[float, float], run_weather: bool, run_places: bool,
+                          categories: Optional[Tuple[str, ...]] = None
+                          ) -> Tuple[Optional[WeatherResult], Optional[PlacesResult]]:
+        """Run the selected agents as concurrent tasks, each bounded by its deadline"""
+        results = {}
+        async for agent, result in self._iter_agents(place, coordinates, run_weather, run_places, categories):
+            results[agent] = result
+        return results.get('weather'), results.get('places')
+
+    async def _iter_agents(self, place: str, coordinates: Tuple[float, float], run_weather: bool, run_places: bool,
+                           categories: Optional[Tuple[str, ...]] = None
+                           ) -> AsyncIterator[Tuple[str, Union[WeatherResult, PlacesResult]]]:
+        """Yield (agent, result) as each selected agent finishes or misses its deadline.
+
+        Agents whose answer is already cached are answered inline; only the others become tasks.
+        """
+        uncached = []
+        for agent, result in await self._cached_results(place, coordinates, run_weather, run_places, categories):
+            if result is None:
+                uncached.append(agent)
+            else:
+                yield agent, result
+
+        started = time.monotonic()
+        pending = {}
+        if 'weather' in uncached:
+            logger.debug("Fetching weather data")
+            pending[asyncio.ensure_future(self.weather_agent.execute_uncached(place, coordinates))] = 'weather'
+        if 'places' in uncached:
+            logger.debug("Fetching tourist places")
+            pending[asyncio.ensure_future(self.places_agent.execute_uncached(place, coordinates,
+                                                                             categories))] = 'places'
+        deadlines = {'weather': started + CONFIG['WEATHER_DEADLINE'], 'places': started + CONFIG['PLACES_DEADLINE']}
+
+        while pending:
+            next_deadline = min(deadlines[agent] for agent in pending.values())
+            # wait() does not cancel the tasks, so a late agent still finishes and fills the cache
+            done, _ = await asyncio.wait(pending, timeout=max(0.0, next_deadline - time.monotonic()),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            now = time.monotonic()
+            for task in list(pending):
+                agent = pending[task]
+                if task in done or deadlines[agent] <= now:
+                    del pending[task]
+                    yield agent, await self._wait_for(task, now, agent, place)
+
+    async def _cached_results(self, place: str, coordinates: Tuple[float, float], run_weather: bool,
+                              run_places: bool, categories: Optional[Tuple[str, ...]] = None
+                              ) -> List[Tuple[str, Union[WeatherResult, PlacesResult, None]]]:
+        """(agent, result) for each selected agent, with None for those whose answer is not cached"""
+        results = []
+        if run_weather:
+            started = time.perf_counter()
+            _, weather = await self.weather_agent.aprobe(coordinates)
+            if weather is MISS:
+                results.append(('weather', None))
+            else:
+                STAGE_SECONDS.observe(time.perf_counter() - started, 'weather')
+                results.append(('weather', WeatherResult(place, weather)))
+        if run_places:
+            _, attractions = await self.places_agent.aprobe(coordinates, categories)
+            results.append(('places', None if attractions is MISS else PlacesResult(place, attractions)))
+        return results
+
+    async def _wait_for(self, task: asyncio.Future, deadline: float, agent: str,
+                        place: str) -> Union[WeatherResult, PlacesResult]:
+        """Wait for an agent until its deadline, returning a fallback message if it misses it"""
+        try:
+            # shield() lets a late agent finish and fill the cache for the next request
+            return await asyncio.wait_for(asyncio.shield(task), timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            timeout_message = self._timeout_message(agent, place)
+            logger.info("%s", timeout_message)
+            return self._error_result(agent, place, timeout_message)
+        except Exception as e:
+            return self._error_result(agent, place, f"Error running agent: {e}")
+
+    async def aclose(self):
+        await ASYNC_HTTP_CLIENT.aclose()
+
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class _Batch:
+    __slots__ = ('items', 'slots', 'event', 'results', 'error')
+
+    def __init__(self):
+        self.items: List[Hashable] = []
+        self.slots: Dict[Hashable, int] = {}
+        self.event = threading.Event()
+        self.results: List[Any] = []
+        self.error: Optional[BaseException] = None
+
+    def add(self, item: Hashable) -> int:
+        slot = self.slots.get(item)
+        if slot is None:
+            slot = self.slots[item] = len(self.items)
+            self.items.append(item)
+        return slot
+
+
+class MicroBatcher:
+    """Collect concurrent calls for a short window and serve them with one bulk call.
+
+    The first caller of a batch waits up to `window` seconds (less if the batch fills up) for
+    others to join, then calls fn_many with the distinct items in arrival order; fn_many must
+    return one result per item. Every caller gets the result for its own item.
+    """
+
+    def __init__(self, fn_many: Callable[[List[Hashable]], List[Any]], window: float = 0.01, max_size: int = 50):
+        self.fn_many = fn_many
+        self.window = window
+        self.max_size = max_size
+        self.cond = threading.Condition()
+        self._batch: Optional[_Batch] = None
+        self.counters = {'calls': 0, 'batches': 0, 'items': 0}
+
+    def call(self, item: Hashable) -> Any:
+        with self.cond:
+            self.counters['calls'] += 1
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch()
+            slot = batch.add(item)
+            if len(batch.items) >= self.max_size:
+                # Full: close it now and wake the leader
+                self._batch = None
+                self.cond.notify_all()
+
+        if leader:
+            self._run(batch)
+        else:
+            batch.event.wait()
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[slot]
+
+    def _run(self, batch: _Batch):
+        with self.cond:
+            self.cond.wait_for(lambda: self._batch is not batch, timeout=self.window)
+            if self._batch is batch:
+                self._batch = None
+            self.counters['batches'] += 1
+            self.counters['items'] += len(batch.items)
+        try:
+            batch.results = self.fn_many(batch.items)
+        except BaseException as e:
+            batch.error = e
+        finally:
+            batch.event.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self.cond:
+            return dict(self.counters)
+
+
+class AsyncMicroBatcher:
+    """asyncio counterpart of MicroBatcher; fn_many is a coroutine function"""
+
+    def __init__(self, fn_many: Callable[[List[Hashable]], Any], window: float = 0.01, max_size: int = 50):
+        self.fn_many = fn_many
+        self.window = window
+        self.max_size = max_size
+        self._items: List[Hashable] = []
+        self._slots: Dict[Hashable, int] = {}
+        self._future: Optional[asyncio.Future] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.counters = {'calls': 0, 'batches': 0, 'items': 0}
+
+    async def call(self, item: Hashable) -> Any:
+        self.counters['calls'] += 1
+        if self._future is None:
+            loop = asyncio.get_running_loop()
+            self._future = loop.create_future()
+            self._timer = loop.call_later(self.window, self._flush)
+        future = self._future
+        slot = self._slots.get(item)
+        if slot is None:
+            slot = self._slots[item] = len(self._items)
+            self._items.append(item)
+        if len(self._items) >= self.max_size:
+            self._flush()
+        # shield() so one cancelled caller does not cancel the shared call
+        results = await asyncio.shield(future)
+        return results[slot]
+
+    def _flush(self):
+        if self._future is None:
+            return
+        self._timer.cancel()
+        items, future = self._items, self._future
+        self._items, self._slots, self._future, self._timer = [], {}, None, None
+        self.counters['batches'] += 1
+        self.counters['items'] += len(items)
+        task = asyncio.ensure_future(self.fn_many(items))
+        task.add_done_callback(lambda done: _resolve(future, done))
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counters)
+
+
+def _resolve(future: asyncio.Future, task: asyncio.Future):
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
@@ -0,0 +1,93 @@
+"""Benchmark the cache tiers: get/set latency, entry size and memory per backend.
+
+    python benchmarks/bench_cache_backends.py                       # LRU, SQLite file, embedded fake Redis
+    python benchmarks/bench_cache_backends.py --redis redis://localhost:6379/0
+
+Entries are shaped like what the agents store (coordinates, weather payloads, ranked place lists).
+Memory is the traced Python allocation growth while filling the backend, which for the embedded
+fake Redis includes the server's own store; for SQLite it is the size of the database file.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import LRUCache, RedisCache, SQLiteCache, encode_value, msgpack  # noqa: E402
+from fake_redis import FakeRedisServer  # noqa: E402
+
+
+def sample_entries(count: int):
+    entries = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            value = [12.9716 + i / 1e4, 77.5946 - i / 1e4]
+        elif kind == 1:
+            value = {'data': {'latitude': 12.97, 'longitude': 77.59, 'utc_offset_seconds': 19800,
+                              'current': {'time': '2026-10-17T12:15', 'interval': 900, 'temperature_2m': 24.1 + i % 10,
+                                          'precipitation_probability': i % 100, 'weather_code': 3}},
+                     'fresh_until': 1792230300.0 + i}
+        else:
+            value = [f"Attraction {i} {n}" for n in range(5)]
+        entries.append((f"key-{i}", value))
+    return entries
+
+
+def measure(label: str, backend, entries, repeat: int, size_of=None):
+    expires_at = time.time() + 3600
+    tracemalloc.start()
+    start = time.perf_counter()
+    for key, value in entries:
+        backend.set_entry(key, value, expires_at)
+    set_us = (time.perf_counter() - start) / len(entries) * 1e6
+    memory = size_of() if size_of else tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for key, _ in entries:
+            backend.get_entry(key)
+        timings.append(time.perf_counter() - start)
+    get_us = min(timings) / len(entries) * 1e6
+    print(f"{label:<14}{set_us:>12.1f}{get_us:>12.1f}{memory / 1024:>14.1f}{memory / len(entries):>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--redis', metavar='URL', help="also benchmark a real Redis-protocol server")
+    args = parser.parse_args()
+
+    entries = sample_entries(args.entries)
+    encoded = sum(len(encode_value(value)) for _, value in entries)
+    as_json = sum(len(json.dumps(value, separators=(',', ':'))) for _, value in entries)
+    print(f"serialization: {'msgpack' if msgpack else 'json'} {encoded / len(entries):.0f} B/entry "
+          f"(json {as_json / len(entries):.0f} B/entry)\n")
+
+    print(f"{'backend':<14}{'set us/op':>12}{'get us/op':>12}{'memory KiB':>14}{'B/entry':>12}")
+    measure('lru', LRUCache(args.entries), entries, args.repeat)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.db')
+        measure('sqlite', SQLiteCache(path, 'bench'), entries, args.repeat,
+                size_of=lambda: sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p)))
+
+    server = FakeRedisServer().start()
+    try:
+        measure('fake-redis', RedisCache(server.url, 'bench'), entries, args.repeat)
+    finally:
+        server.stop()
+
+    if args.redis:
+        measure('redis', RedisCache(args.redis, 'bench'), entries, args.repeat, size_of=lambda: 0)
+
+
+if __name__ == "__main__":
+    main()
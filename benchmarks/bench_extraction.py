@@ -0,0 +1,129 @@
+"""Micro-benchmark: per-message CPU cost of place extraction and intent analysis.
+
+Compares the precompiled matchers in tourism_system against the previous implementation
+(kept below as the reference) and checks that both give the same answers.
+
+    python benchmarks/bench_extraction.py [--repeat 2000]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tourism_system import TourismAIAgent  # noqa: E402
+
+MESSAGES = [
+    "I'm going to go to Bangalore, what's the temperature?",
+    "What places can I visit in Paris?",
+    "Tell me about Tokyo",
+    "Weather in New York",
+    "Sightseeing in London",
+    "What's the weather and attractions in London?",
+    "plan my trip to Rome",
+    "Is it hot in Dubai right now?",
+    "things to do in rio de janeiro",
+    "I'm going to visit Kyoto next week, where to go?",
+    "Hello there",
+    "Can you tell me what to see at Agra and whether it will rain?",
+]
+
+
+def legacy_extract_place(user_input):
+    patterns = [
+        r"going to go to\s+([^,\.!?]+)",
+        r"going to\s+([^,\.!?]+)",
+        r"go to\s+([^,\.!?]+)",
+        r"in\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)",
+        r"visit\s+([^,\.!?]+)",
+        r"to\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)",
+        r"at\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)",
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, user_input, re.IGNORECASE)
+        if match:
+            potential_place = match.group(1).strip()
+            potential_place = re.sub(
+                r'\b(?:going|to|visit|travel|trip|plan|what|where|how|is|are|the|there|and|can|i|my|me|let\'s|lets)\b',
+                '', potential_place, flags=re.IGNORECASE
+            ).strip()
+            potential_place = re.sub(r'[,\.!?].*$', '', potential_place).strip()
+            words = potential_place.split()
+            if words:
+                place = ' '.join(words[:3]).strip()
+                if len(place) > 1:
+                    return place.title()
+    words = user_input.split()
+    capitalized_words = []
+    for word in words:
+        clean_word = re.sub(r'[^\w\s]', '', word)
+        if clean_word and clean_word[0].isupper() and len(clean_word) > 2:
+            capitalized_words.append(clean_word)
+    if capitalized_words:
+        return max(capitalized_words, key=len).title()
+    return None
+
+
+def legacy_analyze_intent(user_input):
+    input_lower = user_input.lower()
+    weather_keywords = [
+        'temperature', 'temp', 'weather', 'rain', 'forecast', 'hot', 'cold', 'warm', 'cool', 'humid',
+        'precipitation', 'climate', 'sunny', 'cloudy', 'rainy'
+    ]
+    places_phrases = [
+        'places to', 'place to', 'places i can', 'places you can', 'what places', 'which places',
+        'what are the places', 'attractions', 'tourist', 'sightseeing', 'sights', 'where to go',
+        'where to visit', 'what to see', 'what to visit', 'things to do', 'destinations', 'can visit',
+        'can go', 'should visit', 'should see', 'places i can visit', 'places can visit', 'places can go'
+    ]
+    has_weather = any(keyword in input_lower for keyword in weather_keywords)
+    has_places = any(phrase in input_lower for phrase in places_phrases)
+    if not has_places:
+        for word in ['visit', 'see']:
+            if word in input_lower:
+                if not re.search(rf'going\s+to\s+[^,\.!?]*\b{word}\b', input_lower):
+                    has_places = True
+                    break
+    if 'plan' in input_lower and ('trip' in input_lower or 'visit' in input_lower):
+        has_places = True
+    return {'weather': has_weather, 'places': has_places, 'both': has_weather and has_places}
+
+
+def per_message_us(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in MESSAGES:
+            fn(message)
+    return (time.perf_counter() - start) / (repeat * len(MESSAGES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    agent = TourismAIAgent()
+    for message in MESSAGES:
+        assert agent.extract_place(message) == legacy_extract_place(message), message
+        assert agent.analyze_intent(message) == legacy_analyze_intent(message), message
+
+    def current(message):
+        agent.extract_place(message)
+        agent.analyze_intent(message)
+
+    def legacy(message):
+        legacy_extract_place(message)
+        legacy_analyze_intent(message)
+
+    before = per_message_us(legacy, args.repeat)
+    after = per_message_us(current, args.repeat)
+    print(f"{'implementation':<16}{'us/message':>12}")
+    print(f"{'legacy':<16}{before:>12.2f}")
+    print(f"{'precompiled':<16}{after:>12.2f}")
+    print(f"speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Compare the slim Overpass query from OverpassQueryBuilder with the previous hard-coded query.
+
+    python benchmarks/bench_overpass_query.py                            # synthetic payload, offline
+    python benchmarks/bench_overpass_query.py --live 12.97,77.59 48.86,2.35
+    python benchmarks/bench_overpass_query.py --record 12.97,77.59 -o payloads/bangalore
+    python benchmarks/bench_overpass_query.py payloads/bangalore         # replay a recording
+
+--live posts both queries to OVERPASS_URL and reports bytes transferred, server time (time to the
+response headers, i.e. query evaluation) and total time. --record saves both raw responses and
+their timings as <prefix>.legacy.json, <prefix>.slim.json and <prefix>.timing.json so they can be
+compared offline. Without arguments, a synthetic dense-city payload is reduced the way the server
+would answer the legacy and the slim query, which estimates the bytes saved.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_places_parse import best_of, synthetic_payload  # noqa: E402
+from overpass import CATEGORY_TYPES, element_categories  # noqa: E402
+from tourism_system import CONFIG, PlacesAgent  # noqa: E402
+
+LEGACY_QUERY = """
+        [out:json][timeout:25];
+        (
+          node["tourism"~"^(attraction|museum|monument|gallery|theme_park|zoo|aquarium|artwork|viewpoint|information)$"](around:20000,{lat},{lon});
+          way["tourism"~"^(attraction|museum|monument|gallery|theme_park|zoo|aquarium|artwork|viewpoint|information)$"](around:20000,{lat},{lon});
+          relation["tourism"~"^(attraction|museum|monument|gallery|theme_park|zoo|aquarium|artwork|viewpoint|information)$"](around:20000,{lat},{lon});
+          node["historic"](around:20000,{lat},{lon});
+          way["historic"](around:20000,{lat},{lon});
+          relation["historic"](around:20000,{lat},{lon});
+          node["leisure"~"^(park|nature_reserve|garden)$"](around:20000,{lat},{lon});
+          way["leisure"~"^(park|nature_reserve|garden)$"](around:20000,{lat},{lon});
+        );
+        out body;
+        >;
+        out skel qt;
+        """
+
+_NAME_KEYS = ('name', 'name:en', 'name:en:official', 'name:en:short', 'official_name:en')
+_TYPE_ORDER = {'node': 0, 'way': 1, 'relation': 2}
+_TYPE_LETTERS = {'node': 'n', 'way': 'w', 'relation': 'r'}
+
+
+def fetch(query: str):
+    """POST a query; returns (body, server seconds, total seconds)"""
+    agent = PlacesAgent()
+    start = time.perf_counter()
+    response = agent.http.post(CONFIG['OVERPASS_URL'], data={'data': query}, timeout=120, stream=True)
+    with response:
+        response.raise_for_status()
+        server = response.elapsed.total_seconds()
+        body = response.content
+    return body, server, time.perf_counter() - start
+
+
+def _matches(element) -> bool:
+    """Whether a query with CATEGORY_TYPES selects a tagged element"""
+    letter = _TYPE_LETTERS[element['type']]
+    return any(letter in CATEGORY_TYPES[category] for category in element_categories(element['tags']))
+
+
+def legacy_view(data):
+    """What LEGACY_QUERY returns for an area: matching elements in id order, then skeleton nodes"""
+    tagged = [element for element in data.get('elements', []) if element.get('tags') and _matches(element)]
+    tagged.sort(key=lambda element: (_TYPE_ORDER[element['type']], element['id']))
+    skeleton = [element for element in data.get('elements', []) if not element.get('tags')]
+    return {'version': data.get('version', 0.6), 'elements': tagged + skeleton}
+
+
+def slim_view(data, limit: int):
+    """What the slim query returns for the same area, derived from a legacy response"""
+    elements = [
+        {'type': element['type'], 'id': element['id'], 'tags': element['tags']}
+        for element in data.get('elements', [])
+        if element.get('tags') and any(element['tags'].get(k) for k in _NAME_KEYS) and _matches(element)
+    ]
+    return {'version': data.get('version', 0.6), 'elements': elements[:limit] if limit else elements}
+
+
+def compare(label: str, legacy_body: bytes, slim_body: bytes, timings=None, repeat: int = 5):
+    agent = PlacesAgent()
+    legacy, slim = json.loads(legacy_body), json.loads(slim_body)
+    parse_before = best_of(lambda body: agent._extract_place_names(json.loads(body)), legacy_body, repeat)
+    parse_after = best_of(lambda body: agent._extract_place_names(json.loads(body)), slim_body, repeat)
+    same = agent._extract_place_names(legacy) == agent._extract_place_names(slim)
+    print(f"\n{label}")
+    print(f"  {'':<16}{'legacy':>12}{'slim':>12}{'ratio':>9}")
+    print(f"  {'bytes':<16}{len(legacy_body):>12}{len(slim_body):>12}{len(legacy_body) / max(len(slim_body), 1):>8.1f}x")
+    print(f"  {'elements':<16}{len(legacy['elements']):>12}{len(slim['elements']):>12}")
+    if timings:
+        for name in ('server', 'total'):
+            before, after = timings['legacy'][name] * 1000, timings['slim'][name] * 1000
+            print(f"  {name + ' ms':<16}{before:>12.0f}{after:>12.0f}{before / max(after, 1e-9):>8.1f}x")
+    print(f"  {'parse+rank ms':<16}{parse_before:>12.2f}{parse_after:>12.2f}{parse_before / parse_after:>8.1f}x")
+    print(f"  same top places: {same}")
+
+
+def run_queries(coordinates: str):
+    lat, lon = (float(v) for v in coordinates.split(','))
+    legacy_body, legacy_server, legacy_total = fetch(LEGACY_QUERY.format(lat=lat, lon=lon))
+    slim_body, slim_server, slim_total = fetch(PlacesAgent()._build_query(lat, lon))
+    timings = {'legacy': {'server': legacy_server, 'total': legacy_total},
+               'slim': {'server': slim_server, 'total': slim_total}}
+    return legacy_body, slim_body, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recordings', nargs='*', help="prefixes written by --record")
+    parser.add_argument('--live', nargs='+', metavar='LAT,LON')
+    parser.add_argument('--record', metavar='LAT,LON')
+    parser.add_argument('-o', '--output', default='overpass')
+    parser.add_argument('--elements', type=int, default=50000, help="size of the synthetic payload")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.record:
+        legacy_body, slim_body, timings = run_queries(args.record)
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        for suffix, content in (('legacy', legacy_body), ('slim', slim_body),
+                                ('timing', json.dumps(timings).encode('utf-8'))):
+            with open(f"{args.output}.{suffix}.json", 'wb') as f:
+                f.write(content)
+        print(f"Saved {args.output}.{{legacy,slim,timing}}.json")
+        return
+
+    if args.live:
+        for coordinates in args.live:
+            compare(coordinates, *run_queries(coordinates), repeat=args.repeat)
+        return
+
+    for prefix in args.recordings:
+        with open(f"{prefix}.legacy.json", 'rb') as f:
+            legacy_body = f.read()
+        with open(f"{prefix}.slim.json", 'rb') as f:
+            slim_body = f.read()
+        with open(f"{prefix}.timing.json", encoding='utf-8') as f:
+            timings = json.load(f)
+        compare(os.path.basename(prefix), legacy_body, slim_body, timings, args.repeat)
+
+    if not args.recordings:
+        legacy = legacy_view(synthetic_payload(args.elements))
+        slim = slim_view(legacy, CONFIG['OVERPASS_LIMIT'])
+        compare(f"synthetic-{args.elements} (server side estimated)", json.dumps(legacy).encode('utf-8'),
+                json.dumps(slim).encode('utf-8'), repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Benchmark PlacesAgent ranking of Overpass payloads against the previous implementation.
+
+    python benchmarks/bench_places_parse.py                       # synthetic dense-city payload
+    python benchmarks/bench_places_parse.py payloads/*.json       # recorded Overpass responses
+    python benchmarks/bench_places_parse.py --record 12.97,77.59 -o payloads/bangalore.json
+
+--record posts the production query for the given coordinates to OVERPASS_URL and saves the raw
+response, so large real payloads can be replayed offline.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tourism_system import CONFIG, PlacesAgent  # noqa: E402
+
+
+class LegacyRanking:
+    """The pre-optimisation _extract_place_names, kept as the reference"""
+
+    def _is_english_name(self, name):
+        if not name:
+            return False
+        ascii_count = sum(1 for c in name if ord(c) < 128 and c.isprintable())
+        total_chars = len([c for c in name if c.isprintable()])
+        if total_chars == 0:
+            return False
+        return (ascii_count / total_chars) >= 0.7
+
+    def _get_english_name(self, tags):
+        if 'name:en' in tags:
+            name = tags['name:en']
+            if name and len(name.strip()) > 0:
+                return name.strip()
+        for key in ['name:en:official', 'name:en:short', 'official_name:en']:
+            if key in tags:
+                name = tags[key]
+                if name and len(name.strip()) > 0:
+                    return name.strip()
+        if 'name' in tags:
+            name = tags['name']
+            if name and self._is_english_name(name):
+                return name.strip()
+        return None
+
+    def extract(self, data):
+        place_scores = {}
+        tourism_priority = {
+            'attraction': 10, 'museum': 9, 'monument': 9, 'gallery': 8, 'theme_park': 8, 'zoo': 8,
+            'aquarium': 8, 'artwork': 7, 'viewpoint': 7, 'information': 6, 'historic': 9, 'park': 7,
+            'nature_reserve': 7, 'garden': 6
+        }
+        exclude_words = [
+            'residency', 'hotel', 'hostel', 'restaurant', 'cafe', 'bank', 'atm', 'parking', 'toilet',
+            'bench', 'waste', 'cross', 'junction', 'signal', 'traffic', 'bus stop', 'metro', 'station',
+            'mall', 'shop', 'store', 'market', 'commercial', 'office', 'building', 'apartment',
+            'residential', 'house', 'home', 'holiday home'
+        ]
+        for element in data.get('elements', []):
+            if 'tags' not in element:
+                continue
+            name = self._get_english_name(element['tags'])
+            if not name or len(name) == 0 or len(name) > 50:
+                continue
+            name_lower = name.lower()
+            if any(exclude_word in name_lower for exclude_word in exclude_words):
+                continue
+            tourism_type = element['tags'].get('tourism', '')
+            historic_type = element['tags'].get('historic', '')
+            leisure_type = element['tags'].get('leisure', '')
+            if tourism_type in tourism_priority:
+                score = tourism_priority[tourism_type]
+            elif historic_type:
+                score = tourism_priority.get('historic', 5)
+            elif leisure_type in tourism_priority:
+                score = tourism_priority[leisure_type]
+            else:
+                score = 3
+            if 'wikidata' in element['tags'] or 'wikipedia' in element['tags']:
+                score += 2
+            if 'name:en' in element['tags']:
+                score += 1
+            if name not in place_scores or place_scores[name] < score:
+                place_scores[name] = score
+        sorted_places = sorted(place_scores.items(), key=lambda x: x[1], reverse=True)
+        places = [place[0] for place in sorted_places[:10]]
+        if len(places) < 3:
+            for element in data.get('elements', []):
+                if 'tags' not in element:
+                    continue
+                name = self._get_english_name(element['tags'])
+                if name and len(name.strip()) > 0 and name not in places and len(name) < 50:
+                    name_lower = name.lower()
+                    if not any(w in name_lower for w in ['residency', 'holiday home', 'bank', 'cross']):
+                        places.append(name)
+                        if len(places) >= 5:
+                            break
+        return places[:5]
+
+
+def synthetic_payload(elements: int, seed: int = 0):
+    """A dense-city shaped payload: half skeleton nodes, half tagged POIs with mixed-script names"""
+    rng = random.Random(seed)
+    names = ['Museum', 'Fort', 'Palace', 'Park', 'Garden', 'Hotel Grand', 'Cafe', 'Bank Road', 'Temple',
+             'Lake', 'Statue', 'Gallery', 'Tower', 'Market Square', 'Zoo', 'Viewpoint', 'Bridge', 'Church']
+    scripts = ['Музей', '東京タワー', 'ಲಾಲ್‌ಬಾಗ್', 'Café Ünïcode', 'महल']
+    result = []
+    for i in range(elements):
+        if rng.random() < 0.5:
+            result.append({'type': 'node', 'id': i, 'lat': rng.uniform(-90, 90), 'lon': rng.uniform(-180, 180)})
+            continue
+        tags = {rng.choice(['tourism', 'historic', 'leisure']): rng.choice(['attraction', 'museum', 'park', 'yes'])}
+        name = f"{rng.choice(names)} {rng.randint(1, elements)}"
+        tags['name'] = name if rng.random() < 0.7 else f"{rng.choice(scripts)} {i}"
+        if rng.random() < 0.3:
+            tags['name:en'] = name
+        if rng.random() < 0.2:
+            tags['wikidata'] = f"Q{i}"
+        result.append({'type': rng.choice(['node', 'way', 'relation']), 'id': i, 'tags': tags})
+    return {'version': 0.6, 'elements': result}
+
+
+def record(coordinates: str, output: str):
+    lat, lon = (float(v) for v in coordinates.split(','))
+    agent = PlacesAgent()
+    response = agent.http.post(CONFIG['OVERPASS_URL'], data={'data': agent._build_query(lat, lon)}, timeout=60)
+    response.raise_for_status()
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'wb') as f:
+        f.write(response.content)
+    print(f"Saved {len(response.content)} bytes to {output}")
+
+
+def best_of(fn, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('payloads', nargs='*', help="recorded Overpass JSON responses")
+    parser.add_argument('--elements', type=int, default=50000, help="size of the synthetic payload")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--record', metavar='LAT,LON')
+    parser.add_argument('-o', '--output', default='overpass.json')
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, args.output)
+        return
+
+    datasets = []
+    for path in args.payloads:
+        with open(path, encoding='utf-8') as f:
+            datasets.append((os.path.basename(path), json.load(f)))
+    if not datasets:
+        datasets.append((f"synthetic-{args.elements}", synthetic_payload(args.elements)))
+
+    legacy = LegacyRanking()
+    agent = PlacesAgent()
+    print(f"{'payload':<28}{'elements':>10}{'legacy ms':>12}{'current ms':>12}{'speedup':>9}")
+    for label, data in datasets:
+        assert [place.name for place in agent._extract_place_names(data)] == legacy.extract(data), label
+        before = best_of(legacy.extract, data, args.repeat)
+        after = best_of(agent._extract_place_names, data, args.repeat)
+        print(f"{label:<28}{len(data.get('elements', [])):>10}{before:>12.2f}{after:>12.2f}{before / after:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
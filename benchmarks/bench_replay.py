@@ -0,0 +1,327 @@
+"""Offline end-to-end benchmark: replay recorded upstream responses through the full request path.
+
+    python benchmarks/bench_replay.py                                    # agent + Flask /chat, warm caches
+    python benchmarks/bench_replay.py --cache cold --concurrency 8 --requests 400
+    python benchmarks/bench_replay.py --latency nominatim=0.2,openmeteo=0.05,overpass=1.5
+    python benchmarks/bench_replay.py --save-baseline benchmarks/replay_baseline.json
+    python benchmarks/bench_replay.py --baseline benchmarks/replay_baseline.json    # exit 1 on regression
+    python benchmarks/bench_replay.py --record -o benchmarks/fixtures/replay.json  # refresh fixtures (live APIs)
+
+A local stub server answers Nominatim, Open-Meteo and Overpass requests from fixtures/replay.json,
+sleeping the injected latency first. TourismAIAgent.process_request and the Flask /chat route are
+driven with a weighted mix of realistic messages; each target reports throughput, p50/p95/p99
+latency and the traced peak allocation per request (measured in a separate, smaller pass so
+tracemalloc does not skew the timings).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Must be set before tourism_system reads its configuration: no shared cache file, no local tiles or
+# places index (places requests must reach the stub), no throttling of the stub, and quiet logs
+os.environ.setdefault('CACHE_PATH', '')
+os.environ.setdefault('TILES_PATH', '')
+os.environ.setdefault('PLACES_INDEX_PATH', '')
+os.environ.setdefault('RATE_LIMITS', '127.0.0.1=100000:100000')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import tourism_system  # noqa: E402
+from cache import normalize_key  # noqa: E402
+from tourism_system import CONFIG, TourismAIAgent  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'replay.json')
+DEFAULT_LATENCY = {'nominatim': 0.05, 'openmeteo': 0.03, 'overpass': 0.4}
+
+# (weight, message): mostly single-intent questions about well-known cities, some smaller places
+# that need Nominatim, a few the system cannot answer
+QUERY_MIX = [
+    (12, "What's the weather in Paris?"),
+    (10, "What places can I visit in London?"),
+    (10, "I'm going to Bangalore, what's the temperature and what are the places I can visit?"),
+    (8, "Tell me about Tokyo"),
+    (6, "plan my trip to Rome"),
+    (6, "Is it going to rain in Mumbai?"),
+    (5, "Sightseeing in Barcelona"),
+    (5, "museums in Amsterdam"),
+    (4, "parks and gardens in Singapore"),
+    (4, "historic monuments in Delhi"),
+    (4, "I'm going to Hampi, what can I see there?"),
+    (3, "weather in Coorg"),
+    (3, "Tell me about Ooty"),
+    (3, "things to do in Goa"),
+    (2, "What's the temperature in Munnar and where should I go?"),
+    (2, "plan my trip to Leh"),
+    (2, "Sightseeing in Udaipur"),
+    (1, "weather in Atlantis"),
+    (1, "Hello there"),
+]
+
+
+def load_fixtures(path: str):
+    with open(path, encoding='utf-8') as f:
+        fixtures = json.load(f)
+    fixtures['overpass_body'] = json.dumps(fixtures['overpass'], separators=(',', ':')).encode('utf-8')
+    return fixtures
+
+
+class StubUpstreams:
+    """Threaded HTTP server impersonating Nominatim (/search), Open-Meteo (/v1/forecast) and Overpass (/api/interpreter)"""
+
+    def __init__(self, fixtures, latency):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.requests = {'nominatim': 0, 'openmeteo': 0, 'overpass': 0}
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.handle(self)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                self.rfile.read(length)
+                stub.handle(self)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='stub-upstreams', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, request: BaseHTTPRequestHandler):
+        url = urlparse(request.path)
+        query = parse_qs(url.query)
+        if url.path == '/search':
+            upstream = 'nominatim'
+            body = json.dumps(self.fixtures['nominatim'].get(normalize_key(query.get('q', [''])[0]), [])).encode()
+        elif url.path == '/v1/forecast':
+            upstream = 'openmeteo'
+            count = len(query.get('latitude', [''])[0].split(','))
+            answer = self.fixtures['openmeteo']
+            body = json.dumps(answer if count == 1 else [answer] * count).encode()
+        elif url.path == '/api/interpreter':
+            upstream = 'overpass'
+            body = self.fixtures['overpass_body']
+        else:
+            request.send_error(404)
+            return
+        with self.lock:
+            self.requests[upstream] += 1
+        time.sleep(self.latency.get(upstream, 0))
+        request.send_response(200)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+
+def point_agents_at(base_url: str):
+    CONFIG['NOMINATIM_URL'] = f"{base_url}/search"
+    CONFIG['OPENMETEO_URL'] = f"{base_url}/v1/forecast"
+    CONFIG['OVERPASS_URL'] = f"{base_url}/api/interpreter"
+    CONFIG['OVERPASS_MIRRORS'] = []
+
+
+def clear_caches():
+    for cache in tourism_system._CACHES.values():
+        with cache.local.lock:
+            cache.local.entries.clear()
+
+
+def percentile(ordered, quantile: float) -> float:
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+def run_target(send, messages, concurrency: int, cold: bool):
+    """Send every message, `concurrency` at a time; returns (seconds, sorted per-request latencies)"""
+    def timed(message):
+        if cold:
+            clear_caches()
+        started = time.perf_counter()
+        send(message)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(timed, messages))
+    return time.perf_counter() - started, latencies
+
+
+def memory_per_request(send, messages, cold: bool) -> float:
+    """Mean traced peak allocation of one request, in bytes (sequential, so peaks do not overlap)"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for message in messages:
+            if cold:
+                clear_caches()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            send(message)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks)
+
+
+def build_targets(names):
+    targets = {}
+    if 'agent' in names:
+        agent = TourismAIAgent()
+        targets['agent'] = agent.process_request
+    if 'flask' in names:
+        from app import app
+        client = app.test_client()
+
+        def post_chat(message):
+            response = client.post('/chat', json={'message': message})
+            if response.status_code != 200:
+                raise RuntimeError(f"/chat returned {response.status_code}: {response.get_data(as_text=True)}")
+        targets['flask'] = post_chat
+    return targets
+
+
+def compare(results, baseline, tolerance: float):
+    """Regressions beyond tolerance as messages; only metrics present in both runs are compared"""
+    failures = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'kib_per_request'):
+            if result[metric] > base[metric] * (1 + tolerance):
+                failures.append(f"{key} {metric}: {result[metric]:.2f} vs baseline {base[metric]:.2f}")
+        if result['rps'] < base['rps'] * (1 - tolerance):
+            failures.append(f"{key} rps: {result['rps']:.1f} vs baseline {base['rps']:.1f}")
+    return failures
+
+
+def record(fixtures_path: str, output: str):
+    """Replace the fixtures with live answers for the places in QUERY_MIX"""
+    fixtures = load_fixtures(fixtures_path)
+    del fixtures['overpass_body']
+    agent = TourismAIAgent()
+    http = tourism_system.HTTP_CLIENT
+    for _, message in QUERY_MIX:
+        place = agent.extract_place(message)
+        if place and normalize_key(place) in fixtures['nominatim']:
+            response = http.get(CONFIG['NOMINATIM_URL'], params=agent.geocoding_service._build_params(place))
+            response.raise_for_status()
+            fixtures['nominatim'][normalize_key(place)] = response.json()
+    lat, lon = tourism_system.GAZETTEER.lookup('Bangalore')
+    response = http.get(CONFIG['OPENMETEO_URL'], params=agent.weather_agent._build_params((lat, lon)))
+    response.raise_for_status()
+    fixtures['openmeteo'] = response.json()
+    response = http.post(CONFIG['OVERPASS_URL'], data={'data': agent.places_agent._build_query(lat, lon)}, timeout=60)
+    response.raise_for_status()
+    fixtures['overpass'] = response.json()
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(fixtures, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"Saved fixtures to {output}")
+
+
+def parse_latency(spec: str):
+    latency = dict(DEFAULT_LATENCY)
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        upstream, _, seconds = item.partition('=')
+        latency[upstream.strip()] = float(seconds)
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixtures', default=FIXTURES)
+    parser.add_argument('--targets', default='agent,flask', help="comma-separated: agent, flask")
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--memory-requests', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--cache', choices=('warm', 'cold'), default='warm',
+                        help="warm: one pass over the mix first; cold: clear the in-process caches before every request")
+    parser.add_argument('--latency', default='', help="upstream=seconds,... (nominatim, openmeteo, overpass)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', help="JSON results to compare against; exit 1 on regression")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--record', action='store_true')
+    parser.add_argument('-o', '--output', default=FIXTURES)
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.fixtures, args.output)
+        return
+
+    stub = StubUpstreams(load_fixtures(args.fixtures), parse_latency(args.latency)).start()
+    point_agents_at(stub.base_url)
+    rng = random.Random(args.seed)
+    weights, mix = zip(*QUERY_MIX)
+    messages = rng.choices(mix, weights=weights, k=args.requests)
+    cold = args.cache == 'cold'
+
+    results = {}
+    try:
+        targets = build_targets([name.strip() for name in args.targets.split(',')])
+        print(f"{'target':<16}{'requests':>10}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'KiB/req':>10}")
+        for name, send in targets.items():
+            if not cold:
+                for message in mix:
+                    send(message)
+            seconds, latencies = run_target(send, messages, args.concurrency, cold)
+            memory = memory_per_request(send, messages[:args.memory_requests], cold)
+            key = f"{name}/{args.cache}"
+            results[key] = {
+                'rps': len(messages) / seconds,
+                'p50_ms': percentile(latencies, 0.50) * 1000,
+                'p95_ms': percentile(latencies, 0.95) * 1000,
+                'p99_ms': percentile(latencies, 0.99) * 1000,
+                'kib_per_request': memory / 1024
+            }
+            r = results[key]
+            print(f"{key:<16}{len(messages):>10}{r['rps']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+                  f"{r['p99_ms']:>10.1f}{r['kib_per_request']:>10.1f}")
+        print(f"\nupstream requests: {stub.requests}")
+    finally:
+        stub.stop()
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            failures = compare(results, json.load(f), args.tolerance)
+        if failures:
+            print("\nRegressions:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
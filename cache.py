@@ -0,0 +1,454 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+try:
+    import msgpack
+except ImportError:  # entries fall back to compact JSON
+    msgpack = None
+
+logger = logging.getLogger('tourism.cache')
+
+# Returned by caches on a miss, so that None can be cached as a (negative) value
+MISS = object()
+
+
+def encode_value(value: Any) -> bytes:
+    """Serialize a cache entry for a shared tier; the first byte records the format"""
+    if msgpack is not None:
+        return b'm' + msgpack.packb(value, use_bin_type=True)
+    return b'j' + json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def decode_value(data) -> Any:
+    if isinstance(data, str):
+        # Rows written before entries were tagged are plain JSON text
+        return json.loads(data)
+    if data[:1] == b'm':
+        if msgpack is None:
+            raise ValueError("msgpack entry but msgpack is not installed")
+        return msgpack.unpackb(data[1:], raw=False)
+    return json.loads(data[1:])
+
+
+class LRUCache:
+    """In-process LRU cache with per-entry expiry"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, expires_at) or None if missing/expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set_entry(self, key: str, value: Any, expires_at: float):
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SQLiteCache:
+    """On-disk cache shared by every process that opens the same file (e.g. gunicorn workers).
+
+    Every purge_every writes, expired rows are dropped and, when max_rows is set, the namespace is cut
+    back to its max_rows newest entries (latest expiry first).
+    """
+
+    def __init__(self, path: str, namespace: str, max_rows: Optional[int] = None, purge_every: int = 1000):
+        self.path = path
+        self.namespace = namespace
+        self.max_rows = max_rows
+        self.purge_every = purge_every
+        self.writes = 0
+        self.writes_lock = threading.Lock()
+        self.local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_expiry ON cache (namespace, expires_at)')
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            # Read through a shared memory map instead of copying pages into each process
+            conn.execute('PRAGMA mmap_size=67108864')
+            self.local.conn = conn
+        return conn
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        try:
+            row = self._connection().execute(
+                'SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?',
+                (self.namespace, key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Cache read error: %s", e)
+            return None
+        if row is None:
+            return None
+        try:
+            return decode_value(row[0]), row[1]
+        except ValueError as e:
+            logger.warning("Cache read error: %s", e)
+            return None
+
+    def set_entry(self, key: str, value: Any, expires_at: float):
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                    (self.namespace, key, encode_value(value), expires_at)
+                )
+        except sqlite3.Error as e:
+            logger.warning("Cache write error: %s", e)
+            return
+        with self.writes_lock:
+            self.writes += 1
+            due = self.purge_every > 0 and self.writes % self.purge_every == 0
+        if due:
+            self.purge_expired()
+
+    def delete(self, key: str):
+        try:
+            with self._connection() as conn:
+                conn.execute('DELETE FROM cache WHERE namespace = ? AND key = ?', (self.namespace, key))
+        except sqlite3.Error as e:
+            logger.warning("Cache write error: %s", e)
+
+    def purge_expired(self):
+        """Drop expired rows for this namespace, then the oldest ones beyond max_rows"""
+        try:
+            with self._connection() as conn:
+                conn.execute('DELETE FROM cache WHERE namespace = ? AND expires_at <= ?',
+                             (self.namespace, time.time()))
+                if self.max_rows is not None:
+                    conn.execute(
+                        'DELETE FROM cache WHERE namespace = ? AND key IN ('
+                        'SELECT key FROM cache WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                        (self.namespace, self.namespace, self.max_rows)
+                    )
+        except sqlite3.Error as e:
+            logger.warning("Cache write error: %s", e)
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisCache:
+    """Shared tier on any server speaking the Redis protocol (Redis, Valkey, fake_redis.FakeRedisServer)"""
+
+    def __init__(self, url: str, namespace: str, timeout: float = 2):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.password = parsed.password
+        self.namespace = namespace
+        self.timeout = timeout
+        self.local = threading.local()
+        # Fail fast if the server is unreachable, so open_shared_cache can fall back
+        self._command(b'PING')
+
+    def _connection(self):
+        # One connection per thread, like the SQLite tier
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = self.local.conn = (sock, sock.makefile('rb'))
+            if self.password:
+                self._pipeline([(b'AUTH', self.password.encode())])
+            if self.db:
+                self._pipeline([(b'SELECT', str(self.db).encode())])
+        return conn
+
+    def _pipeline(self, commands: List[Tuple[bytes, ...]]) -> List[Any]:
+        """Send several commands in one round trip and return their replies"""
+        sock, reader = self._connection()
+        payload = bytearray()
+        for command in commands:
+            payload += b'*%d\r\n' % len(command)
+            for part in command:
+                payload += b'$%d\r\n%s\r\n' % (len(part), part)
+        try:
+            sock.sendall(payload)
+            replies = []
+            for _ in commands:
+                try:
+                    replies.append(_read_reply(reader))
+                except RedisError as e:
+                    # An error reply is complete: keep reading so the next call gets its own replies
+                    replies.append(e)
+        except Exception:
+            # Drop the broken or out-of-step connection; the next call reconnects
+            self.local.conn = None
+            sock.close()
+            raise
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def _command(self, *command: bytes) -> Any:
+        return self._pipeline([command])[0]
+
+    def _key(self, key: str) -> bytes:
+        return f"{self.namespace}:{key}".encode('utf-8')
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        try:
+            value, ttl_ms = self._pipeline([(b'GET', self._key(key)), (b'PTTL', self._key(key))])
+            if value is None or ttl_ms < 0:
+                return None
+            return decode_value(value), time.time() + ttl_ms / 1000
+        except (OSError, RedisError, TypeError, ValueError) as e:
+            logger.warning("Cache read error: %s", e)
+            return None
+
+    def set_entry(self, key: str, value: Any, expires_at: float):
+        ttl_ms = int((expires_at - time.time()) * 1000)
+        if ttl_ms <= 0:
+            return
+        try:
+            self._command(b'SET', self._key(key), encode_value(value), b'PX', str(ttl_ms).encode())
+        except (OSError, RedisError) as e:
+            logger.warning("Cache write error: %s", e)
+
+    def delete(self, key: str):
+        try:
+            self._command(b'DEL', self._key(key))
+        except (OSError, RedisError) as e:
+            logger.warning("Cache write error: %s", e)
+
+    def purge_expired(self):
+        """The server expires keys itself"""
+
+
+def _read_reply(reader) -> Any:
+    """Parse one RESP2 reply"""
+    line = reader.readline()
+    if not line.endswith(b'\r\n'):
+        raise OSError("Connection closed by cache server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b'+':
+        return rest.decode()
+    if kind == b'-':
+        raise RedisError(rest.decode())
+    if kind == b':':
+        return int(rest)
+    if kind == b'$':
+        length = int(rest)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        return data[:-2]
+    if kind == b'*':
+        count = int(rest)
+        return None if count < 0 else [_read_reply(reader) for _ in range(count)]
+    # Unlike an error reply, this leaves the stream in an unknown state
+    raise ValueError(f"Unexpected reply: {line!r}")
+
+
+class TwoTierCache:
+    """In-process LRU in front of a shared store, with hit/miss counters.
+
+    The local tier keeps values as they are (e.g. record objects); pack/unpack convert them to and
+    from the plain data the shared tier serializes.
+    """
+
+    def __init__(self, local: LRUCache, shared: Optional[Union[SQLiteCache, RedisCache]] = None,
+                 pack: Optional[Callable[[Any], Any]] = None, unpack: Optional[Callable[[Any], Any]] = None):
+        self.local = local
+        self.shared = shared
+        self.pack = pack
+        self.unpack = unpack
+        self.counters = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'sets': 0}
+        self.lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self.lock:
+            self.counters[name] += 1
+
+    def get(self, key: str) -> Any:
+        """Return the cached value, or MISS"""
+        entry = self.local.get_entry(key)
+        if entry is not None:
+            self._count('local_hits')
+            return entry[0]
+        if self.shared is not None:
+            entry = self.shared.get_entry(key)
+            if entry is not None:
+                return self._promote(key, entry)
+        self._count('misses')
+        return MISS
+
+    async def aget(self, key: str) -> Any:
+        """get() for coroutines: the local tier inline, the shared tier (SQLite or a socket) on a worker thread"""
+        entry = self.local.get_entry(key)
+        if entry is not None:
+            self._count('local_hits')
+            return entry[0]
+        if self.shared is not None:
+            entry = await asyncio.to_thread(self.shared.get_entry, key)
+            if entry is not None:
+                return self._promote(key, entry)
+        self._count('misses')
+        return MISS
+
+    def _promote(self, key: str, entry: Tuple[Any, float]) -> Any:
+        self._count('shared_hits')
+        value = entry[0] if self.unpack is None else self.unpack(entry[0])
+        # Promote into the local tier for the remainder of its lifetime
+        self.local.set_entry(key, value, entry[1])
+        return value
+
+    def peek(self, key: str) -> Any:
+        """Like get, but without counting the lookup or promoting a shared entry (for dry runs)"""
+        entry = self.local.get_entry(key)
+        if entry is None and self.shared is not None:
+            entry = self.shared.get_entry(key)
+            if entry is not None and self.unpack is not None:
+                return self.unpack(entry[0])
+        return MISS if entry is None else entry[0]
+
+    def set(self, key: str, value: Any, ttl: float):
+        expires_at = time.time() + ttl
+        self._count('sets')
+        self.local.set_entry(key, value, expires_at)
+        if self.shared is not None:
+            self.shared.set_entry(key, value if self.pack is None else self.pack(value), expires_at)
+
+    async def aset(self, key: str, value: Any, ttl: float):
+        """set() for coroutines: the shared tier is written on a worker thread"""
+        expires_at = time.time() + ttl
+        self._count('sets')
+        self.local.set_entry(key, value, expires_at)
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.set_entry, key, value if self.pack is None else self.pack(value),
+                                    expires_at)
+
+    def delete(self, key: str):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters; hits are upstream calls saved"""
+        with self.lock:
+            stats = dict(self.counters)
+        stats['hits'] = stats['local_hits'] + stats['shared_hits']
+        stats['local_size'] = len(self.local)
+        return stats
+
+
+def open_shared_cache(location: Optional[str], namespace: str, max_rows: Optional[int] = None,
+                      purge_every: int = 1000) -> Optional[Union[SQLiteCache, RedisCache]]:
+    """Open the shared tier: a redis:// URL or a SQLite file path.
+
+    max_rows and purge_every bound a SQLite tier; a Redis server expires and evicts keys itself.
+    Returns None if disabled or unavailable (e.g. read-only filesystem, unreachable server), in which
+    case each process keeps only its in-process LRU.
+    """
+    if not location:
+        return None
+    try:
+        if location.startswith('redis://'):
+            return RedisCache(location, namespace)
+        cache = SQLiteCache(location, namespace, max_rows, purge_every)
+        # Catch up on rows left behind by earlier runs
+        cache.purge_expired()
+        return cache
+    except (sqlite3.Error, OSError, RedisError) as e:
+        logger.warning("Shared cache disabled: %s", e)
+        return None
+
+
+def normalize_key(text: str) -> str:
+    """Normalize free-text keys so 'Paris', ' paris ' and 'PARIS!' share a cache entry"""
+    return ' '.join(text.casefold().strip(' \t\n.,!?;:\'"').split())
+
+
+class BackgroundRefresher:
+    """Run refresh callbacks on a small thread pool, at most one in flight per key"""
+
+    def __init__(self, workers: int = 2):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cache-refresh')
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def submit(self, key: str, fn: Callable[[], Any]) -> bool:
+        """Schedule fn() unless a refresh for key is already running; returns whether it was scheduled"""
+        with self.lock:
+            if key in self.pending:
+                return False
+            self.pending.add(key)
+        self.executor.submit(self._run, key, fn)
+        return True
+
+    def _run(self, key: str, fn: Callable[[], Any]):
+        try:
+            fn()
+        except Exception as e:
+            logger.warning("Background refresh error for %s: %s", key, e)
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+
+
+class AsyncBackgroundRefresher:
+    """asyncio counterpart of BackgroundRefresher; fn is a coroutine function"""
+
+    def __init__(self):
+        self.pending: Dict[str, asyncio.Future] = {}
+
+    def submit(self, key: str, fn: Callable[[], Any]) -> bool:
+        if key in self.pending:
+            return False
+        self.pending[key] = asyncio.ensure_future(self._run(key, fn))
+        return True
+
+    async def _run(self, key: str, fn: Callable[[], Any]):
+        try:
+            await fn()
+        except Exception as e:
+            logger.warning("Background refresh error for %s: %s", key, e)
+        finally:
+            self.pending.pop(key, None)
@@ -0,0 +1,143 @@
+"""In-memory stand-in for a Redis server, speaking enough of the protocol for cache.RedisCache.
+
+Embedded (tests, benchmarks, offline runs):
+
+    server = FakeRedisServer().start()
+    cache = RedisCache(server.url, 'geocode')
+
+Standalone, shared by all local gunicorn workers:
+
+    python fake_redis.py --port 6379
+    REDIS_URL=redis://127.0.0.1:6379/0 gunicorn app:app
+"""
+import argparse
+import socket
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from cache import RedisError, _read_reply
+
+
+class _Store:
+    """Key -> (value, expires_at or None), with lazy expiry on access"""
+
+    def __init__(self):
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.lock = threading.Lock()
+
+    def _live(self, key: bytes) -> Optional[Tuple[bytes, Optional[float]]]:
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self.data[key]
+            return None
+        return entry
+
+    def execute(self, command: List[bytes]) -> bytes:
+        name = command[0].upper()
+        args = command[1:]
+        with self.lock:
+            if name == b'PING':
+                return b'+PONG\r\n'
+            if name in (b'SELECT', b'AUTH'):
+                return b'+OK\r\n'
+            if name == b'GET':
+                entry = self._live(args[0])
+                return _bulk(None if entry is None else entry[0])
+            if name == b'SET':
+                expires_at = None
+                options = [arg.upper() for arg in args[2:]]
+                if b'PX' in options:
+                    expires_at = time.time() + int(args[2 + options.index(b'PX') + 1]) / 1000
+                elif b'EX' in options:
+                    expires_at = time.time() + int(args[2 + options.index(b'EX') + 1])
+                self.data[args[0]] = (args[1], expires_at)
+                return b'+OK\r\n'
+            if name == b'PTTL':
+                entry = self._live(args[0])
+                if entry is None:
+                    return b':-2\r\n'
+                if entry[1] is None:
+                    return b':-1\r\n'
+                return b':%d\r\n' % max(0, int((entry[1] - time.time()) * 1000))
+            if name == b'DEL':
+                removed = sum(1 for key in args if self.data.pop(key, None) is not None)
+                return b':%d\r\n' % removed
+            if name == b'DBSIZE':
+                return b':%d\r\n' % sum(1 for key in list(self.data) if self._live(key) is not None)
+            if name == b'FLUSHDB':
+                self.data.clear()
+                return b'+OK\r\n'
+        return b'-ERR unknown command \'%s\'\r\n' % name.lower()
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    if value is None:
+        return b'$-1\r\n'
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        # Pipelined replies are written one by one; don't let Nagle hold them back
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        while True:
+            try:
+                command = _read_reply(self.rfile)
+            except (OSError, ValueError, RedisError):
+                return
+            if not isinstance(command, list) or not command:
+                self.wfile.write(b'-ERR protocol error\r\n')
+                return
+            self.wfile.write(self.server.store.execute(command))
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeRedisServer:
+    """Threaded in-memory server; port 0 picks a free port"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.server = _Server((host, port), _Handler)
+        self.server.store = _Store()
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> 'FakeRedisServer':
+        self.thread = threading.Thread(target=self.server.serve_forever, name='fake-redis', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    args = parser.parse_args()
+    server = FakeRedisServer(args.host, args.port)
+    print(f"🧪 Fake Redis listening on {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
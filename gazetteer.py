@@ -0,0 +1,158 @@
+"""Local gazetteer so geocoding common places needs no Nominatim call.
+
+The index is a UTF-8 text file with one `key<TAB>name<TAB>lat<TAB>lon<TAB>population` line per
+name or alias, sorted by key. It is memory-mapped read-only, so every gunicorn worker shares the
+same pages, and looked up by binary search.
+
+Build it from a GeoNames dump (e.g. cities15000.txt from https://download.geonames.org/export/dump/):
+    python gazetteer.py build cities15000.txt -o data/gazetteer.tsv --min-population 100000
+"""
+import argparse
+import logging
+import mmap
+import os
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from cache import normalize_key
+
+logger = logging.getLogger('tourism.gazetteer')
+
+# GeoNames dump columns
+_NAME, _ASCIINAME, _ALTERNATE_NAMES, _LAT, _LON, _FEATURE_CLASS, _POPULATION = 1, 2, 3, 4, 5, 6, 14
+
+
+def first_at_or_after(mm: mmap.mmap, target: bytes) -> int:
+    """Offset of the first line whose key (text before the first TAB) is >= target in a sorted file"""
+    lo, hi = 0, len(mm)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        start = mm.rfind(b'\n', 0, mid) + 1
+        end = mm.find(b'\t', start)
+        if mm[start:end] < target:
+            lo = mm.find(b'\n', mid) + 1
+        else:
+            hi = start
+    return lo
+
+
+class Gazetteer:
+    """Read-only, lazily memory-mapped place index with exact/alias and prefix lookup"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mm: Optional[mmap.mmap] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _index(self) -> Optional[mmap.mmap]:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        with open(self.path, 'rb') as f:
+                            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    except (OSError, ValueError) as e:
+                        # Missing or empty index: every lookup is a miss and we fall back to Nominatim
+                        logger.warning("Gazetteer unavailable (%s): %s", self.path, e)
+                        self._mm = None
+                    self._loaded = True
+        return self._mm
+
+    def _scan(self, target: bytes, prefix: bool) -> Iterable[Tuple[str, float, float, int]]:
+        mm = self._index()
+        if mm is None:
+            return
+        pos = first_at_or_after(mm, target)
+        size = len(mm)
+        while pos < size:
+            end = mm.find(b'\n', pos)
+            if end == -1:
+                end = size
+            key, name, lat, lon, population = mm[pos:end].split(b'\t')
+            if key != target and not (prefix and key.startswith(target)):
+                return
+            yield name.decode('utf-8'), float(lat), float(lon), int(population)
+            pos = end + 1
+
+    def lookup(self, place: str) -> Optional[Tuple[float, float]]:
+        """Coordinates for an exact name or alias, preferring the most populous match"""
+        best = None
+        for name, lat, lon, population in self._scan(normalize_key(place).encode('utf-8'), prefix=False):
+            if best is None or population > best[2]:
+                best = (lat, lon, population)
+        return (best[0], best[1]) if best else None
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[str, float, float]]:
+        """Places whose name or alias starts with prefix, most populous first"""
+        target = normalize_key(prefix).encode('utf-8')
+        if not target:
+            return []
+        matches = {}
+        for name, lat, lon, population in self._scan(target, prefix=True):
+            if name not in matches or population > matches[name][2]:
+                matches[name] = (lat, lon, population)
+        ranked = sorted(matches.items(), key=lambda item: item[1][2], reverse=True)
+        return [(name, lat, lon) for name, (lat, lon, _) in ranked[:limit]]
+
+
+def build_index(sources: List[str], output: str, min_population: int = 0):
+    """Build a sorted index file from GeoNames dumps, keeping ASCII aliases"""
+    entries = {}
+    for source in sources:
+        with open(source, encoding='utf-8') as f:
+            for line in f:
+                cols = line.rstrip('\n').split('\t')
+                if len(cols) <= _POPULATION or cols[_FEATURE_CLASS] != 'P':
+                    continue
+                population = int(cols[_POPULATION] or 0)
+                if population < min_population:
+                    continue
+                name = cols[_NAME]
+                lat, lon = float(cols[_LAT]), float(cols[_LON])
+                aliases = {name, cols[_ASCIINAME]}
+                # Other scripts bloat the index and are not what users type into the chat
+                aliases.update(alias for alias in cols[_ALTERNATE_NAMES].split(',') if alias.isascii())
+                for alias in aliases:
+                    key = normalize_key(alias)
+                    if not key or '\t' in key:
+                        continue
+                    # One line per (key, place); a key shared by several places keeps all of them
+                    entries[(key, name, round(lat, 4), round(lon, 4))] = population
+
+    # Sorting whole lines bytewise orders them by key (TAB sorts before any key character),
+    # which is what the binary search in Gazetteer expects
+    lines = sorted(
+        f"{key}\t{name}\t{lat}\t{lon}\t{population}\n".encode('utf-8')
+        for (key, name, lat, lon), population in entries.items()
+    )
+    tmp_path = f"{output}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        f.writelines(lines)
+    os.replace(tmp_path, output)
+    print(f"Wrote {len(lines)} keys to {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the local gazetteer index")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="build an index from GeoNames dump files")
+    build.add_argument('sources', nargs='+')
+    build.add_argument('-o', '--output', default=os.path.join('data', 'gazetteer.tsv'))
+    build.add_argument('--min-population', type=int, default=0)
+    query = sub.add_parser('lookup', help="look up a place or prefix")
+    query.add_argument('place')
+    query.add_argument('-i', '--index', default=os.path.join('data', 'gazetteer.tsv'))
+    query.add_argument('--prefix', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_index(args.sources, args.output, args.min_population)
+    else:
+        gazetteer = Gazetteer(args.index)
+        print(gazetteer.complete(args.place) if args.prefix else gazetteer.lookup(args.place))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import math
+from typing import List
+
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+_EARTH_RADIUS_M = 6371008.8
+
+
+def geohash_encode(lat: float, lon: float, precision: int = 5) -> str:
+    """Encode coordinates as a geohash; precision 5 is a ~4.9 km x 4.9 km cell"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        # Geohash interleaves longitude and latitude bits, starting with longitude
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def grid_key(lat: float, lon: float, step: float) -> str:
+    """Snap coordinates to the nearest point of a regular lat/lon grid of `step` degrees"""
+    return f"{round(lat / step) * step:.4f},{round(lon / step) * step:.4f}"
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * _EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def geohash_cells(lat: float, lon: float, radius: float, precision: int) -> List[str]:
+    """Sorted geohash cells of the given precision overlapping the bounding box of a circle (radius in metres)"""
+    lat_bits, lon_bits = 5 * precision // 2, (5 * precision + 1) // 2
+    height, width = 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+    dlat = math.degrees(radius / _EARTH_RADIUS_M)
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    dlon = 180.0 if cos_lat < 1e-9 else min(180.0, dlat / cos_lat)
+
+    rows = range(int((min_lat + 90) / height), min(int((max_lat + 90) / height), (1 << lat_bits) - 1) + 1)
+    first, last = int((lon - dlon + 180) // width), int((lon + dlon + 180) // width)
+    # Columns wrap around the antimeridian; a circle spanning every longitude needs each column once
+    columns = {column % (1 << lon_bits) for column in range(first, min(last, first + (1 << lon_bits) - 1) + 1)}
+    return sorted({geohash_encode(-90 + (row + 0.5) * height, -180 + (column + 0.5) * width, precision)
+                   for row in rows for column in columns})
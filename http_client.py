@@ -0,0 +1,385 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Mapping, Optional, Sequence
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import RateLimiter
+from metrics import UPSTREAM_RESPONSES, UPSTREAM_SECONDS
+from resilience import CircuitBreaker, CircuitBreakers, HedgingPolicy
+
+USER_AGENT = 'TourismAgent/1.0 (https://github.com/yourusername/tourism-agent)'
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# A longer Retry-After is not worth holding the caller for: the response is returned instead
+MAX_RETRY_AFTER = 10.0
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without contacting the upstream while its circuit breaker is open"""
+
+
+class AsyncCircuitOpenError(httpx.TransportError):
+    """asyncio counterpart of CircuitOpenError"""
+
+
+def _record_outcome(url: str, status: Optional[int], started: float, breaker: Optional[CircuitBreaker],
+                    hedging: Optional[HedgingPolicy]):
+    """Feed one request's outcome (status None = no response) to its breaker, the hedging latencies and metrics"""
+    elapsed = time.monotonic() - started
+    host = urlparse(url).hostname or url
+    UPSTREAM_RESPONSES.inc(host, 'error' if status is None else str(status))
+    if status is None or status in RETRY_STATUSES:
+        if breaker is not None:
+            breaker.record_failure()
+        return
+    UPSTREAM_SECONDS.observe(elapsed, host)
+    if breaker is not None:
+        breaker.record_success()
+    if hedging is not None:
+        hedging.record_latency(url, elapsed)
+
+
+def _retry_delay(headers: Mapping[str, str], attempt: int, backoff_factor: float) -> Optional[float]:
+    """Seconds to wait before retrying a 429/5xx response: its Retry-After (seconds or an HTTP date) when
+    it sent one, else exponential backoff. None when Retry-After asks for more than MAX_RETRY_AFTER."""
+    value = headers.get('Retry-After')
+    if value is None:
+        return backoff_factor * (2 ** attempt)
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return backoff_factor * (2 ** attempt)
+    delay = max(0.0, delay)
+    return delay if delay <= MAX_RETRY_AFTER else None
+
+
+def _circuit_open_message(url: str) -> str:
+    return f"Circuit open for {urlparse(url).hostname or url}; not calling it until it recovers"
+
+
+class HTTPClient:
+    """Pooled keep-alive HTTP session shared by all agents in a process"""
+
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None, pool_connections: int = 10,
+                 pool_maxsize: int = 20, retries: int = 2, backoff_factor: float = 0.5,
+                 user_agent: str = USER_AGENT, breakers: Optional[CircuitBreakers] = None,
+                 hedging: Optional[HedgingPolicy] = None, hedge_workers: int = 4):
+        self.rate_limiter = rate_limiter
+        self.breakers = breakers
+        self.hedging = hedging
+        self.hedge_workers = hedge_workers
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._hedge_pid: Optional[int] = None
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.user_agent = user_agent
+        self._session: Optional[requests.Session] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _build_session(self) -> requests.Session:
+        # No adapter retries: request() retries, so every attempt goes through the rate limiter
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers['User-Agent'] = self.user_agent
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        # Sockets must not be shared across fork (e.g. gunicorn --preload), so rebuild per process
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    self._session = self._build_session()
+                    self._pid = pid
+        return self._session
+
+    @property
+    def hedge_pool(self) -> ThreadPoolExecutor:
+        # Threads do not survive fork either
+        pid = os.getpid()
+        if self._hedge_pool is None or self._hedge_pid != pid:
+            with self._lock:
+                if self._hedge_pool is None or self._hedge_pid != pid:
+                    self._hedge_pool = ThreadPoolExecutor(max_workers=self.hedge_workers, thread_name_prefix='hedge')
+                    self._hedge_pid = pid
+        return self._hedge_pool
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a rate-limited request through the pooled session, retrying 429/5xx and connection errors
+        with backoff (or the Retry-After the upstream asks for), and failing fast while the host's circuit
+        is open."""
+        breaker = self.breakers.get(url) if self.breakers is not None else None
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError(_circuit_open_message(url))
+        started = time.monotonic()
+        try:
+            response = self._send(method, url, **kwargs)
+        except Exception:
+            _record_outcome(url, None, started, breaker, self.hedging)
+            raise
+        _record_outcome(url, response.status_code, started, breaker, self.hedging)
+        return response
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        # Overpass queries are POSTs but read-only, so every method here is safe to retry
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(url)
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff_factor * (2 ** attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return response
+                delay = _retry_delay(response.headers, attempt, self.backoff_factor)
+                if delay is None:
+                    return response
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def request_hedged(self, method: str, urls: Sequence[str], **kwargs) -> requests.Response:
+        """Send to urls[0] and race the next mirror if it errors, its circuit is open, or it is slower than
+        the hedging percentile. The first good response wins; the others are closed when they finish.
+
+        Every attempt runs on hedge_pool, so it needs a worker per concurrent caller and URL. If attempts
+        queue, the wait counts toward the hedge delay.
+        """
+        remaining = list(urls)
+        pending = {}
+        errors: List[Exception] = []
+        fallback: Optional[requests.Response] = None
+        delay = self.hedging.delay(urls[0])
+        self.hedging.count('requests')
+
+        def launch(reason: Optional[str] = None):
+            if reason:
+                self.hedging.count(reason)
+            url = remaining.pop(0)
+            pending[self.hedge_pool.submit(self.request, method, url, **kwargs)] = reason
+
+        launch()
+        while pending:
+            done, _ = wait(pending, timeout=delay if remaining else None, return_when=FIRST_COMPLETED)
+            if not done:
+                launch('hedges')
+                continue
+            for future in done:
+                reason = pending.pop(future)
+                try:
+                    response = future.result()
+                except requests.exceptions.RequestException as e:
+                    errors.append(e)
+                    if remaining and not pending:
+                        launch('failovers')
+                    continue
+                if response.status_code in RETRY_STATUSES and (pending or remaining):
+                    if fallback is not None:
+                        fallback.close()
+                    fallback = response
+                    if not pending:
+                        launch('failovers')
+                    continue
+                self.hedging.count_win(reason)
+                for loser in pending:
+                    loser.add_done_callback(_close_response)
+                if fallback is not None:
+                    fallback.close()
+                return response
+        if fallback is not None:
+            return fallback
+        raise errors[-1]
+
+    def get(self, url: str, params: Optional[Dict] = None, timeout: float = 10, **kwargs) -> requests.Response:
+        return self.request('GET', url, params=params, timeout=timeout, **kwargs)
+
+    def post(self, url: str, data=None, timeout: float = 30, mirrors: Sequence[str] = (),
+             **kwargs) -> requests.Response:
+        """POST to url, hedged across `mirrors` when given and hedging is enabled"""
+        if mirrors and self.hedging is not None:
+            return self.request_hedged('POST', [url, *mirrors], data=data, timeout=timeout, **kwargs)
+        return self.request('POST', url, data=data, timeout=timeout, **kwargs)
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class AsyncHTTPClient:
+    """asyncio counterpart of HTTPClient, backed by a pooled httpx.AsyncClient"""
+
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None, pool_maxsize: int = 100,
+                 retries: int = 2, backoff_factor: float = 0.5, user_agent: str = USER_AGENT,
+                 breakers: Optional[CircuitBreakers] = None, hedging: Optional[HedgingPolicy] = None):
+        self.rate_limiter = rate_limiter
+        self.breakers = breakers
+        self.hedging = hedging
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.user_agent = user_agent
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # An httpx.AsyncClient is bound to the event loop it was first used on
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                self._retire(self._client, self._loop)
+            self._client = httpx.AsyncClient(
+                headers={'User-Agent': self.user_agent},
+                limits=httpx.Limits(max_connections=self.pool_maxsize,
+                                    max_keepalive_connections=self.pool_maxsize)
+            )
+            self._loop = loop
+        return self._client
+
+    @staticmethod
+    def _retire(client: httpx.AsyncClient, loop: Optional[asyncio.AbstractEventLoop]):
+        """Close the client of an event loop this one replaced, so its pooled connections are released"""
+        if loop is not None and loop.is_running():
+            # Still serving in another thread: the client can only be closed on its own loop
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+
+        async def close():
+            try:
+                await client.aclose()
+            except Exception:
+                # Connections bound to a closed loop cannot shut down cleanly; dropping them is all that is left
+                pass
+
+        asyncio.ensure_future(close())
+
+    async def request(self, method: str, url: str, stream: bool = False, **kwargs) -> httpx.Response:
+        """Send a rate-limited request, retrying 429/5xx and connection errors with backoff (or the
+        Retry-After the upstream asks for), and failing fast while the host's circuit is open.
+
+        With stream=True the body is not read; the caller iterates it and must aclose() the response.
+        """
+        breaker = self.breakers.get(url) if self.breakers is not None else None
+        if breaker is not None and not breaker.allow():
+            raise AsyncCircuitOpenError(_circuit_open_message(url))
+        started = time.monotonic()
+        try:
+            response = await self._send(method, url, stream, **kwargs)
+        except Exception:
+            _record_outcome(url, None, started, breaker, self.hedging)
+            raise
+        _record_outcome(url, response.status_code, started, breaker, self.hedging)
+        return response
+
+    async def _send(self, method: str, url: str, stream: bool, **kwargs) -> httpx.Response:
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                delay = self.rate_limiter.reserve(url)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            try:
+                client = self.client
+                response = await client.send(client.build_request(method, url, **kwargs), stream=stream)
+            except httpx.TransportError:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff_factor * (2 ** attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return response
+                delay = _retry_delay(response.headers, attempt, self.backoff_factor)
+                if delay is None:
+                    return response
+                await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(self, url: str, params: Optional[Dict] = None, timeout: float = 10, **kwargs) -> httpx.Response:
+        return await self.request('GET', url, params=params, timeout=timeout, **kwargs)
+
+    async def post(self, url: str, data=None, timeout: float = 30, mirrors: Sequence[str] = (),
+                   **kwargs) -> httpx.Response:
+        """POST to url, hedged across `mirrors` when given and hedging is enabled"""
+        if mirrors and self.hedging is not None:
+            return await self.request_hedged('POST', [url, *mirrors], data=data, timeout=timeout, **kwargs)
+        return await self.request('POST', url, data=data, timeout=timeout, **kwargs)
+
+    async def request_hedged(self, method: str, urls: Sequence[str], **kwargs) -> httpx.Response:
+        """asyncio counterpart of HTTPClient.request_hedged"""
+        remaining = list(urls)
+        pending = {}
+        errors: List[Exception] = []
+        fallback: Optional[httpx.Response] = None
+        delay = self.hedging.delay(urls[0])
+        self.hedging.count('requests')
+
+        def launch(reason: Optional[str] = None):
+            if reason:
+                self.hedging.count(reason)
+            url = remaining.pop(0)
+            pending[asyncio.ensure_future(self.request(method, url, **kwargs))] = reason
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=delay if remaining else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch('hedges')
+                    continue
+                for task in done:
+                    reason = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except httpx.HTTPError as e:
+                        errors.append(e)
+                        if remaining and not pending:
+                            launch('failovers')
+                        continue
+                    if response.status_code in RETRY_STATUSES and (pending or remaining):
+                        if fallback is not None:
+                            await fallback.aclose()
+                        fallback = response
+                        if not pending:
+                            launch('failovers')
+                        continue
+                    self.hedging.count_win(reason)
+                    if fallback is not None:
+                        await fallback.aclose()
+                    return response
+        finally:
+            # Losers are cancelled rather than left holding connections
+            for task in pending:
+                task.cancel()
+        if fallback is not None:
+            return fallback
+        raise errors[-1]
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,163 @@
+"""In-process Prometheus metrics: histograms, counters and scrape-time collectors.
+
+Each process (gunicorn worker) keeps its own registry, so a scrape reports the worker that served
+it; Prometheus aggregates across workers by instance/pid labels.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; spans cache hits (sub-millisecond) to Overpass timeouts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = (f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+    return '{' + ','.join(pairs) + '}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram: 'Histogram', labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self.series: Dict[Tuple[str, ...], List[float]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *labels: str) -> _Timer:
+        """Context manager observing the duration of its block"""
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {labels: list(values) for labels, values in self.series.items()}
+        for labels, values in sorted(series.items()):
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(dict(base, le=le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(base)} {values[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(base)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.series: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            series = dict(self.series)
+        for labels, value in sorted(series.items()):
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, labels)))} {value}")
+        return lines
+
+
+class Registry:
+    """Metrics owned by this process plus collectors that read other components' stats() at scrape time"""
+
+    def __init__(self):
+        self.metrics: List = []
+        self.collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+        self.lock = threading.Lock()
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self._add(Histogram(*args, **kwargs))
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self._add(Counter(*args, **kwargs))
+
+    def _add(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def collect(self, name: str, documentation: str, kind: str, fn: Callable[[], Iterable[Sample]]):
+        """Register fn returning (suffix, labels, value) samples for a gauge or counter family"""
+        with self.lock:
+            self.collectors.append((name, documentation, kind, fn))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self.lock:
+            metrics = list(self.metrics)
+            collectors = list(self.collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for name, documentation, kind, fn in collectors:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            try:
+                samples = list(fn())
+            except Exception as e:
+                lines.append(f"# collector error: {e}")
+                continue
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {float(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram('tourism_stage_seconds', 'Time spent in each request stage', ['stage'])
+UPSTREAM_SECONDS = REGISTRY.histogram('tourism_upstream_seconds', 'Upstream HTTP latency to response headers',
+                                      ['host'])
+UPSTREAM_RESPONSES = REGISTRY.counter('tourism_upstream_responses_total',
+                                      'Upstream HTTP responses by status code (error = no response)',
+                                      ['host', 'status'])
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
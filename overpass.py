@@ -0,0 +1,176 @@
+import codecs
+import json
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+ATTRACTION_TYPES = ('attraction', 'museum', 'monument', 'gallery', 'theme_park', 'zoo', 'aquarium', 'artwork',
+                    'viewpoint', 'information')
+NATURE_TYPES = ('park', 'nature_reserve', 'garden')
+# Overpass filters per place category, in priority order (an element's first match is its category)
+PLACE_CATEGORIES = {
+    'attractions': f'["tourism"~"^({"|".join(ATTRACTION_TYPES)})$"]',
+    'historic': '["historic"]',
+    'nature': f'["leisure"~"^({"|".join(NATURE_TYPES)})$"]',
+}
+# Element types looked up per category: parks and gardens have never been queried as relations
+CATEGORY_TYPES = {'attractions': 'nwr', 'historic': 'nwr', 'nature': 'nw'}
+# Elements without any of the names PlacesAgent can display are filtered out on the server
+NAME_FILTER = '[~"^(name|name:en|name:en:official|name:en:short|official_name:en)$"~"."]'
+# Output in id order, like the original "out body", so the ranking breaks ties the same way
+OUTPUT_MODES = {
+    'tags': 'out tags',  # tags only: all the ranking needs
+    'center': 'out center',  # tags plus one representative coordinate per element
+}
+
+
+def element_categories(tags: Dict[str, str]) -> List[str]:
+    """Categories whose PLACE_CATEGORIES filter matches an element's tags, in emission order.
+
+    The same selection the Overpass query makes, for elements read from a local OSM extract.
+    """
+    categories = []
+    if tags.get('tourism') in ATTRACTION_TYPES:
+        categories.append('attractions')
+    if tags.get('historic'):
+        categories.append('historic')
+    if tags.get('leisure') in NATURE_TYPES:
+        categories.append('nature')
+    return categories
+
+
+_ELEMENTS_START = re.compile(r'"elements"\s*:\s*\[')
+_REMARK = re.compile(r'"remark"\s*:\s*')
+_WHITESPACE = re.compile(r'[\s,]*')
+# Longest tail kept after the elements array while looking for a "remark"
+_MAX_TAIL = 4096
+
+
+class OverpassRuntimeError(ValueError):
+    """A response the server marked as incomplete with a "remark" (e.g. a query timeout or out of memory).
+
+    Overpass still answers these with HTTP 200 and whatever elements it had found, so they must not be
+    ranked or cached as a complete result.
+    """
+
+
+def check_remark(remark: Optional[str]):
+    """Raise OverpassRuntimeError if a response carried a remark"""
+    if remark:
+        raise OverpassRuntimeError(f"Overpass runtime error: {remark}")
+
+
+class OverpassQueryBuilder:
+    """Builds minimal Overpass QL queries for tourist places around a point.
+
+    The query matches the same elements as the original one (per category, the element types in
+    CATEGORY_TYPES), minus those without a displayable name, and outputs their tags once in id order.
+    Geometry and untagged member nodes are never requested, so PlacesAgent ranks the same top places
+    from a fraction of the bytes. A limit caps the output before ranking, in id order rather than by
+    score, so it can drop top places; it is off by default.
+    """
+
+    def __init__(self, radius: int = 20000, limit: int = 0, timeout: int = 25, output: str = 'tags'):
+        if output not in OUTPUT_MODES:
+            raise ValueError(f"Unknown Overpass output mode: {output}")
+        self.radius = radius
+        self.limit = limit
+        self.timeout = timeout
+        self.output = output
+
+    def build(self, lat: float, lon: float, categories: Optional[Sequence[str]] = None) -> str:
+        """Query for the given categories (all of them by default) around lat, lon"""
+        statements = [f"[out:json][timeout:{self.timeout}];"]
+        area = f"(around:{self.radius},{lat},{lon})"
+        statements.append("(")
+        for category in categories or PLACE_CATEGORIES:
+            statements.append(f"  {CATEGORY_TYPES[category]}{PLACE_CATEGORIES[category]}{NAME_FILTER}{area};")
+        statements.append(");")
+        statements.append(OUTPUT_MODES[self.output] + (f" {self.limit}" if self.limit else '') + ";")
+        return '\n'.join(statements)
+
+
+class OverpassElementStream:
+    """Incremental parser for Overpass JSON responses.
+
+    Feed raw response chunks and get back the objects of the top-level "elements" array as soon
+    as each one is complete, so the whole payload never has to be held in memory. The "remark" the
+    server appends after the array on a runtime error is kept in `remark`, and close() raises on it.
+    """
+
+    def __init__(self, tagged_only: bool = True):
+        self.tagged_only = tagged_only
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._in_elements = False
+        self._done = False
+        self.remark: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[Dict]:
+        """Consume a chunk and return the elements it completed"""
+        self._buffer += self._decoder.decode(chunk)
+        return self._drain()
+
+    def close(self) -> List[Dict]:
+        """Flush the remaining input; raises ValueError if the response was truncated, and
+        OverpassRuntimeError if it carried a remark"""
+        self._buffer += self._decoder.decode(b'', final=True)
+        elements = self._drain()
+        if not self._done:
+            raise ValueError("Truncated Overpass response: elements array not closed")
+        match = _REMARK.search(self._buffer)
+        if match:
+            try:
+                self.remark = self._json.raw_decode(self._buffer, match.end())[0]
+            except json.JSONDecodeError:
+                self.remark = self._buffer[match.end():].strip()
+        check_remark(self.remark)
+        return elements
+
+    def _drain(self) -> List[Dict]:
+        elements = []
+        if self._done:
+            # The tail after the array only holds "remark" and closing braces
+            self._buffer = self._buffer[:_MAX_TAIL]
+            return elements
+
+        if not self._in_elements:
+            match = _ELEMENTS_START.search(self._buffer)
+            if not match:
+                # Keep a short tail in case the key is split across chunks
+                self._buffer = self._buffer[-64:]
+                return elements
+            self._buffer = self._buffer[match.end():]
+            self._in_elements = True
+
+        pos = 0
+        buffer = self._buffer
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == ']':
+                # Keep what follows the array for close() to look for a "remark"
+                self._done = True
+                pos += 1
+                break
+            try:
+                element, end = self._json.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Incomplete object: wait for the next chunk
+                break
+            pos = end
+            # Skeleton nodes from ">; out skel" carry no tags and are dropped as they arrive
+            if not self.tagged_only or element.get('tags'):
+                elements.append(element)
+        self._buffer = buffer[pos:]
+        return elements
+
+
+def iter_elements(chunks: Iterable[bytes], tagged_only: bool = True) -> Iterator[Dict]:
+    """Yield elements from an iterable of raw response chunks (e.g. requests' iter_content)"""
+    stream = OverpassElementStream(tagged_only)
+    for chunk in chunks:
+        if chunk:
+            yield from stream.feed(chunk)
+    yield from stream.close()
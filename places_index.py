@@ -0,0 +1,527 @@
+"""Offline attraction index built from OSM extracts, so places need no Overpass call.
+
+The index is a UTF-8 text file with one
+`cell<TAB>lat<TAB>lon<TAB>osm_id<TAB>categories<TAB>notable<TAB>score<TAB>name` line per named place,
+sorted by cell, a precision-5 geohash of the place. Geohash order is a Z-order curve, so the file is a
+linear quadtree: every coarser cell is one contiguous run of lines, and a radius query binary-searches
+the handful of cells overlapping the circle and keeps the places within great-circle distance. Lines
+keyed `!<precision-3 geohash>` list the cells that lie wholly inside an extract's boundary (its
+Geofabrik `.poly` file when one sits next to it, else the bounding box in its header); a query whose
+circle reaches any other cell still goes to Overpass. Like the gazetteer the file is memory-mapped
+read-only and shared by every worker.
+
+Places are selected with the Overpass query's tag filters (overpass.element_categories) and scored
+with PlacesAgent's scoring (tourism_system.place_score). Ways and relations are placed at the centre of
+their bounding box, computed from a sample of their nodes. Each extract is streamed three times (ways
+and relations, relation member ways, nodes), so memory grows with the number of matching places, not
+with the size of the extract; rows are sorted in bounded chunks and merged on disk.
+
+Build from Geofabrik extracts (.osm.pbf needs `pip install osmium`; .osm, .osm.bz2 and .osm.gz XML
+need nothing extra). Several extracts are ingested in parallel, one per process:
+    python places_index.py build india-latest.osm.pbf nepal-latest.osm.pbf -o data/places.tsv --workers 4
+    python places_index.py lookup 12.97,77.59 --categories historic
+"""
+import argparse
+import bz2
+import gzip
+import heapq
+import logging
+import math
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from gazetteer import first_at_or_after
+from geo import distance_m, geohash_cells, geohash_encode
+from overpass import CATEGORY_TYPES, PLACE_CATEGORIES, element_categories
+
+try:
+    import osmium
+except ImportError:  # XML extracts still work without pyosmium
+    osmium = None
+
+logger = logging.getLogger('tourism.places_index')
+
+INDEX_PRECISION = 5  # ~4.9 km cells
+COVERAGE_PRECISION = 3  # ~156 km cells
+# A query scans at most this many cells, dropping to coarser (longer) runs for large radii
+MAX_QUERY_CELLS = 16
+# Ways and relations are placed from at most this many of their nodes
+MAX_SAMPLED_NODES = 16
+_COVERAGE_CELL = 180.0 / (1 << (5 * COVERAGE_PRECISION // 2))  # degrees; square at precision 3
+_PLACE_KEYS = ('tourism', 'historic', 'leisure')
+_KIND_ORDER = {'n': 0, 'w': 1, 'r': 2}
+
+# (kind, osm id, tags, lat, lon, node refs or relation members); tags are empty for elements that
+# carry none of the _PLACE_KEYS, and coordinates are only set for nodes
+Element = Tuple[str, int, Dict[str, str], Optional[float], Optional[float], list]
+# (min lat, min lon, max lat, max lon)
+Bounds = Tuple[float, float, float, float]
+# Rings of (lon, lat) points, as in a .poly file; holes are rings too (even-odd rule)
+Boundary = List[List[Tuple[float, float]]]
+
+
+class PlacesIndex:
+    """Read-only, lazily memory-mapped places index, re-mapped when the file is replaced"""
+
+    def __init__(self, path: str, reload_interval: float = 60):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._mm: Optional[mmap.mmap] = None
+        self._mtime: Optional[float] = None
+        self._checked: Optional[float] = None
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'uncovered': 0}
+
+    def _index(self) -> Optional[mmap.mmap]:
+        now = time.monotonic()
+        if self._checked is None or now - self._checked >= self.reload_interval:
+            with self._lock:
+                if self._checked is None or now - self._checked >= self.reload_interval:
+                    self._reload()
+                    self._checked = now
+        return self._mm
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            # No index built: every lookup falls back to Overpass
+            self._mm, self._mtime = None, None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mtime = mtime
+        except (OSError, ValueError) as e:
+            logger.warning("Places index unavailable (%s): %s", self.path, e)
+            self._mm, self._mtime = None, None
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _lines(self, mm: mmap.mmap, prefix: bytes) -> Iterator[bytes]:
+        """Lines whose key starts with prefix"""
+        pos = first_at_or_after(mm, prefix)
+        size = len(mm)
+        while pos < size:
+            end = mm.find(b'\n', pos)
+            if end == -1:
+                end = size
+            line = mm[pos:end]
+            if not line.startswith(prefix):
+                return
+            yield line
+            pos = end + 1
+
+    def _covered(self, mm: mmap.mmap, lat: float, lon: float, radius: float) -> bool:
+        # Every coverage cell the circle reaches must be listed; coverage keys all have the same
+        # length, so a prefix match is an exact match
+        return all(any(True for _ in self._lines(mm, b'!' + cell.encode('ascii')))
+                   for cell in geohash_cells(lat, lon, radius, COVERAGE_PRECISION))
+
+    def covers(self, lat: float, lon: float, radius: float = 0) -> bool:
+        """Whether the indexed extracts include everything within radius metres of the coordinates"""
+        mm = self._index()
+        return mm is not None and self._covered(mm, lat, lon, radius)
+
+    def nearby(self, lat: float, lon: float, radius: float, categories: Optional[Sequence[str]] = None,
+               limit: Optional[int] = None) -> Optional[List[Tuple[str, int, str, bool]]]:
+        """(name, score, category, notable) of the places within radius metres that the Overpass query
+        selects, in the order it outputs them (nodes, ways, relations, each by id) and capped at limit.
+        None when part of the circle is outside the indexed extracts."""
+        mm = self._index()
+        if mm is None or not self._covered(mm, lat, lon, radius):
+            self._count('uncovered')
+            return None
+
+        precision = INDEX_PRECISION
+        cells = geohash_cells(lat, lon, radius, precision)
+        while len(cells) > MAX_QUERY_CELLS and precision > 1:
+            precision -= 1
+            cells = geohash_cells(lat, lon, radius, precision)
+
+        wanted = set(categories or PLACE_CATEGORIES)
+        # ((kind order, id), (name, score, category, notable))
+        found = []
+        for cell in cells:
+            for line in self._lines(mm, cell.encode('ascii')):
+                _, place_lat, place_lon, osm_id, place_categories, notable, score, name = line.split(b'\t')
+                osm_id = osm_id.decode('ascii')
+                kind = osm_id[0]
+                place_categories = place_categories.decode('ascii').split(',')
+                if not any(category in wanted and kind in CATEGORY_TYPES[category] for category in place_categories):
+                    continue
+                if distance_m(lat, lon, float(place_lat), float(place_lon)) > radius:
+                    continue
+                found.append(((_KIND_ORDER[kind], int(osm_id[1:])),
+                              (name.decode('utf-8'), int(score), place_categories[0], notable == b'1')))
+
+        self._count('hits')
+        found.sort(key=lambda item: item[0])
+        places = [place for _, place in found]
+        return places[:limit] if limit else places
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+
+def _open_extract(path: str):
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def _read_xml(path: str, kinds: str) -> Iterator[Element]:
+    """Stream the nodes ('n'), ways ('w') and/or relations ('r') of an OSM XML extract"""
+    wanted = {'node': 'n', 'way': 'w', 'relation': 'r'}
+    with _open_extract(path) as f:
+        events = ElementTree.iterparse(f, events=('start', 'end'))
+        _, root = next(events)
+        for event, elem in events:
+            if event != 'end' or elem.tag not in wanted:
+                continue
+            kind = wanted[elem.tag]
+            if kind in kinds:
+                tags = {}
+                refs = []
+                for child in elem:
+                    if child.tag == 'tag':
+                        tags[child.get('k')] = child.get('v')
+                    elif child.tag == 'nd':
+                        refs.append(int(child.get('ref')))
+                    elif child.tag == 'member':
+                        refs.append((child.get('type')[0], int(child.get('ref'))))
+                if not any(key in tags for key in _PLACE_KEYS):
+                    tags = {}
+                if kind == 'n':
+                    yield kind, int(elem.get('id')), tags, float(elem.get('lat')), float(elem.get('lon')), refs
+                else:
+                    yield kind, int(elem.get('id')), tags, None, None, refs
+            # Drop every finished element so memory stays flat however large the extract is
+            root.clear()
+
+
+def _read_pbf(path: str, kinds: str) -> Iterator[Element]:
+    """Stream the nodes ('n'), ways ('w') and/or relations ('r') of an OSM PBF extract with pyosmium"""
+    if osmium is None:
+        raise RuntimeError("Reading .osm.pbf extracts needs pyosmium (pip install osmium)")
+    entities = osmium.osm.NOTHING
+    for kind, bit in (('n', osmium.osm.NODE), ('w', osmium.osm.WAY), ('r', osmium.osm.RELATION)):
+        if kind in kinds:
+            entities |= bit
+    for obj in osmium.FileProcessor(path, entities):
+        kind = obj.type_str()
+        tags = {tag.k: tag.v for tag in obj.tags} if any(key in obj.tags for key in _PLACE_KEYS) else {}
+        if kind == 'n':
+            if obj.location.valid():
+                yield kind, obj.id, tags, obj.location.lat, obj.location.lon, []
+        elif kind == 'w':
+            yield kind, obj.id, tags, None, None, [node.ref for node in obj.nodes]
+        else:
+            yield kind, obj.id, tags, None, None, [(member.type, member.ref) for member in obj.members]
+
+
+def read_extract(path: str, kinds: str) -> Iterator[Element]:
+    return _read_pbf(path, kinds) if path.endswith('.pbf') else _read_xml(path, kinds)
+
+
+def extract_bounds(path: str) -> Optional[Bounds]:
+    """The bounding box an extract declares (PBF header bbox, XML <bounds>), or None"""
+    if path.endswith('.pbf'):
+        if osmium is None:
+            raise RuntimeError("Reading .osm.pbf extracts needs pyosmium (pip install osmium)")
+        reader = osmium.io.Reader(path, osmium.osm.NOTHING)
+        try:
+            box = reader.header().box()
+        finally:
+            reader.close()
+        if not box.valid():
+            return None
+        return box.bottom_left.lat, box.bottom_left.lon, box.top_right.lat, box.top_right.lon
+    with _open_extract(path) as f:
+        for _, elem in ElementTree.iterparse(f, events=('start',)):
+            if elem.tag == 'bounds':
+                return tuple(float(elem.get(key)) for key in ('minlat', 'minlon', 'maxlat', 'maxlon'))
+            if elem.tag in ('node', 'way', 'relation'):
+                # <bounds> comes first when there is one
+                return None
+    return None
+
+
+def boundary_path(path: str) -> Optional[str]:
+    """The Geofabrik .poly file next to an extract (india-latest.osm.pbf -> india.poly), if there is one"""
+    stem = path
+    for suffix in ('.pbf', '.bz2', '.gz', '.osm'):
+        if stem.endswith(suffix):
+            stem = stem[:-len(suffix)]
+    for candidate in (stem[:-len('-latest')] if stem.endswith('-latest') else None, stem):
+        if candidate and os.path.exists(f"{candidate}.poly"):
+            return f"{candidate}.poly"
+    return None
+
+
+def read_poly(path: str) -> Boundary:
+    """Rings of an Osmosis polygon filter file"""
+    rings = []
+    with open(path, encoding='utf-8') as f:
+        lines = [line.strip() for line in f][1:]  # the first line is the polygon's name
+    ring = None
+    for line in lines:
+        if not line:
+            continue
+        if ring is None:
+            if line == 'END':
+                break
+            ring = []  # section name; '!'-prefixed sections are holes, which the even-odd rule handles
+        elif line == 'END':
+            rings.append(ring)
+            ring = None
+        else:
+            lon, lat = line.split()[:2]
+            ring.append((float(lon), float(lat)))
+    return rings
+
+
+def _inside(boundary: Boundary, lat: float, lon: float) -> bool:
+    """Even-odd point in polygon test"""
+    inside = False
+    for ring in boundary:
+        for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+            if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+    return inside
+
+
+def covered_cells(bounds: Bounds, boundary: Optional[Boundary] = None) -> Set[str]:
+    """Precision-3 geohash cells that lie wholly inside the bounding box and, if given, the boundary"""
+    min_lat, min_lon, max_lat, max_lon = bounds
+    cells = set()
+    for row in range(math.ceil((min_lat + 90) / _COVERAGE_CELL), math.floor((max_lat + 90) / _COVERAGE_CELL)):
+        south, north = -90 + row * _COVERAGE_CELL, -90 + (row + 1) * _COVERAGE_CELL
+        for column in range(math.ceil((min_lon + 180) / _COVERAGE_CELL),
+                            math.floor((max_lon + 180) / _COVERAGE_CELL)):
+            west, east = -180 + column * _COVERAGE_CELL, -180 + (column + 1) * _COVERAGE_CELL
+            if boundary is not None:
+                # Corners and centre inside, and no vertex of the boundary cutting into the cell
+                points = ((south, west), (south, east), (north, west), (north, east),
+                          ((south + north) / 2, (west + east) / 2))
+                if not all(_inside(boundary, lat, lon) for lat, lon in points):
+                    continue
+                if any(south < lat < north and west < lon < east for ring in boundary for lon, lat in ring):
+                    continue
+            cells.add(geohash_encode((south + north) / 2, (west + east) / 2, COVERAGE_PRECISION))
+    return cells
+
+
+def _sample(refs: list, count: int = MAX_SAMPLED_NODES) -> list:
+    """Up to count evenly spaced items, always including the first and last"""
+    if len(refs) <= count:
+        return list(refs)
+    step = (len(refs) - 1) / (count - 1)
+    return [refs[round(i * step)] for i in range(count)]
+
+
+class _SortedSpill:
+    """Collects index lines and writes them out as sorted chunk files of at most chunk_lines lines"""
+
+    def __init__(self, directory: str, chunk_lines: int):
+        self.directory = directory
+        self.chunk_lines = chunk_lines
+        self.lines: List[bytes] = []
+        self.paths: List[str] = []
+
+    def add(self, line: bytes):
+        self.lines.append(line)
+        if len(self.lines) >= self.chunk_lines:
+            self.flush()
+
+    def flush(self):
+        if not self.lines:
+            return
+        self.lines.sort()
+        fd, path = tempfile.mkstemp(suffix='.tsv', dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.writelines(self.lines)
+        self.paths.append(path)
+        self.lines = []
+
+
+def _index_line(osm_id: str, lat: float, lon: float, place: Tuple[str, str, int, str]) -> bytes:
+    categories, notable, score, name = place
+    return (f"{geohash_encode(lat, lon, INDEX_PRECISION)}\t{lat:.6f}\t{lon:.6f}\t{osm_id}\t"
+            f"{categories}\t{notable}\t{score}\t{name}\n").encode('utf-8')
+
+
+def ingest_extract(path: str, directory: str, chunk_lines: int = 200000) -> Tuple[List[str], Set[str], int]:
+    """Index the places of one extract into sorted chunk files in directory.
+
+    Returns (chunk paths, covered precision-3 cells, place count); runs in a worker process. Coverage
+    comes from the extract's boundary, never from the nodes in it: a clipped extract has nodes just
+    across its border, and those cells are only partly in it.
+    """
+    from tourism_system import PlacesAgent, place_score
+
+    get_english_name = PlacesAgent()._get_english_name
+
+    def place(tags: Dict[str, str]) -> Optional[Tuple[str, str, int, str]]:
+        categories = element_categories(tags) if tags else None
+        if not categories:
+            return None
+        # Only English names can ever be shown, so the rest are not indexed
+        name = get_english_name(tags)
+        if not name or '\t' in name or '\n' in name:
+            return None
+        notable = int(bool(tags.get('wikidata') or tags.get('wikipedia')))
+        return ','.join(categories), notable, place_score(tags), name
+
+    spill = _SortedSpill(directory, chunk_lines)
+    started = time.monotonic()
+
+    # Pass 1: matching ways and relations, with a sample of the nodes (and member ways) that locate them
+    pending: Dict[str, Tuple[Tuple[str, str, int, str], list]] = {}
+    member_ways: Dict[int, List[str]] = {}
+    for kind, osm_id, tags, _, _, refs in read_extract(path, 'wr'):
+        found = place(tags)
+        if found is None:
+            continue
+        key = f"{kind}{osm_id}"
+        if kind == 'w':
+            pending[key] = (found, _sample(refs))
+            continue
+        pending[key] = (found, _sample([ref for member_type, ref in refs if member_type == 'n']))
+        for way in _sample([ref for member_type, ref in refs if member_type == 'w']):
+            member_ways.setdefault(way, []).append(key)
+
+    # Pass 2: first node of each sampled relation member way
+    if member_ways:
+        for _, osm_id, _, _, _, refs in read_extract(path, 'w'):
+            if osm_id in member_ways and refs:
+                for key in member_ways[osm_id]:
+                    pending[key][1].append(refs[0])
+    member_ways.clear()
+
+    # Pass 3: matching nodes and the coordinates of sampled nodes
+    needed = {ref for _, refs in pending.values() for ref in refs}
+    locations: Dict[int, Tuple[float, float]] = {}
+    count = 0
+    for _, osm_id, tags, lat, lon, _ in read_extract(path, 'n'):
+        if osm_id in needed:
+            locations[osm_id] = (lat, lon)
+        found = place(tags)
+        if found is not None:
+            spill.add(_index_line(f"n{osm_id}", lat, lon, found))
+            count += 1
+
+    for key, (found, refs) in pending.items():
+        points = [locations[ref] for ref in refs if ref in locations]
+        if not points:
+            # Every node is outside the extract (clipped at its border)
+            continue
+        lats, lons = [point[0] for point in points], [point[1] for point in points]
+        spill.add(_index_line(key, (min(lats) + max(lats)) / 2, (min(lons) + max(lons)) / 2, found))
+        count += 1
+    spill.flush()
+
+    poly = boundary_path(path)
+    bounds = extract_bounds(path)
+    if poly is not None:
+        boundary = read_poly(poly)
+        points = [point for ring in boundary for point in ring]
+        if bounds is None and points:
+            lons, lats = [point[0] for point in points], [point[1] for point in points]
+            bounds = min(lats), min(lons), max(lats), max(lons)
+    else:
+        boundary = None
+    if bounds is None:
+        logger.warning("%s declares no bounding box and has no .poly file; its places are not used", path)
+        cells = set()
+    else:
+        cells = covered_cells(bounds, boundary)
+    logger.info("Indexed %d places from %s in %.1fs", count, path, time.monotonic() - started)
+    return spill.paths, cells, count
+
+
+def build_index(sources: List[str], output: str, workers: int = 1, chunk_lines: int = 200000):
+    """Build a sorted index file from OSM extracts, one extract per worker process"""
+    output_dir = os.path.dirname(os.path.abspath(output))
+    os.makedirs(output_dir, exist_ok=True)
+    # Chunks go next to the output, where there is room for the finished index anyway
+    directory = tempfile.mkdtemp(prefix='places_index_', dir=output_dir)
+    try:
+        if workers > 1 and len(sources) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(sources))) as pool:
+                results = list(pool.map(ingest_extract, sources, [directory] * len(sources),
+                                        [chunk_lines] * len(sources)))
+        else:
+            results = [ingest_extract(source, directory, chunk_lines) for source in sources]
+
+        chunks = [chunk for paths, _, _ in results for chunk in paths]
+        covered = sorted(set().union(*(cells for _, cells, _ in results)))
+        tmp_path = f"{output}.tmp"
+        files = [open(chunk, 'rb') for chunk in chunks]
+        written = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                # '!' sorts before every geohash character, so coverage lines lead the file
+                f.writelines(f"!{cell}\tcovered\n".encode('ascii') for cell in covered)
+                previous = None
+                # k-way merge of the sorted chunks; overlapping extracts produce identical lines once each
+                for line in heapq.merge(*files):
+                    if line != previous:
+                        f.write(line)
+                        written += 1
+                        previous = line
+        finally:
+            for file in files:
+                file.close()
+        os.replace(tmp_path, output)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    print(f"Wrote {written} places covering {len(covered)} cells to {output}")
+
+
+def main():
+    from tourism_system import CONFIG
+
+    parser = argparse.ArgumentParser(description="Build or query the offline places index")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="build an index from OSM extracts (.osm.pbf, .osm, .osm.bz2, .osm.gz)")
+    build.add_argument('sources', nargs='+')
+    build.add_argument('-o', '--output', default=CONFIG['PLACES_INDEX_PATH'] or os.path.join('data', 'places.tsv'))
+    build.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="extracts ingested in parallel")
+    build.add_argument('--chunk-lines', type=int, default=200000, help="lines sorted in memory per chunk")
+    query = sub.add_parser('lookup', help="rank the places around coordinates")
+    query.add_argument('coordinates', metavar='LAT,LON')
+    query.add_argument('--categories', help="comma-separated subset of " + ','.join(PLACE_CATEGORIES))
+    query.add_argument('--radius', type=float, default=CONFIG['OVERPASS_RADIUS'])
+    query.add_argument('-i', '--index', default=CONFIG['PLACES_INDEX_PATH'] or os.path.join('data', 'places.tsv'))
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_index(args.sources, args.output, args.workers, args.chunk_lines)
+        return
+
+    from tourism_system import PlacesAgent
+
+    lat, lon = (float(v) for v in args.coordinates.split(','))
+    categories = tuple(args.categories.split(',')) if args.categories else None
+    agent = PlacesAgent()
+    agent.places_index = PlacesIndex(args.index)
+    print(agent._from_index((lat, lon), categories))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """Token bucket allowing `burst` immediate calls, refilled at `rate` calls per second"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Tokens may go negative: that reserves a future slot so concurrent callers queue up fairly
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class RateLimiter:
+    """Process-wide rate limiter with one token bucket per upstream host"""
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, int]]] = None,
+                 default: Tuple[float, int] = (1.0, 1)):
+        self.limits = dict(limits or {})
+        self.default = default
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.stats_by_host: Dict[str, Dict[str, float]] = {}
+        self.lock = threading.Lock()
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            with self.lock:
+                bucket = self.buckets.get(host)
+                if bucket is None:
+                    rate, burst = self.limits.get(host, self.default)
+                    bucket = TokenBucket(rate, burst)
+                    self.buckets[host] = bucket
+                    self.stats_by_host[host] = {'requests': 0, 'waits': 0, 'wait_seconds_total': 0.0}
+        return bucket
+
+    def reserve(self, url: str) -> float:
+        """Reserve a request slot for the host of `url`; returns the delay to honour (no sleeping)"""
+        host = urlparse(url).hostname or url
+        delay = self._bucket(host).reserve()
+        with self.lock:
+            stats = self.stats_by_host[host]
+            stats['requests'] += 1
+            if delay > 0:
+                stats['waits'] += 1
+                stats['wait_seconds_total'] += delay
+        return delay
+
+    def acquire(self, url: str) -> float:
+        """Block until a request to the host of `url` is within budget; returns the time waited"""
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-host request counts and accumulated rate-limit wait time"""
+        with self.lock:
+            return {host: dict(stats) for host, stats in self.stats_by_host.items()}
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[float, int]]:
+    """Parse 'host=rate:burst,host=rate:burst' (e.g. from an env var) into a limits dict"""
+    limits = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item or '=' not in item:
+            continue
+        host, _, value = item.partition('=')
+        rate, _, burst = value.partition(':')
+        limits[host.strip()] = (float(rate), int(burst or 1))
+    return limits
@@ -0,0 +1,109 @@
+"""Compact record types passed between the agents.
+
+Agents return these records and TourismAIAgent renders text from them once, at the edge. They use
+__slots__ (no per-instance __dict__) because cached and batched paths keep many of them alive.
+pack()/unpack() convert to and from the plain lists and dicts stored in a shared cache tier, and
+as_dict() gives the JSON shape of structured API responses.
+"""
+from typing import Dict, List, NamedTuple, Optional
+
+
+class Coordinates(NamedTuple):
+    """Latitude and longitude; still a (lat, lon) tuple, so it unpacks, hashes and serializes like one"""
+    lat: float
+    lon: float
+
+
+class Attraction:
+    """A ranked place; score, category and notable (linked from Wikidata/Wikipedia) are None when unknown"""
+
+    __slots__ = ('name', 'score', 'category', 'notable')
+
+    def __init__(self, name: str, score: Optional[int] = None, category: Optional[str] = None,
+                 notable: Optional[bool] = None):
+        self.name = name
+        self.score = score
+        self.category = category
+        self.notable = notable
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Attraction):
+            return NotImplemented
+        return (self.name, self.score, self.category, self.notable) == \
+               (other.name, other.score, other.category, other.notable)
+
+    def __repr__(self) -> str:
+        return f"Attraction({self.name!r}, {self.score!r}, {self.category!r}, {self.notable!r})"
+
+    def pack(self) -> List:
+        return [self.name, self.score, self.category, self.notable]
+
+    def as_dict(self) -> Dict:
+        return {'name': self.name, 'score': self.score, 'category': self.category, 'notable': self.notable}
+
+    @classmethod
+    def unpack(cls, item) -> 'Attraction':
+        # Entries cached before attractions were records are bare names
+        if isinstance(item, str):
+            return cls(item)
+        return cls(*item)
+
+
+def pack_attractions(attractions: List[Attraction]) -> List[List]:
+    return [attraction.pack() for attraction in attractions]
+
+
+def unpack_attractions(items: List) -> List[Attraction]:
+    return [Attraction.unpack(item) for item in items]
+
+
+class CurrentWeather:
+    """The fields of an Open-Meteo `current` block the responses use"""
+
+    __slots__ = ('temperature', 'precipitation_probability')
+
+    def __init__(self, temperature: Optional[float], precipitation_probability: float = 0):
+        self.temperature = temperature
+        self.precipitation_probability = precipitation_probability
+
+    def __repr__(self) -> str:
+        return f"CurrentWeather({self.temperature!r}, {self.precipitation_probability!r})"
+
+    @classmethod
+    def from_open_meteo(cls, data: Dict) -> 'CurrentWeather':
+        current = data.get('current', {})
+        # Handle cases where precipitation might be None
+        return cls(current.get('temperature_2m'), current.get('precipitation_probability') or 0)
+
+    def pack(self) -> List:
+        return [self.temperature, self.precipitation_probability]
+
+    def as_dict(self) -> Dict:
+        return {'temperature': self.temperature, 'precipitation_probability': self.precipitation_probability}
+
+    @classmethod
+    def unpack(cls, item: List) -> 'CurrentWeather':
+        return cls(*item)
+
+
+class WeatherResult:
+    """WeatherAgent's answer for a place: the current weather, or an error message to show instead"""
+
+    __slots__ = ('place', 'weather', 'error')
+
+    def __init__(self, place: str, weather: Optional[CurrentWeather] = None, error: Optional[str] = None):
+        self.place = place
+        self.weather = weather
+        self.error = error
+
+
+class PlacesResult:
+    """PlacesAgent's answer for a place: ranked attractions, or an error message to show instead"""
+
+    __slots__ = ('place', 'attractions', 'error')
+
+    def __init__(self, place: str, attractions: Optional[List[Attraction]] = None, error: Optional[str] = None):
+        self.place = place
+        self.attractions = attractions or []
+        self.error = error
+
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+from urllib.parse import urlparse
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Stop calling an upstream after `failure_threshold` consecutive failures.
+
+    While open, calls are rejected immediately; after `reset_timeout` seconds one probe call is let
+    through (half-open) and its outcome closes or re-opens the circuit. A probe that never reports
+    back (e.g. a cancelled task) is replaced after another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.probe_started = 0.0
+        self.counters = {'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; a True in half-open state claims the single probe"""
+        with self.lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and (not self.probing or now - self.probe_started >= self.reset_timeout):
+                self.probing = True
+                self.probe_started = now
+                return True
+            self.counters['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.counters['successes'] += 1
+            self.failures = 0
+            self.state = CLOSED
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.counters['failures'] += 1
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.counters['opened'] += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return dict(self.counters, state=self.state, consecutive_failures=self.failures)
+
+
+class CircuitBreakers:
+    """Process-wide circuit breakers, one per upstream host"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.lock = threading.Lock()
+
+    def get(self, url: str) -> CircuitBreaker:
+        host = urlparse(url).hostname or url
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            with self.lock:
+                breaker = self.breakers.setdefault(host, CircuitBreaker(self.failure_threshold, self.reset_timeout))
+        return breaker
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-host state and counters"""
+        with self.lock:
+            breakers = dict(self.breakers)
+        return {host: breaker.stats() for host, breaker in breakers.items()}
+
+
+class LatencyWindow:
+    """The last `size` latency samples of one host, for percentile estimates"""
+
+    def __init__(self, size: int = 200):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, quantile: float, min_samples: int = 1) -> Optional[float]:
+        with self.lock:
+            if len(self.samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+class HedgingPolicy:
+    """When to send a duplicate request to a mirror, plus the counters to judge whether it pays off.
+
+    A request is hedged once it has been outstanding longer than the `quantile` latency of its host
+    (after `min_samples` observations), or immediately if the host's circuit is open.
+    """
+
+    def __init__(self, quantile: float = 0.9, min_samples: int = 20, window: int = 200):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.window = window
+        self.latencies: Dict[str, LatencyWindow] = {}
+        self.counters = {'requests': 0, 'hedges': 0, 'failovers': 0, 'primary_wins': 0, 'hedge_wins': 0,
+                         'failover_wins': 0}
+        self.lock = threading.Lock()
+
+    def _window(self, url: str) -> LatencyWindow:
+        host = urlparse(url).hostname or url
+        window = self.latencies.get(host)
+        if window is None:
+            with self.lock:
+                window = self.latencies.setdefault(host, LatencyWindow(self.window))
+        return window
+
+    def record_latency(self, url: str, seconds: float):
+        self._window(url).record(seconds)
+
+    def delay(self, url: str) -> Optional[float]:
+        """Seconds to wait for `url` before hedging, or None while there are too few samples"""
+        return self._window(url).percentile(self.quantile, self.min_samples)
+
+    def count(self, name: str):
+        with self.lock:
+            self.counters[name] += 1
+
+    def count_win(self, reason: Optional[str]):
+        """Count the winner by why it was sent: the primary (None), a hedge or a failover"""
+        self.count({None: 'primary_wins', 'hedges': 'hedge_wins', 'failovers': 'failover_wins'}[reason])
+
+    def stats(self) -> Dict:
+        with self.lock:
+            stats = dict(self.counters)
+        stats['hedge_win_rate'] = stats['hedge_wins'] / stats['hedges'] if stats['hedges'] else 0.0
+        stats['delay_seconds'] = {host: window.percentile(self.quantile, self.min_samples)
+                                  for host, window in list(self.latencies.items())}
+        return stats
@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalescing stays within the process
+    fcntl = None
+
+from cache import MISS
+
+logger = logging.getLogger('tourism.singleflight')
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key so only one reaches the upstream.
+
+    Within a process, followers wait on the leader's result. Across processes (gunicorn workers),
+    leaders of the same key serialize on a lock file for that key and then re-check the shared cache,
+    so only the first worker fetches and the others read what it stored. Different keys never wait
+    on each other.
+    """
+
+    def __init__(self, lock_dir: Optional[str] = None, lock_timeout: float = 35):
+        self.calls: Dict[str, _Call] = {}
+        self.lock = threading.Lock()
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.lock_timeout = lock_timeout
+        self.counters = {'leaders': 0, 'followers': 0}
+        if self.lock_dir:
+            try:
+                os.makedirs(self.lock_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning("Cross-process coalescing disabled: %s", e)
+                self.lock_dir = None
+
+    def do(self, key: str, fn: Callable[[], Any], recheck: Optional[Callable[[], Any]] = None) -> Any:
+        """Return fn() for key, sharing one execution between concurrent callers.
+
+        recheck, if given, looks the key up in a shared cache and returns MISS when absent; it enables
+        coalescing across processes.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self.calls[key] = call
+                self.counters['leaders'] += 1
+            else:
+                self.counters['followers'] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_leader(key, fn, recheck)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+            call.event.set()
+
+    def _run_leader(self, key: str, fn: Callable[[], Any], recheck: Optional[Callable[[], Any]]) -> Any:
+        if recheck is None or not self.lock_dir:
+            return fn()
+
+        path = os.path.join(self.lock_dir, f"{hashlib.md5(key.encode('utf-8')).hexdigest()}.lock")
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                handle = open(path, 'a+')
+            except OSError:
+                return fn()
+            with handle:
+                locked = self._flock(handle, deadline)
+                if locked and not _is_current(handle, path):
+                    # The previous leader removed this file when it finished; lock the one now at path
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+                    continue
+                try:
+                    # Another worker may have fetched and cached this key while we waited for the lock
+                    if locked:
+                        cached = recheck()
+                        if cached is not MISS:
+                            return cached
+                    return fn()
+                finally:
+                    if locked:
+                        # Removed while still held, so lock files do not pile up one per key
+                        try:
+                            os.unlink(path)
+                        except OSError:
+                            pass
+                        fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _flock(self, handle, deadline: float) -> bool:
+        """Take the file lock, giving up at deadline so a stuck worker cannot block others"""
+        while True:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.05)
+            except OSError:
+                return False
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.counters)
+
+
+def _is_current(handle, path: str) -> bool:
+    """Whether the open lock file is still the one at path"""
+    try:
+        return os.fstat(handle.fileno()).st_ino == os.stat(path).st_ino
+    except OSError:
+        return False
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight for coroutines sharing one event loop"""
+
+    def __init__(self):
+        self.calls: Dict[str, asyncio.Future] = {}
+        self.counters = {'leaders': 0, 'followers': 0}
+
+    async def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Return await fn() for key, sharing one execution between concurrent callers"""
+        future = self.calls.get(key)
+        if future is not None:
+            self.counters['followers'] += 1
+            # shield() so one cancelled follower does not cancel the shared call
+            return await asyncio.shield(future)
+
+        self.counters['leaders'] += 1
+        future = asyncio.ensure_future(fn())
+        self.calls[key] = future
+        future.add_done_callback(lambda _: self.calls.pop(key, None))
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counters)
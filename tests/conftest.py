@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Offline defaults: no shared cache file, no precomputed tiles or places index
+os.environ.setdefault('CACHE_PATH', '')
+os.environ.setdefault('REDIS_URL', '')
+os.environ.setdefault('TILES_PATH', '')
+os.environ.setdefault('PLACES_INDEX_PATH', '')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,116 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import tourism_system  # noqa: E402
+from app import app  # noqa: E402
+from bench_replay import FIXTURES, StubUpstreams, clear_caches, load_fixtures  # noqa: E402
+
+STUB_HOST = '127.0.0.1'
+
+
+@pytest.fixture(scope='module')
+def stub():
+    stub = StubUpstreams(load_fixtures(FIXTURES), {}).start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def client(stub, monkeypatch):
+    monkeypatch.setitem(tourism_system.CONFIG, 'NOMINATIM_URL', f"{stub.base_url}/search")
+    monkeypatch.setitem(tourism_system.CONFIG, 'OPENMETEO_URL', f"{stub.base_url}/v1/forecast")
+    monkeypatch.setitem(tourism_system.CONFIG, 'OVERPASS_URL', f"{stub.base_url}/api/interpreter")
+    monkeypatch.setitem(tourism_system.CONFIG, 'OVERPASS_MIRRORS', [])
+    # The stub is not a public API: no need to wait a second between calls
+    monkeypatch.setitem(tourism_system.RATE_LIMITER.limits, STUB_HOST, (1000.0, 100))
+    tourism_system.RATE_LIMITER.buckets.pop(STUB_HOST, None)
+    clear_caches()
+    yield app.test_client()
+    tourism_system.RATE_LIMITER.buckets.pop(STUB_HOST, None)
+    clear_caches()
+
+
+def test_structured_response(client):
+    reply = client.post('/chat?format=structured',
+                        json={'message': "I'm going to Bangalore, what's the temperature and what are the places I can visit?"})
+    assert reply.status_code == 200
+    payload = reply.get_json()
+    assert set(payload) == {'place', 'coordinates', 'weather', 'places', 'response'}
+    assert payload['place'] == 'Bangalore'
+    assert payload['weather'] == {'temperature': 26.4, 'precipitation_probability': 35}
+    assert payload['places'] and all(set(place) >= {'name'} for place in payload['places'])
+    assert payload['response'].startswith("In Bangalore it's currently 26.4°C")
+
+
+def test_structured_response_by_accept_header(client):
+    reply = client.post('/chat', json={'message': "What's the weather in Paris?"},
+                        headers={'Accept': 'application/vnd.tourism+json'})
+    assert reply.get_json()['weather'] == {'temperature': 26.4, 'precipitation_probability': 35}
+
+
+def test_structured_fields_and_limit(client, stub):
+    before = dict(stub.requests)
+    reply = client.post('/chat?format=structured&fields=places&limit=2', json={'message': "Sightseeing in Barcelona"})
+    payload = reply.get_json()
+    assert list(payload) == ['places']
+    assert len(payload['places']) == 2
+    # Only the fields asked for are fetched
+    assert stub.requests['openmeteo'] == before['openmeteo']
+
+
+@pytest.mark.parametrize('query', ['format=xml', 'format=structured&fields=places,hotels',
+                                   'format=structured&limit=-1', 'format=structured&limit=two'])
+def test_structured_rejects_unknown_options(client, query):
+    reply = client.post(f'/chat?{query}', json={'message': "Sightseeing in Barcelona"})
+    assert reply.status_code == 400
+    assert 'error' in reply.get_json()
+
+
+def test_structured_early_reply(client):
+    payload = client.post('/chat?format=structured', json={'message': "Hello there"}).get_json()
+    assert payload == {'response': payload['errors']['place'], 'errors': {'place': payload['response']}}
+    assert client.post('/chat?format=structured&fields=places',
+                       json={'message': "Hello there"}).get_json() == {'errors': {'place': payload['response']}}
+
+
+def test_plain_text_response_is_unchanged(client):
+    payload = client.post('/chat', json={'message': "What's the weather in Paris?"}).get_json()
+    assert list(payload) == ['response']
+    assert payload['response'].startswith("In Paris it's currently 26.4°C")
+
+
+def _sources(explained):
+    return {node['node']: node['source'] for node in explained['nodes']}
+
+
+def test_explain_makes_no_upstream_calls(client, stub):
+    before = dict(stub.requests)
+    explained = client.post('/chat/explain', json={'message': "What's the weather in Paris?"}).get_json()
+    assert stub.requests == before
+    assert explained['place'] == 'Paris'
+    assert _sources(explained) == {'geocode': 'gazetteer', 'weather': 'openmeteo', 'places': 'skipped',
+                                   'format': 'local'}
+    assert explained['upstream_calls'] == {'nominatim': 0, 'openmeteo': 1, 'overpass': 0}
+    assert {node['node']: node['needs'] for node in explained['nodes']}['format'] == ['weather']
+
+
+def test_explain_sees_what_the_cache_answers(client):
+    message = "Sightseeing in Barcelona"
+    assert _sources(client.post('/chat/explain', json={'message': message}).get_json())['places'] == 'overpass'
+    client.post('/chat', json={'message': message})
+    explained = client.post('/chat/explain', json={'message': message}).get_json()
+    assert _sources(explained)['places'] == 'cache'
+    assert explained['upstream_calls'] == {'nominatim': 0, 'openmeteo': 0, 'overpass': 0}
+
+
+def test_explain_skips_the_agents_for_an_unknown_place(client):
+    message = "weather in Atlantis"
+    assert _sources(client.post('/chat/explain', json={'message': message}).get_json())['geocode'] == 'nominatim'
+    client.post('/chat', json={'message': message})
+    explained = client.post('/chat/explain', json={'message': message}).get_json()
+    assert _sources(explained) == {'geocode': 'cache', 'weather': 'skipped', 'places': 'skipped', 'format': 'local'}
+    assert explained['upstream_calls'] == {'nominatim': 0, 'openmeteo': 0, 'overpass': 0}
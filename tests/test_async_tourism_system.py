@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+import tourism_system
+from async_tourism_system import AsyncTourismAIAgent
+from http_client import AsyncHTTPClient
+
+
+@pytest.fixture
+def agent():
+    return AsyncTourismAIAgent()
+
+
+def test_batch_and_explain_are_coroutines(agent):
+    assert asyncio.iscoroutinefunction(agent.process_batch)
+    assert asyncio.iscoroutinefunction(agent.explain)
+    assert asyncio.iscoroutinefunction(agent.weather_agent.get_weather_many)
+    assert asyncio.iscoroutinefunction(agent.weather_agent.execute_many)
+
+
+def test_async_batch_answers_unfinished_lookups_as_timed_out(agent, monkeypatch):
+    paris, tokyo = tourism_system.Coordinates(48.85, 2.35), tourism_system.Coordinates(35.68, 139.69)
+
+    async def get_coordinates(place):
+        return {'Paris': paris, 'Tokyo': tokyo}[place]
+
+    async def get_places(coordinates, categories=None):
+        if coordinates == tokyo:
+            await asyncio.sleep(0.5)
+        return [tourism_system.Attraction('Louvre')]
+
+    monkeypatch.setitem(tourism_system.CONFIG, 'BATCH_DEADLINE', 0.2)
+    monkeypatch.setattr(agent.geocoding_service, 'get_coordinates', get_coordinates)
+    monkeypatch.setattr(agent.places_agent, 'get_places', get_places)
+    started = time.monotonic()
+    replies = asyncio.run(agent.process_batch(["Places to visit in Paris", "Places to visit in Tokyo"]))
+    assert time.monotonic() - started < 0.45
+    assert replies == ["In Paris these are the places you can go,\n\nLouvre",
+                       "Tourist attractions for Tokyo are taking too long to load, please try again shortly."]
+
+
+def test_async_explain_matches_the_sync_plan(agent):
+    message = "Weather in Paris"
+    assert asyncio.run(agent.explain(message)) == tourism_system.TourismAIAgent().explain(message)
+
+
+def test_client_of_a_previous_event_loop_is_closed():
+    client = AsyncHTTPClient()
+
+    async def current():
+        return client.client
+
+    first = asyncio.run(current())
+    second = asyncio.run(current())
+    assert second is not first
+    assert first.is_closed
+    asyncio.run(client.aclose())
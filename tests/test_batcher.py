@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+from batcher import AsyncMicroBatcher, MicroBatcher
+
+
+def _call_concurrently(batcher, items):
+    results = {}
+
+    def call(i, item):
+        try:
+            results[i] = batcher.call(item)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i, item)) for i, item in enumerate(items)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [results[i] for i in range(len(items))]
+
+
+def test_concurrent_calls_share_one_bulk_call():
+    batches = []
+
+    def fn_many(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    batcher = MicroBatcher(fn_many, window=0.2, max_size=50)
+    assert _call_concurrently(batcher, [1, 2, 2, 3]) == [10, 20, 20, 30]
+    # Duplicate items are sent once
+    assert len(batches) == 1 and sorted(batches[0]) == [1, 2, 3]
+    assert batcher.stats() == {'calls': 4, 'batches': 1, 'items': 3}
+
+
+def test_full_batch_is_sent_before_the_window_ends():
+    batcher = MicroBatcher(lambda items: list(items), window=5, max_size=2)
+    assert _call_concurrently(batcher, ['a', 'b']) == ['a', 'b']
+    assert batcher.stats()['batches'] == 1
+
+
+def test_bulk_call_error_reaches_every_caller():
+    def fn_many(items):
+        raise ValueError("upstream down")
+
+    results = _call_concurrently(MicroBatcher(fn_many, window=0.1), [1, 2])
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_async_batcher_coalesces_calls():
+    batches = []
+
+    async def fn_many(items):
+        batches.append(list(items))
+        return [item.upper() for item in items]
+
+    async def main():
+        batcher = AsyncMicroBatcher(fn_many, window=0.05, max_size=50)
+        return await asyncio.gather(*(batcher.call(item) for item in ['a', 'b', 'a']))
+
+    assert asyncio.run(main()) == ['A', 'B', 'A']
+    assert batches == [['a', 'b']]
+
+
+def test_async_batcher_propagates_errors():
+    async def fn_many(items):
+        raise ValueError("upstream down")
+
+    async def main():
+        batcher = AsyncMicroBatcher(fn_many, window=0.01)
+        return await asyncio.gather(batcher.call(1), batcher.call(2), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(main()))
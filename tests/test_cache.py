@@ -0,0 +1,136 @@
+import time
+
+import pytest
+
+from cache import MISS, LRUCache, RedisCache, RedisError, SQLiteCache, TwoTierCache
+from fake_redis import FakeRedisServer
+
+
+@pytest.fixture
+def server():
+    server = FakeRedisServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def redis_cache(server):
+    return RedisCache(server.url, 'test')
+
+
+def test_set_and_get_entry(redis_cache):
+    redis_cache.set_entry('paris', [48.85, 2.35], time.time() + 60)
+    value, expires_at = redis_cache.get_entry('paris')
+    assert value == [48.85, 2.35]
+    assert time.time() + 55 < expires_at <= time.time() + 60
+
+
+def test_missing_key_is_none(redis_cache):
+    assert redis_cache.get_entry('nowhere') is None
+
+
+def test_entries_expire(redis_cache):
+    redis_cache.set_entry('paris', 'soon gone', time.time() + 0.05)
+    time.sleep(0.1)
+    assert redis_cache.get_entry('paris') is None
+
+
+def test_expired_set_is_skipped(redis_cache):
+    redis_cache.set_entry('paris', 'already gone', time.time() - 1)
+    assert redis_cache.get_entry('paris') is None
+
+
+def test_delete(redis_cache):
+    redis_cache.set_entry('paris', 1, time.time() + 60)
+    redis_cache.delete('paris')
+    assert redis_cache.get_entry('paris') is None
+
+
+def test_namespaces_are_separate(server):
+    geocode = RedisCache(server.url, 'geocode')
+    weather = RedisCache(server.url, 'weather')
+    geocode.set_entry('paris', 'coordinates', time.time() + 60)
+    assert weather.get_entry('paris') is None
+
+
+def test_error_reply_does_not_desync_the_connection(redis_cache):
+    redis_cache.set_entry('paris', 'paris value', time.time() + 60)
+    redis_cache.set_entry('tokyo', 'tokyo value', time.time() + 60)
+    # An error reply first in a pipeline must not leave the later replies unread
+    with pytest.raises(RedisError):
+        redis_cache._pipeline([(b'BOGUS',), (b'GET', redis_cache._key('paris')),
+                               (b'PTTL', redis_cache._key('paris'))])
+    assert redis_cache.get_entry('tokyo')[0] == 'tokyo value'
+    assert redis_cache.get_entry('paris')[0] == 'paris value'
+
+
+def test_two_tier_cache_promotes_shared_hits(redis_cache):
+    cache = TwoTierCache(LRUCache(16), redis_cache)
+    cache.set('paris', {'lat': 48.85}, 60)
+    other_worker = TwoTierCache(LRUCache(16), redis_cache)
+    assert other_worker.get('paris') == {'lat': 48.85}
+    assert other_worker.get('paris') == {'lat': 48.85}
+    assert other_worker.stats()['shared_hits'] == 1
+    assert other_worker.stats()['local_hits'] == 1
+    assert other_worker.get('tokyo') is MISS
+
+
+def _rows(cache):
+    return cache._connection().execute('SELECT COUNT(*) FROM cache WHERE namespace = ?',
+                                       (cache.namespace,)).fetchone()[0]
+
+
+def test_sqlite_purges_expired_rows_on_schedule(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), 'geocode', purge_every=3)
+    cache.set_entry('gone', 1, time.time() - 1)
+    cache.set_entry('paris', 1, time.time() + 60)
+    assert _rows(cache) == 2
+    cache.set_entry('tokyo', 1, time.time() + 60)
+    assert _rows(cache) == 2
+
+
+def test_sqlite_keeps_newest_rows_up_to_max_rows(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), 'geocode', max_rows=2, purge_every=4)
+    other = SQLiteCache(str(tmp_path / 'cache.db'), 'weather')
+    other.set_entry('paris', 1, time.time() + 10)
+    for i, key in enumerate(['a', 'b', 'c', 'd']):
+        cache.set_entry(key, i, time.time() + 60 + i)
+    assert _rows(cache) == 2
+    assert cache.get_entry('a') is None and cache.get_entry('d') is not None
+    # Other namespaces have their own bound
+    assert other.get_entry('paris') is not None
+
+
+def test_async_shared_tier_runs_off_the_event_loop():
+    import asyncio
+
+    class SlowShared:
+        def get_entry(self, key):
+            time.sleep(0.2)
+            return ('shared value', time.time() + 60) if key == 'paris' else None
+
+        def set_entry(self, key, value, expires_at):
+            time.sleep(0.2)
+
+    cache = TwoTierCache(LRUCache(16), SlowShared())
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        assert await cache.aget('tokyo') is MISS
+        assert await cache.aget('paris') == 'shared value'
+        await cache.aset('london', 1, 60)
+        task.cancel()
+        return ticks
+
+    # About 0.6 s of shared-tier calls; the loop keeps ticking meanwhile
+    assert asyncio.run(main()) >= 20
+    assert cache.get('paris') == 'shared value'
+    assert cache.stats()['local_hits'] == 1
@@ -0,0 +1,50 @@
+import pytest
+
+from gazetteer import Gazetteer, build_index
+
+# GeoNames dump rows: id, name, asciiname, alternate names, lat, lon, feature class, ..., population
+ROWS = [
+    (1277333, 'Bengaluru', 'Bengaluru', 'Bangalore,Bengalūru,ಬೆಂಗಳೂರು', 12.97194, 77.59369, 8443675),
+    (2988507, 'Paris', 'Paris', 'Lutetia,Paname', 48.85341, 2.3488, 2138551),
+    (4717560, 'Paris', 'Paris', '', 33.66094, -95.55551, 24171),
+    (2643743, 'London', 'London', 'Londres', 51.50853, -0.12574, 8961989),
+    (6058560, 'London', 'London', '', 42.98339, -81.23304, 346765),
+]
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    dump = tmp_path / 'cities.txt'
+    dump.write_text(''.join(
+        '\t'.join([str(geoname_id), name, ascii_name, alternate, str(lat), str(lon), 'P', 'PPLA', 'IN', '', '',
+                   '', '', '', str(population)]) + '\n'
+        for geoname_id, name, ascii_name, alternate, lat, lon, population in ROWS), encoding='utf-8')
+    output = tmp_path / 'gazetteer.tsv'
+    build_index([str(dump)], str(output))
+    return Gazetteer(str(output))
+
+
+def test_lookup_prefers_the_most_populous_place(gazetteer):
+    assert gazetteer.lookup('Paris') == (48.8534, 2.3488)
+    assert gazetteer.lookup('london') == (51.5085, -0.1257)
+
+
+def test_lookup_by_ascii_alias(gazetteer):
+    assert gazetteer.lookup('Bangalore') == gazetteer.lookup('Bengaluru') == (12.9719, 77.5937)
+    # Aliases in other scripts are not indexed
+    assert gazetteer.lookup('ಬೆಂಗಳೂರು') is None
+
+
+def test_unknown_place_is_a_miss(gazetteer):
+    assert gazetteer.lookup('Atlantis') is None
+    assert gazetteer.lookup('Pari') is None
+
+
+def test_complete_ranks_prefix_matches_by_population(gazetteer):
+    assert [name for name, _, _ in gazetteer.complete('lo')] == ['London']
+    assert [name for name, _, _ in gazetteer.complete('ba')] == ['Bengaluru']
+    assert gazetteer.complete('') == []
+
+
+def test_missing_index_misses_everything(tmp_path):
+    assert Gazetteer(str(tmp_path / 'missing.tsv')).lookup('Paris') is None
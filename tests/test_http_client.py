@@ -0,0 +1,71 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_client import HTTPClient
+from rate_limiter import RateLimiter
+
+
+class _Upstream(BaseHTTPRequestHandler):
+    # Statuses (with their Retry-After) answered in turn, then 200
+    script = []
+
+    def do_GET(self):
+        status, retry_after = self.script.pop(0) if self.script else (200, None)
+        self.send_response(status)
+        if retry_after is not None:
+            self.send_header('Retry-After', retry_after)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Upstream)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    _Upstream.script = []
+
+
+def _url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def test_every_retry_goes_through_the_rate_limiter(upstream):
+    _Upstream.script = [(429, '0'), (503, None)]
+    limiter = RateLimiter(default=(1000.0, 10))
+    client = HTTPClient(limiter, retries=2, backoff_factor=0.01)
+    assert client.get(_url(upstream)).status_code == 200
+    assert limiter.stats()['127.0.0.1']['requests'] == 3
+
+
+def test_retry_after_is_honoured(upstream):
+    _Upstream.script = [(429, '0.3')]
+    client = HTTPClient(RateLimiter(default=(1000.0, 10)), retries=1, backoff_factor=0)
+    started = time.monotonic()
+    assert client.get(_url(upstream)).status_code == 200
+    assert time.monotonic() - started >= 0.3
+
+
+def test_long_retry_after_returns_the_response(upstream):
+    _Upstream.script = [(429, '3600')]
+    client = HTTPClient(RateLimiter(default=(1000.0, 10)), retries=2, backoff_factor=0)
+    started = time.monotonic()
+    assert client.get(_url(upstream)).status_code == 429
+    assert time.monotonic() - started < 1
+
+
+def test_retries_give_up_with_the_last_response(upstream):
+    _Upstream.script = [(503, None)] * 3
+    client = HTTPClient(RateLimiter(default=(1000.0, 10)), retries=1, backoff_factor=0)
+    assert client.get(_url(upstream)).status_code == 503
+    assert len(_Upstream.script) == 1
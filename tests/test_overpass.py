@@ -0,0 +1,121 @@
+import json
+import os
+import sys
+
+import pytest
+
+from overpass import OverpassElementStream, OverpassQueryBuilder, OverpassRuntimeError, iter_elements
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+REMARK = "runtime error: Query timed out in \"query\" at line 3 after 26 seconds."
+
+
+def _chunks(body: bytes, size: int):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize('size', [1, 7, 4096])
+def test_stream_raises_on_a_runtime_error_remark(size):
+    body = json.dumps({'version': 0.6, 'elements': [{'type': 'node', 'id': 1, 'tags': {'name': 'Louvre'}}],
+                       'remark': REMARK}).encode()
+    stream = OverpassElementStream()
+    elements = [element for chunk in _chunks(body, size) for element in stream.feed(chunk)]
+    assert [element['id'] for element in elements] == [1]
+    with pytest.raises(OverpassRuntimeError):
+        stream.close()
+    assert stream.remark == REMARK
+
+
+def test_json_response_with_a_remark_is_not_ranked():
+    from tourism_system import PlacesAgent
+
+    data = {'elements': [{'type': 'node', 'id': 1, 'tags': {'name': 'Louvre', 'tourism': 'museum'}}],
+            'remark': REMARK}
+    with pytest.raises(OverpassRuntimeError):
+        PlacesAgent()._extract_place_names(data)
+
+
+def test_remark_failure_is_not_cached(monkeypatch):
+    import tourism_system
+
+    class Response:
+        status_code = 200
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def raise_for_status(self):
+            pass
+
+        def iter_content(self, chunk_size):
+            yield json.dumps({'elements': [], 'remark': REMARK}).encode()
+
+        def json(self):
+            return {'elements': [], 'remark': REMARK}
+
+    agent = tourism_system.PlacesAgent()
+    monkeypatch.setattr(agent, 'places_index', None)
+    monkeypatch.setattr(agent.http, 'post', lambda *args, **kwargs: Response())
+    coordinates = (-33.87, 151.21)
+    result = agent.execute('Sydney', coordinates)
+    assert result.error and 'Overpass runtime error' in result.error
+    assert agent.probe(coordinates, dry_run=True) == (None, tourism_system.MISS)
+
+
+def test_stream_without_remark():
+    body = b'{"elements": [{"type": "node", "id": 1, "tags": {"name": "A"}}, {"type": "node", "id": 2}]}'
+    stream = OverpassElementStream()
+    assert [element['id'] for element in iter_elements(_chunks(body, 5))] == [1]
+    stream.feed(body)
+    stream.close()
+    assert stream.remark is None
+
+
+def test_query_matches_the_legacy_element_types_without_a_limit():
+    query = OverpassQueryBuilder().build(48.85, 2.35)
+    assert query.count('nwr[') == 2 and query.count('nw["leisure"') == 1
+    assert query.splitlines()[-1] == 'out tags;'
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_slim_query_ranks_the_same_top_places(seed):
+    from bench_overpass_query import legacy_view, slim_view
+    from bench_places_parse import synthetic_payload
+    from tourism_system import PlacesAgent
+
+    agent = PlacesAgent()
+    legacy = legacy_view(synthetic_payload(20000, seed))
+    slim = slim_view(legacy, OverpassQueryBuilder().limit)
+    assert len(slim['elements']) < len(legacy['elements'])
+    assert agent._extract_place_names(slim) == agent._extract_place_names(legacy)
+
+
+def test_stream_yields_elements_as_they_complete():
+    stream = OverpassElementStream()
+    assert stream.feed(b'{"version": 0.6, "elem') == []
+    assert stream.feed(b'ents": [{"type": "node", "id": 1, "tags": {"name": "A"}}, {"type": "node", "id"') == [
+        {'type': 'node', 'id': 1, 'tags': {'name': 'A'}}]
+    assert stream.feed(b': 2, "tags": {"name": "B"}}]}') == [{'type': 'node', 'id': 2, 'tags': {'name': 'B'}}]
+    assert stream.close() == []
+
+
+def test_stream_decodes_characters_split_across_chunks():
+    body = json.dumps({'elements': [{'type': 'node', 'id': 1, 'tags': {'name': 'Café Ünïcode 東京'}}]},
+                      ensure_ascii=False).encode('utf-8')
+    assert [element['tags']['name'] for element in iter_elements(_chunks(body, 1))] == ['Café Ünïcode 東京']
+
+
+def test_stream_keeps_untagged_elements_when_asked():
+    body = b'{"elements": [{"type": "node", "id": 1}, {"type": "way", "id": 2, "tags": {"name": "A"}}]}'
+    assert [element['id'] for element in iter_elements([body], tagged_only=False)] == [1, 2]
+
+
+def test_truncated_stream_raises():
+    stream = OverpassElementStream()
+    stream.feed(b'{"elements": [{"type": "node", "id": 1, "tags": {"name": "A"}},')
+    with pytest.raises(ValueError, match="Truncated"):
+        stream.close()
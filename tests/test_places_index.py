@@ -0,0 +1,82 @@
+import pytest
+
+from places_index import PlacesIndex, build_index
+
+EXTRACT = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  {bounds}
+  <node id="1" lat="12.9716" lon="77.5946">
+    <tag k="tourism" v="museum"/>
+    <tag k="name" v="Government Museum"/>
+  </node>
+  <node id="2" lat="12.9507" lon="77.5848">
+    <tag k="leisure" v="park"/>
+    <tag k="name" v="Lalbagh Botanical Garden"/>
+    <tag k="wikidata" v="Q1"/>
+  </node>
+  <node id="3" lat="16.2" lon="81.2"/>
+</osm>
+"""
+BOUNDS = '<bounds minlat="10" minlon="75" maxlat="15" maxlon="80"/>'
+
+
+@pytest.fixture
+def index(tmp_path):
+    extract = tmp_path / 'karnataka.osm'
+    extract.write_text(EXTRACT.format(bounds=BOUNDS))
+    output = tmp_path / 'places.tsv'
+    build_index([str(extract)], str(output))
+    return PlacesIndex(str(output))
+
+
+def test_nearby_places_inside_the_extract(index):
+    places = index.nearby(12.97, 77.59, 20000)
+    assert [name for name, _, _, _ in places] == ['Government Museum', 'Lalbagh Botanical Garden']
+
+
+def test_circle_reaching_past_the_boundary_is_not_covered(index):
+    # Inside the bounding box, but the 20 km circle crosses into a cell only partly inside it
+    assert index.covers(13.0, 75.95)
+    assert not index.covers(13.0, 75.95, 20000)
+    assert index.nearby(13.0, 75.95, 20000) is None
+
+
+def test_nodes_beyond_the_bounds_do_not_add_coverage(index):
+    assert not index.covers(16.2, 81.2)
+
+
+def test_extract_without_bounds_covers_nothing(tmp_path):
+    extract = tmp_path / 'clipped.osm'
+    extract.write_text(EXTRACT.format(bounds=''))
+    output = tmp_path / 'places.tsv'
+    build_index([str(extract)], str(output))
+    assert PlacesIndex(str(output)).nearby(12.97, 77.59, 20000) is None
+
+
+def test_poly_boundary_limits_coverage(tmp_path):
+    extract = tmp_path / 'karnataka-latest.osm'
+    extract.write_text(EXTRACT.format(bounds=BOUNDS))
+    # Triangle over the bounding box: its north-east corner is outside
+    (tmp_path / 'karnataka.poly').write_text("karnataka\n1\n  75.0 10.0\n  81.0 10.0\n  75.0 16.0\nEND\nEND\n")
+    output = tmp_path / 'places.tsv'
+    build_index([str(extract)], str(output))
+    index = PlacesIndex(str(output))
+    assert index.covers(11.5, 76.2)
+    assert not index.covers(13.5, 78.0)
+
+
+def test_nearby_selects_what_the_overpass_query_would(tmp_path):
+    extract = tmp_path / 'karnataka.osm'
+    # A park mapped as a relation: the query looks parks up as nodes and ways only
+    extract.write_text(EXTRACT.format(bounds=BOUNDS).replace('</osm>', '''
+  <node id="4" lat="12.97" lon="77.6"/>
+  <way id="5"><nd ref="4"/><tag k="historic" v="fort"/><tag k="name" v="Bangalore Fort"/></way>
+  <relation id="6"><member type="node" ref="4" role=""/>
+    <tag k="leisure" v="park"/><tag k="name" v="Cubbon Park"/></relation>
+</osm>'''))
+    output = tmp_path / 'places.tsv'
+    build_index([str(extract)], str(output))
+    index = PlacesIndex(str(output))
+    assert [place[0] for place in index.nearby(12.97, 77.59, 20000)] == [
+        'Government Museum', 'Lalbagh Botanical Garden', 'Bangalore Fort']
+    assert [place[0] for place in index.nearby(12.97, 77.59, 20000, ('nature',))] == ['Lalbagh Botanical Garden']
@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from rate_limiter import RateLimiter, TokenBucket, parse_limits
+
+
+def test_bucket_allows_a_burst_then_spaces_calls():
+    bucket = TokenBucket(rate=10, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Each further call reserves the next slot, 1/rate seconds apart
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+
+def test_bucket_refills_over_time():
+    bucket = TokenBucket(rate=20, burst=1)
+    assert bucket.reserve() == 0.0
+    time.sleep(0.06)
+    assert bucket.reserve() == 0.0
+
+
+def test_bucket_never_holds_more_than_its_burst():
+    bucket = TokenBucket(rate=1000, burst=2)
+    time.sleep(0.02)
+    assert [bucket.reserve() > 0 for _ in range(3)] == [False, False, True]
+
+
+def test_hosts_have_separate_budgets_and_stats():
+    limiter = RateLimiter({'nominatim.openstreetmap.org': (1, 1)}, default=(1000, 5))
+    assert limiter.reserve('https://nominatim.openstreetmap.org/search?q=paris') == 0.0
+    assert limiter.reserve('https://nominatim.openstreetmap.org/search?q=rome') == pytest.approx(1.0, abs=0.01)
+    assert limiter.reserve('https://api.open-meteo.com/v1/forecast') == 0.0
+    stats = limiter.stats()
+    assert stats['nominatim.openstreetmap.org']['requests'] == 2
+    assert stats['nominatim.openstreetmap.org']['waits'] == 1
+    assert stats['api.open-meteo.com'] == {'requests': 1, 'waits': 0, 'wait_seconds_total': 0.0}
+
+
+def test_acquire_sleeps_for_its_slot():
+    limiter = RateLimiter(default=(20, 1))
+    limiter.acquire('http://example.org/')
+    started = time.monotonic()
+    waited = limiter.acquire('http://example.org/')
+    assert waited == pytest.approx(0.05, abs=0.01)
+    assert time.monotonic() - started >= 0.04
+
+
+def test_parse_limits():
+    assert parse_limits('overpass-api.de=1:2, api.open-meteo.com=10,bad,') == {
+        'overpass-api.de': (1.0, 2), 'api.open-meteo.com': (10.0, 1)}
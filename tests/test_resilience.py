@@ -0,0 +1,126 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from http_client import CircuitOpenError, HTTPClient
+from rate_limiter import RateLimiter
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakers, HedgingPolicy
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    assert breaker.stats()['opened'] == 2
+
+
+def test_breakers_are_per_host():
+    breakers = CircuitBreakers(failure_threshold=1)
+    breakers.get('https://overpass-api.de/api/interpreter').record_failure()
+    assert breakers.get('https://overpass-api.de/api/status') is breakers.get('https://overpass-api.de/')
+    assert breakers.get('https://overpass.kumi.systems/api/interpreter').allow()
+    assert breakers.stats()['overpass-api.de']['state'] == OPEN
+
+
+def test_hedge_delay_is_the_latency_percentile():
+    policy = HedgingPolicy(quantile=0.9, min_samples=10)
+    for i in range(9):
+        policy.record_latency('https://overpass-api.de/api/interpreter', (i + 1) / 10)
+    assert policy.delay('https://overpass-api.de/api/interpreter') is None
+    policy.record_latency('https://overpass-api.de/api/interpreter', 1.0)
+    assert policy.delay('https://overpass-api.de/api/interpreter') == 1.0
+    assert policy.delay('https://overpass.kumi.systems/api/interpreter') is None
+
+
+class _Slow(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        time.sleep(self.server.delay)
+        body = self.server.name.encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def mirrors():
+    servers = []
+    for name, delay in (('primary', 0.5), ('mirror', 0.0)):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _Slow)
+        server.name, server.delay = name, delay
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    # Different host names, so each URL has its own breaker and latency window
+    yield [f"http://{host}:{server.server_address[1]}/api/interpreter"
+           for host, server in zip(('127.0.0.1', 'localhost'), servers)]
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _client(**kwargs) -> HTTPClient:
+    return HTTPClient(RateLimiter(default=(1000, 100)), retries=0, hedge_workers=4, **kwargs)
+
+
+def test_slow_primary_is_hedged_to_a_mirror(mirrors):
+    hedging = HedgingPolicy(quantile=0.5, min_samples=1)
+    hedging.record_latency(mirrors[0], 0.05)
+    client = _client(hedging=hedging)
+    started = time.monotonic()
+    response = client.post(mirrors[0], data={'data': 'q'}, mirrors=mirrors[1:])
+    assert response.text == 'mirror'
+    assert time.monotonic() - started < 0.4
+    stats = hedging.stats()
+    assert stats['hedges'] == 1 and stats['hedge_wins'] == 1 and stats['hedge_win_rate'] == 1.0
+
+
+def test_open_circuit_fails_over_to_a_mirror(mirrors):
+    breakers = CircuitBreakers(failure_threshold=1, reset_timeout=60)
+    breakers.get(mirrors[0]).record_failure()
+    hedging = HedgingPolicy(min_samples=100)
+    client = _client(breakers=breakers, hedging=hedging)
+    with pytest.raises(CircuitOpenError):
+        client.post(mirrors[0], data={'data': 'q'})
+    assert client.post(mirrors[0], data={'data': 'q'}, mirrors=mirrors[1:]).text == 'mirror'
+    assert hedging.stats()['failover_wins'] == 1
+
+
+def test_circuit_open_error_is_a_connection_error():
+    assert issubclass(CircuitOpenError, requests.exceptions.ConnectionError)
@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+
+from cache import MISS
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'paris'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('paris', fetch, recheck=lambda: MISS)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['paris'] * 5
+    assert len(calls) == 1
+
+
+def test_different_keys_do_not_wait_on_each_other(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    started = time.monotonic()
+    threads = [threading.Thread(target=flight.do, args=(f"place-{i}", lambda: time.sleep(0.2)),
+                                kwargs={'recheck': lambda: MISS})
+               for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - started < 1
+    # Lock files are removed once each key is done
+    assert os.listdir(tmp_path) == []
+
+
+def test_leader_rechecks_what_another_worker_cached(tmp_path):
+    # A second instance stands in for another gunicorn worker sharing the lock directory and cache
+    first, second = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    shared = {}
+
+    def slow_fetch():
+        time.sleep(0.2)
+        shared['paris'] = 'from first'
+        return 'from first'
+
+    thread = threading.Thread(target=first.do, args=('paris', slow_fetch),
+                              kwargs={'recheck': lambda: shared.get('paris', MISS)})
+    thread.start()
+    time.sleep(0.05)
+    assert second.do('paris', lambda: 'from second', recheck=lambda: shared.get('paris', MISS)) == 'from first'
+    thread.join()
+
+
+def test_lock_timeout_sits_between_the_upstream_and_worker_timeouts(monkeypatch):
+    import tourism_system
+
+    lock_timeout = tourism_system.SINGLE_FLIGHT.lock_timeout
+    assert tourism_system.CONFIG['OVERPASS_TIMEOUT'] < lock_timeout < tourism_system.CONFIG['WORKER_TIMEOUT']
+    monkeypatch.setitem(tourism_system.CONFIG, 'WORKER_TIMEOUT', 20)
+    assert tourism_system._lock_timeout() < 20
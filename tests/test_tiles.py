@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from records import Attraction
+from tiles import TileStore, decode_attractions, encode_attractions, read_tiles, write_tiles
+
+LOUVRE = Attraction('Louvre Museum', 12, 'attractions', True)
+EIFFEL = Attraction('Eiffel Tower', 11, 'attractions', True)
+PARK = Attraction('Parc Monceau', 4, 'nature', False)
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / 'tiles.tsv')
+    now = time.time()
+    write_tiles(path, {
+        'u09tv': (now, [LOUVRE, EIFFEL]),
+        'u09tv:nature': (now, [PARK]),
+        'tdr1w': (now - 86400 * 60, [Attraction('Bangalore Palace', 12, 'attractions', True)]),
+    })
+    return path
+
+
+def test_attractions_round_trip():
+    assert decode_attractions(encode_attractions([LOUVRE, PARK])) == [LOUVRE, PARK]
+    # Older files hold bare names
+    assert decode_attractions('Louvre Museum\x1fEiffel Tower') == [Attraction('Louvre Museum'),
+                                                                   Attraction('Eiffel Tower')]
+    assert decode_attractions('') == []
+
+
+def test_lookup_by_cache_key(path):
+    store = TileStore(path)
+    assert store.get('u09tv') == [LOUVRE, EIFFEL]
+    assert store.get('u09tv:nature') == [PARK]
+    # Keys are matched exactly, not by prefix
+    assert store.get('u09t') is None
+    assert store.get('u09tv:historic') is None
+    assert store.get('zzzzz') is None
+    assert store.stats() == {'hits': 2, 'misses': 3, 'stale': 0}
+
+
+def test_tiles_older_than_max_age_are_ignored(path):
+    store = TileStore(path, max_age=86400 * 30)
+    assert store.get('tdr1w') is None
+    assert store.peek('tdr1w') is None
+    assert store.get_entry('tdr1w')[0][0].name == 'Bangalore Palace'
+    assert store.stats()['stale'] == 1
+
+
+def test_peek_does_not_count(path):
+    store = TileStore(path)
+    assert store.peek('u09tv') == [LOUVRE, EIFFEL]
+    assert store.stats() == {'hits': 0, 'misses': 0, 'stale': 0}
+
+
+def test_rebuilt_file_is_picked_up(path):
+    store = TileStore(path, reload_interval=0)
+    assert store.get('u09tv') == [LOUVRE, EIFFEL]
+    tiles = read_tiles(path)
+    tiles['u09tv'] = (time.time(), [EIFFEL])
+    time.sleep(0.01)
+    write_tiles(path, tiles)
+    assert store.get('u09tv') == [EIFFEL]
+
+
+def test_missing_file_misses(tmp_path):
+    assert TileStore(str(tmp_path / 'missing.tsv')).get('u09tv') is None
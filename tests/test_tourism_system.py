@@ -0,0 +1,188 @@
+import pytest
+
+from tourism_system import TourismAIAgent
+
+
+@pytest.fixture(scope='module')
+def agent():
+    return TourismAIAgent()
+
+
+@pytest.mark.parametrize('message', [
+    "What are the attractions in Paris?",
+    "Things to do in Fort Worth",
+    "Places to visit in Hyde Park",
+    "Sightseeing in Temple Bar Dublin",
+])
+def test_generic_wording_and_place_names_keep_all_categories(agent, message):
+    assert agent.place_categories(message, agent.extract_place(message)) is None
+
+
+@pytest.mark.parametrize('message, categories', [
+    ("Museums in Paris", ('attractions',)),
+    ("Castles and gardens near Edinburgh", ('historic', 'nature')),
+])
+def test_category_keywords_narrow_the_query(agent, message, categories):
+    assert agent.place_categories(message, agent.extract_place(message)) == categories
+
+
+def test_keywords_match_whole_words_only(agent):
+    # "art" inside "Stuttgart", "fort" inside "comfortable"
+    assert agent.place_categories("A comfortable stay in Stuttgart") is None
+
+
+def test_batch_answers_unfinished_lookups_as_timed_out(agent, monkeypatch):
+    import time
+    import tourism_system
+
+    paris, tokyo = tourism_system.Coordinates(48.85, 2.35), tourism_system.Coordinates(35.68, 139.69)
+
+    def get_places(coordinates, categories=None):
+        if coordinates == tokyo:
+            time.sleep(0.5)
+        return [tourism_system.Attraction('Louvre')]
+
+    monkeypatch.setitem(tourism_system.CONFIG, 'BATCH_DEADLINE', 0.2)
+    monkeypatch.setattr(agent.geocoding_service, 'get_coordinates',
+                        lambda place: {'Paris': paris, 'Tokyo': tokyo}[place])
+    monkeypatch.setattr(agent.places_agent, 'get_places', get_places)
+    started = time.monotonic()
+    replies = agent.process_batch(["Places to visit in Paris", "Places to visit in Tokyo"])
+    assert time.monotonic() - started < 0.45
+    assert replies[0] == "In Paris these are the places you can go,\n\nLouvre"
+    assert replies[1] == "Tourist attractions for Tokyo are taking too long to load, please try again shortly."
+
+
+def test_batch_rejects_non_object_body():
+    from app import app
+    client = app.test_client()
+    assert client.post('/chat/batch', json=["Weather in Paris"]).status_code == 400
+    assert client.post('/chat/batch', json="Weather in Paris").status_code == 400
+
+
+def test_import_leaves_the_root_logger_alone():
+    import os
+    import subprocess
+    import sys
+
+    # A fresh interpreter, since pytest installs its own root handlers
+    script = ("import logging, tourism_system; root = logging.getLogger(); "
+              "assert not root.handlers and root.level == logging.WARNING; "
+              "assert logging.getLogger('tourism').handlers")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', script], cwd=root, check=True)
+
+
+@pytest.mark.parametrize('messages', [
+    ["Places to visit in Paris"],
+    ["Places to visit in Paris", "What to see in Paris?"],
+])
+def test_batch_deadline_bounds_a_single_slow_lookup(agent, monkeypatch, messages):
+    import time
+    import tourism_system
+
+    def slow_places(coordinates, categories=None):
+        time.sleep(1)
+        return []
+
+    monkeypatch.setitem(tourism_system.CONFIG, 'BATCH_DEADLINE', 0.2)
+    monkeypatch.setattr(agent.geocoding_service, 'get_coordinates',
+                        lambda place: tourism_system.Coordinates(48.85, 2.35))
+    monkeypatch.setattr(agent.places_agent, 'get_places', slow_places)
+    started = time.monotonic()
+    replies = agent.process_batch(messages)
+    assert time.monotonic() - started < 0.6
+    assert all(reply.startswith("Tourist attractions for Paris are taking too long") for reply in replies)
+
+
+def test_batch_deadline_bounds_the_weather_step(agent, monkeypatch):
+    import time
+    import tourism_system
+
+    def slow_weather(coordinates):
+        time.sleep(1)
+        return [None] * len(coordinates)
+
+    monkeypatch.setitem(tourism_system.CONFIG, 'BATCH_DEADLINE', 0.2)
+    monkeypatch.setattr(agent.geocoding_service, 'get_coordinates',
+                        lambda place: tourism_system.Coordinates(48.85, 2.35))
+    monkeypatch.setattr(agent.weather_agent, 'get_weather_many', slow_weather)
+    started = time.monotonic()
+    replies = agent.process_batch(["Weather in Paris"])
+    assert time.monotonic() - started < 0.6
+    assert replies == ["Weather data for Paris is taking too long to load, please try again shortly."]
+
+
+def _open_meteo(started: str, utc_offset: int = 0, temperature: float = 20.0):
+    return {'utc_offset_seconds': utc_offset,
+            'current': {'time': started, 'interval': 900, 'temperature_2m': temperature,
+                        'precipitation_probability': 10}}
+
+
+def test_weather_expires_at_the_end_of_the_reported_interval():
+    import calendar
+    from tourism_system import weather_expiry
+
+    start = calendar.timegm((2026, 10, 17, 12, 0, 0))
+    assert weather_expiry(_open_meteo('2026-10-17T12:00'), start + 100) == start + 900
+    # Local time: 17:30 in India is 12:00 UTC
+    assert weather_expiry(_open_meteo('2026-10-17T17:30', 19800), start + 100) == start + 900
+
+
+def test_weather_expiry_falls_back_to_our_own_clock():
+    import calendar
+    from tourism_system import CONFIG, weather_expiry
+
+    start = calendar.timegm((2026, 10, 17, 12, 0, 0))
+    # An interval that already ended, or no timestamp at all: the next 15-minute boundary
+    assert weather_expiry(_open_meteo('2026-10-17T11:00'), start + 100) == start + 900
+    assert weather_expiry({'current': {}}, start + 100) == start + 900
+    # Never sooner than WEATHER_MIN_TTL
+    assert weather_expiry(_open_meteo('2026-10-17T12:00'), start + 890) == start + 890 + CONFIG['WEATHER_MIN_TTL']
+
+
+def _expired_weather(agent, coordinates, temperature):
+    import time
+    from records import CurrentWeather
+
+    entry = {'weather': CurrentWeather(temperature, 0), 'fresh_until': time.time() - 1}
+    agent.cache.set(agent._cache_key(coordinates), entry, 3600)
+
+
+def test_stale_weather_is_served_while_it_is_refreshed(monkeypatch):
+    import time
+    import tourism_system
+
+    agent = tourism_system.WeatherAgent()
+    coordinates = (-41.29, 174.78)
+    _expired_weather(agent, coordinates, 11.0)
+    fetched = []
+
+    def fetch(coords):
+        fetched.append(coords)
+        return _open_meteo(time.strftime('%Y-%m-%dT%H:%M', time.gmtime()), temperature=14.0)
+
+    monkeypatch.setitem(tourism_system.CONFIG, 'WEATHER_STALE_WHILE_REVALIDATE', True)
+    monkeypatch.setattr(agent, 'fetch', fetch)
+    assert agent.probe(coordinates, dry_run=True)[0] == 'stale'
+    assert agent.get_weather(coordinates).temperature == 11.0
+    for _ in range(100):
+        if agent.probe(coordinates, dry_run=True)[0] == 'cache':
+            break
+        time.sleep(0.01)
+    assert fetched == [coordinates]
+    assert agent.get_weather(coordinates).temperature == 14.0
+
+
+def test_expired_weather_is_refetched_without_stale_while_revalidate(monkeypatch):
+    import time
+    import tourism_system
+
+    agent = tourism_system.WeatherAgent()
+    coordinates = (-36.85, 174.76)
+    _expired_weather(agent, coordinates, 11.0)
+    monkeypatch.setitem(tourism_system.CONFIG, 'WEATHER_STALE_WHILE_REVALIDATE', False)
+    monkeypatch.setattr(agent, 'fetch', lambda coords: _open_meteo(time.strftime('%Y-%m-%dT%H:%M', time.gmtime()),
+                                                                   temperature=14.0))
+    assert agent.probe(coordinates, dry_run=True) == (None, tourism_system.MISS)
+    assert agent.get_weather(coordinates).temperature == 14.0
@@ -0,0 +1,261 @@
+"""Precomputed attraction tiles so popular destinations need no Overpass call.
+
+The tile file is UTF-8 text with one `key<TAB>built_at<TAB>names` line per tile, sorted by key,
+where key is PlacesAgent's cache key (geohash cell, plus the category set for filtered queries),
+built_at is a Unix timestamp and names is the ranked attraction list joined with U+001F, each
+attraction being `name`, score, category and notable (0/1) joined with U+001E (older files hold
+bare names). Like the gazetteer it is memory-mapped read-only, shared by every worker, and searched
+by binary search. A running process picks up a rebuilt file within `reload_interval` seconds.
+
+Build tiles for the most populous places in the gazetteer, then refresh them incrementally
+(only missing or stale tiles are fetched, oldest first):
+    python tiles.py build --top 2000 -o data/tiles.tsv
+    python tiles.py refresh --max-age 604800 --max-fetches 500 -o data/tiles.tsv
+    python tiles.py lookup 12.97,77.59
+"""
+import argparse
+import logging
+import mmap
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from gazetteer import first_at_or_after
+from records import Attraction
+
+logger = logging.getLogger('tourism.tiles')
+
+NAME_SEPARATOR = '\x1f'
+FIELD_SEPARATOR = '\x1e'
+
+
+def encode_attractions(attractions: List[Attraction]) -> str:
+    return NAME_SEPARATOR.join(
+        FIELD_SEPARATOR.join((attraction.name,
+                              '' if attraction.score is None else str(attraction.score),
+                              attraction.category or '',
+                              '' if attraction.notable is None else str(int(attraction.notable))))
+        for attraction in attractions)
+
+
+def decode_attractions(names: str) -> List[Attraction]:
+    attractions = []
+    for item in names.split(NAME_SEPARATOR) if names else ():
+        name, _, fields = item.partition(FIELD_SEPARATOR)
+        if not fields:
+            attractions.append(Attraction(name))
+            continue
+        score, category, notable = fields.split(FIELD_SEPARATOR)
+        attractions.append(Attraction(name, int(score) if score else None, category or None,
+                                      bool(int(notable)) if notable else None))
+    return attractions
+
+
+class TileStore:
+    """Read-only, lazily memory-mapped tile file, re-mapped when the file is replaced"""
+
+    def __init__(self, path: str, max_age: Optional[float] = None, reload_interval: float = 60):
+        self.path = path
+        self.max_age = max_age
+        self.reload_interval = reload_interval
+        self._mm: Optional[mmap.mmap] = None
+        self._mtime: Optional[float] = None
+        self._checked: Optional[float] = None
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'stale': 0}
+
+    def _index(self) -> Optional[mmap.mmap]:
+        now = time.monotonic()
+        if self._checked is None or now - self._checked >= self.reload_interval:
+            with self._lock:
+                if self._checked is None or now - self._checked >= self.reload_interval:
+                    self._reload()
+                    self._checked = now
+        return self._mm
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            # No tiles built yet: every lookup is a miss
+            self._mm, self._mtime = None, None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mtime = mtime
+        except (OSError, ValueError) as e:
+            logger.warning("Tile store unavailable (%s): %s", self.path, e)
+            self._mm, self._mtime = None, None
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get_entry(self, key: str) -> Optional[Tuple[List[Attraction], float]]:
+        """(ranked attractions, built_at) for a tile, or None"""
+        mm = self._index()
+        if mm is None:
+            return None
+        target = key.encode('utf-8')
+        pos = first_at_or_after(mm, target)
+        if pos >= len(mm):
+            return None
+        end = mm.find(b'\n', pos)
+        tile_key, built_at, names = mm[pos:end if end != -1 else len(mm)].split(b'\t')
+        if tile_key != target:
+            return None
+        return decode_attractions(names.decode('utf-8')), float(built_at)
+
+    def get(self, key: str) -> Optional[List[Attraction]]:
+        """Ranked attractions for a tile younger than max_age, or None"""
+        entry = self.get_entry(key)
+        if entry is None:
+            self._count('misses')
+            return None
+        if not self._fresh(entry):
+            self._count('stale')
+            return None
+        self._count('hits')
+        return entry[0]
+
+    def peek(self, key: str) -> Optional[List[Attraction]]:
+        """Like get, without counting the lookup (for dry runs)"""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None and self._fresh(entry) else None
+
+    def _fresh(self, entry: Tuple[List[Attraction], float]) -> bool:
+        return self.max_age is None or time.time() - entry[1] <= self.max_age
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+
+def read_tiles(path: str) -> Dict[str, Tuple[float, List[Attraction]]]:
+    """All tiles in a file as {key: (built_at, attractions)}; empty if the file does not exist"""
+    tiles = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                key, built_at, names = line.rstrip('\n').split('\t')
+                tiles[key] = (float(built_at), decode_attractions(names))
+    except FileNotFoundError:
+        pass
+    return tiles
+
+
+def write_tiles(path: str, tiles: Dict[str, Tuple[float, List[Attraction]]]):
+    """Write tiles sorted by key and atomically replace the file, so readers never see a partial one"""
+    lines = sorted(
+        f"{key}\t{int(built_at)}\t{encode_attractions(attractions)}\n".encode('utf-8')
+        for key, (built_at, attractions) in tiles.items()
+    )
+    tmp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        f.writelines(lines)
+    os.replace(tmp_path, path)
+    print(f"Wrote {len(lines)} tiles to {path}")
+
+
+def top_destinations(gazetteer_path: str, top: int) -> List[Tuple[str, float, float]]:
+    """The `top` most populous distinct places in a gazetteer index, as (name, lat, lon)"""
+    places = {}
+    with open(gazetteer_path, encoding='utf-8') as f:
+        for line in f:
+            _, name, lat, lon, population = line.rstrip('\n').split('\t')
+            places[(name, lat, lon)] = int(population)
+    ranked = sorted(places.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [(name, float(lat), float(lon)) for (name, lat, lon), _ in ranked]
+
+
+def refresh_tiles(destinations: Iterable[Tuple[str, float, float]], output: str,
+                  category_sets: List[Optional[Tuple[str, ...]]], max_age: Optional[float] = None,
+                  max_fetches: Optional[int] = None, prune: bool = False):
+    """Fetch and rank missing or stale tiles for the destinations, keeping everything else.
+
+    max_age None rebuilds every destination tile. Stale tiles are refreshed oldest first, and a tile
+    whose fetch fails keeps its previous contents.
+    """
+    from tourism_system import PlacesAgent
+
+    agent = PlacesAgent()
+    existing = read_tiles(output)
+    now = time.time()
+    jobs = {}
+    for name, lat, lon in destinations:
+        for categories in category_sets:
+            key = agent._cache_key((lat, lon), categories)
+            jobs.setdefault(key, (name, lat, lon, categories))
+
+    tiles = {key: tile for key, tile in existing.items() if not prune or key in jobs}
+    due = [key for key in jobs if max_age is None or key not in tiles or now - tiles[key][0] > max_age]
+    due.sort(key=lambda key: tiles[key][0] if key in tiles else 0)
+    if max_fetches is not None:
+        due = due[:max_fetches]
+
+    print(f"{len(jobs)} destination tiles, {len(due)} to fetch")
+    fetched = failed = 0
+    for key in due:
+        name, lat, lon, categories = jobs[key]
+        try:
+            # Uses the production query and ranking, rate-limited like live traffic
+            tiles[key] = (time.time(), agent._fetch_places(lat, lon, categories))
+            fetched += 1
+        except Exception as e:
+            failed += 1
+            logger.warning("Tile %s (%s) failed: %s", key, name, e)
+    write_tiles(output, tiles)
+    print(f"Fetched {fetched}, failed {failed}")
+
+
+def _category_sets(spec: str) -> List[Optional[Tuple[str, ...]]]:
+    """'all,historic' -> [None, ('historic',)]; 'all' is the unfiltered query"""
+    sets = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        sets.append(None if item == 'all' else (item,))
+    return sets
+
+
+def main():
+    from tourism_system import CONFIG
+
+    parser = argparse.ArgumentParser(description="Build, refresh or query the precomputed attraction tiles")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in (('build', "fetch every destination tile"),
+                               ('refresh', "fetch only missing or stale tiles")):
+        build = sub.add_parser(command, help=help_text)
+        build.add_argument('--gazetteer', default=CONFIG['GAZETTEER_PATH'])
+        build.add_argument('--top', type=int, default=2000, help="number of most populous places")
+        build.add_argument('--categories', default='all,attractions,historic,nature',
+                           help="category sets to precompute; 'all' is the unfiltered query")
+        build.add_argument('--max-fetches', type=int, help="cap on Overpass calls in this run")
+        build.add_argument('--prune', action='store_true', help="drop tiles for places no longer in the top list")
+        build.add_argument('-o', '--output', default=CONFIG['TILES_PATH'])
+        if command == 'refresh':
+            build.add_argument('--max-age', type=float, default=CONFIG['TILES_MAX_AGE'] / 2,
+                               help="refetch tiles older than this many seconds")
+    query = sub.add_parser('lookup', help="show the tile for coordinates")
+    query.add_argument('coordinates', metavar='LAT,LON')
+    query.add_argument('--categories', default='all')
+    query.add_argument('-i', '--index', default=CONFIG['TILES_PATH'])
+    args = parser.parse_args()
+
+    if args.command == 'lookup':
+        from tourism_system import PlacesAgent
+
+        lat, lon = (float(v) for v in args.coordinates.split(','))
+        key = PlacesAgent()._cache_key((lat, lon), _category_sets(args.categories)[0])
+        print(key, TileStore(args.index).get_entry(key))
+        return
+
+    refresh_tiles(top_destinations(args.gazetteer, args.top), args.output, _category_sets(args.categories),
+                  max_age=getattr(args, 'max_age', None), max_fetches=args.max_fetches, prune=args.prune)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,28 @@
+import calendar
+import logging
 import requests
 import time
 import re
-from typing import Dict, List, Optional, Tuple
+import heapq
+from operator import attrgetter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import os
 from dotenv import load_dotenv
+from rate_limiter import RateLimiter, parse_limits
+from http_client import HTTPClient
+from resilience import CircuitBreakers, HedgingPolicy
+from singleflight import SingleFlight
+from batcher import MicroBatcher
+from gazetteer import Gazetteer
+from tiles import TileStore
+from places_index import PlacesIndex
+from overpass import PLACE_CATEGORIES, OverpassQueryBuilder, check_remark, element_categories, iter_elements
+from cache import MISS, BackgroundRefresher, LRUCache, TwoTierCache, normalize_key, open_shared_cache
+from geo import geohash_encode, grid_key
+from metrics import REGISTRY, STAGE_SECONDS
+from records import (Attraction, Coordinates, CurrentWeather, PlacesResult, WeatherResult, pack_attractions,
+                     unpack_attractions)
 
 load_dotenv()
 
@@ -12,275 +31,833 @@ CONFIG = {
     'NOMINATIM_URL': 'https://nominatim.openstreetmap.org/search',
     'OPENMETEO_URL': 'https://api.open-meteo.com/v1/forecast',
     'OVERPASS_URL': 'https://overpass-api.de/api/interpreter',
-    'REQUEST_DELAY': 1
+    'REQUEST_DELAY': 1,
+    # Per-host token buckets as (requests per second, burst); hosts not listed get 1/REQUEST_DELAY
+    'RATE_LIMITS': {
+        'nominatim.openstreetmap.org': (1.0, 1),
+        'api.open-meteo.com': (10.0, 10),
+        'overpass-api.de': (1.0, 2),
+        **parse_limits(os.getenv('RATE_LIMITS', ''))
+    },
+    # Pooled keep-alive session shared by all agents, retrying 429/5xx with exponential backoff
+    'HTTP_POOL_CONNECTIONS': int(os.getenv('HTTP_POOL_CONNECTIONS', 10)),
+    'HTTP_POOL_MAXSIZE': int(os.getenv('HTTP_POOL_MAXSIZE', 20)),
+    'HTTP_RETRIES': int(os.getenv('HTTP_RETRIES', 2)),
+    'HTTP_BACKOFF': float(os.getenv('HTTP_BACKOFF', 0.5)),
+    # Per-host circuit breakers: fail fast for CIRCUIT_RESET_TIMEOUT seconds after this many failures in a row
+    'CIRCUIT_FAILURE_THRESHOLD': int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5)),
+    'CIRCUIT_RESET_TIMEOUT': float(os.getenv('CIRCUIT_RESET_TIMEOUT', 30)),
+    # Overpass mirrors raced once the primary is slower than its HEDGE_QUANTILE latency ('' disables hedging)
+    'OVERPASS_MIRRORS': [url.strip() for url in os.getenv('OVERPASS_MIRRORS', '').split(',') if url.strip()],
+    'HEDGE_QUANTILE': float(os.getenv('HEDGE_QUANTILE', 0.9)),
+    'HEDGE_MIN_SAMPLES': int(os.getenv('HEDGE_MIN_SAMPLES', 20)),
+    # Local sorted, memory-mapped place index consulted before Nominatim ('' disables it)
+    'GAZETTEER_PATH': os.getenv('GAZETTEER_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gazetteer.tsv')),
+    # Two-tier caches: in-process LRU backed by a SQLite file shared by all workers ('' disables the file)
+    'CACHE_PATH': os.getenv('CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'tourism_cache.db')),
+    # redis://host:port/db puts the shared tier on a Redis-protocol server instead of the SQLite file
+    'REDIS_URL': os.getenv('REDIS_URL', ''),
+    # The SQLite tier drops expired rows every CACHE_PURGE_EVERY writes and keeps at most CACHE_MAX_ROWS per namespace
+    'CACHE_MAX_ROWS': int(os.getenv('CACHE_MAX_ROWS', 100000)),
+    'CACHE_PURGE_EVERY': int(os.getenv('CACHE_PURGE_EVERY', 1000)),
+    'GEOCODE_CACHE_SIZE': int(os.getenv('GEOCODE_CACHE_SIZE', 2048)),
+    'GEOCODE_CACHE_TTL': float(os.getenv('GEOCODE_CACHE_TTL', 30 * 24 * 3600)),
+    'GEOCODE_NEGATIVE_TTL': float(os.getenv('GEOCODE_NEGATIVE_TTL', 3600)),
+    # Ranked attraction lists cached per geohash cell (precision 5 ~ 4.9 km cells)
+    'PLACES_CACHE_SIZE': int(os.getenv('PLACES_CACHE_SIZE', 1024)),
+    'PLACES_CACHE_PRECISION': int(os.getenv('PLACES_CACHE_PRECISION', 5)),
+    'PLACES_CACHE_TTL': float(os.getenv('PLACES_CACHE_TTL', 24 * 3600)),
+    # Precomputed ranked attractions for top destinations, consulted before the cache (see tiles.py; '' disables)
+    'TILES_PATH': os.getenv('TILES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'tiles.tsv')),
+    'TILES_MAX_AGE': float(os.getenv('TILES_MAX_AGE', 30 * 24 * 3600)),
+    # Offline OSM places index, answering places queries in-process where it has coverage (see places_index.py; '' disables)
+    'PLACES_INDEX_PATH': os.getenv('PLACES_INDEX_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'places.tsv')),
+    # Current weather cached per model grid cell (degrees) until Open-Meteo's next 15-minute update
+    'WEATHER_CACHE_SIZE': int(os.getenv('WEATHER_CACHE_SIZE', 2048)),
+    'WEATHER_CACHE_GRID': float(os.getenv('WEATHER_CACHE_GRID', 0.1)),
+    'WEATHER_UPDATE_INTERVAL': int(os.getenv('WEATHER_UPDATE_INTERVAL', 900)),
+    'WEATHER_MIN_TTL': float(os.getenv('WEATHER_MIN_TTL', 60)),
+    # Serve expired weather for up to WEATHER_STALE_TTL seconds while refreshing it in the background
+    'WEATHER_STALE_WHILE_REVALIDATE': os.getenv('WEATHER_STALE_WHILE_REVALIDATE', 'true').lower() == 'true',
+    'WEATHER_STALE_TTL': float(os.getenv('WEATHER_STALE_TTL', 3600)),
+    # gunicorn's --timeout (set in Procfile and railway.json): a worker blocked for longer is killed
+    'WORKER_TIMEOUT': float(os.getenv('WORKER_TIMEOUT', 60)),
+    # Read timeout of Overpass calls, the slowest upstream
+    'OVERPASS_TIMEOUT': float(os.getenv('OVERPASS_TIMEOUT', 30)),
+    # Lock files used to coalesce identical lookups across gunicorn workers ('' keeps it in-process)
+    'SINGLEFLIGHT_LOCK_DIR': os.getenv('SINGLEFLIGHT_LOCK_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'locks')),
+    # Overpass query shape: search radius (m), max results before ranking (0: no limit), output mode (tags|center)
+    'OVERPASS_RADIUS': int(os.getenv('OVERPASS_RADIUS', 20000)),
+    'OVERPASS_LIMIT': int(os.getenv('OVERPASS_LIMIT', 0)),
+    'OVERPASS_OUTPUT': os.getenv('OVERPASS_OUTPUT', 'tags'),
+    # Parse Overpass responses incrementally instead of materializing the whole JSON document
+    'OVERPASS_STREAMING': os.getenv('OVERPASS_STREAMING', 'true').lower() == 'true',
+    'OVERPASS_CHUNK_SIZE': int(os.getenv('OVERPASS_CHUNK_SIZE', 64 * 1024)),
+    # Run independent agents (weather, places) in parallel with per-agent deadlines
+    'CONCURRENT_AGENTS': os.getenv('CONCURRENT_AGENTS', 'true').lower() == 'true',
+    'AGENT_WORKERS': int(os.getenv('AGENT_WORKERS', 8)),
+    'WEATHER_DEADLINE': float(os.getenv('WEATHER_DEADLINE', 15)),
+    'PLACES_DEADLINE': float(os.getenv('PLACES_DEADLINE', 35)),
+    # Concurrent weather lookups are collected for this many seconds and sent as one multi-location call (0 disables)
+    'WEATHER_BATCH_WINDOW': float(os.getenv('WEATHER_BATCH_WINDOW', 0.01)),
+    # Batch chat: max messages per request, coordinates per Open-Meteo call, parallel geocoding/Overpass lookups.
+    # Nominatim and Overpass allow ~1 request/s, so a batch of new places must fit BATCH_DEADLINE seconds,
+    # which stays under WORKER_TIMEOUT; lookups still running then are answered as timed out
+    'BATCH_MAX_MESSAGES': int(os.getenv('BATCH_MAX_MESSAGES', 20)),
+    'BATCH_DEADLINE': float(os.getenv('BATCH_DEADLINE', 20)),
+    'WEATHER_BATCH_SIZE': int(os.getenv('WEATHER_BATCH_SIZE', 50)),
+    'BATCH_GEOCODE_WORKERS': int(os.getenv('BATCH_GEOCODE_WORKERS', 4)),
+    'BATCH_PLACES_WORKERS': int(os.getenv('BATCH_PLACES_WORKERS', 2)),
+    # Per-request progress is logged at DEBUG, so the default INFO keeps the hot path quiet
+    'LOG_LEVEL': os.getenv('LOG_LEVEL', 'INFO').upper()
 }
 
+# Only the `tourism` logger tree is configured, so importing this module (under gunicorn, uvicorn,
+# benchmarks or tests) leaves the host's root logger alone
+logger = logging.getLogger('tourism')
+logger.setLevel(CONFIG['LOG_LEVEL'])
+if not logger.handlers:
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    logger.addHandler(_log_handler)
+    logger.propagate = False
+
+def shared_cache(namespace: str):
+    """Cross-worker cache tier for a namespace: the Redis server if REDIS_URL is set, else the SQLite file"""
+    return open_shared_cache(CONFIG['REDIS_URL'] or CONFIG['CACHE_PATH'], namespace,
+                             max_rows=CONFIG['CACHE_MAX_ROWS'], purge_every=CONFIG['CACHE_PURGE_EVERY'])
+
+# Shared by every agent in the process so the per-host budgets are global
+RATE_LIMITER = RateLimiter(CONFIG['RATE_LIMITS'],
+                           default=(1.0 / float(CONFIG.get('REQUEST_DELAY', 1)), 1))
+
+# Breaker state and hedging latencies are per host and shared by the sync and async clients
+CIRCUIT_BREAKERS = CircuitBreakers(failure_threshold=CONFIG['CIRCUIT_FAILURE_THRESHOLD'],
+                                   reset_timeout=CONFIG['CIRCUIT_RESET_TIMEOUT'])
+HEDGING = HedgingPolicy(quantile=CONFIG['HEDGE_QUANTILE'], min_samples=CONFIG['HEDGE_MIN_SAMPLES'])
+
+HTTP_CLIENT = HTTPClient(RATE_LIMITER,
+                         pool_connections=CONFIG['HTTP_POOL_CONNECTIONS'],
+                         pool_maxsize=CONFIG['HTTP_POOL_MAXSIZE'],
+                         retries=CONFIG['HTTP_RETRIES'],
+                         backoff_factor=CONFIG['HTTP_BACKOFF'],
+                         breakers=CIRCUIT_BREAKERS,
+                         hedging=HEDGING,
+                         # Every Overpass caller (agent and batch workers) can have one attempt per URL in
+                         # flight; a smaller pool would queue primaries and count the wait as upstream latency
+                         hedge_workers=(CONFIG['AGENT_WORKERS'] + CONFIG['BATCH_PLACES_WORKERS'])
+                                       * (1 + len(CONFIG['OVERPASS_MIRRORS'])))
+
+# Loaded lazily on first lookup; the mmap'd pages are shared by all workers
+GAZETTEER = Gazetteer(CONFIG['GAZETTEER_PATH']) if CONFIG['GAZETTEER_PATH'] else None
+
+# Mapped lazily like the gazetteer; a rebuilt file is picked up without a restart
+TILES = TileStore(CONFIG['TILES_PATH'], max_age=CONFIG['TILES_MAX_AGE']) if CONFIG['TILES_PATH'] else None
+PLACES_INDEX = PlacesIndex(CONFIG['PLACES_INDEX_PATH']) if CONFIG['PLACES_INDEX_PATH'] else None
+
+def _lock_timeout() -> float:
+    """How long a worker waits on another worker's identical lookup: longer than the slowest upstream call,
+    so a healthy leader is not raced, and shorter than the worker timeout, so waiting cannot get it killed"""
+    slowest, limit = CONFIG['OVERPASS_TIMEOUT'], CONFIG['WORKER_TIMEOUT']
+    if slowest >= limit:
+        logger.warning("OVERPASS_TIMEOUT (%gs) should be below WORKER_TIMEOUT (%gs)", slowest, limit)
+        return limit * 0.8
+    return (slowest + limit) / 2
+
+# Identical concurrent lookups (a trending city) share one upstream request
+SINGLE_FLIGHT = SingleFlight(CONFIG['SINGLEFLIGHT_LOCK_DIR'] if CONFIG['REDIS_URL'] or CONFIG['CACHE_PATH'] else None,
+                             lock_timeout=_lock_timeout())
+
+def _unpack_coordinates(value) -> Optional[Coordinates]:
+    return None if value is None else Coordinates(*value)
+
+def _pack_weather(entry: Dict) -> Dict:
+    return {'weather': entry['weather'].pack(), 'fresh_until': entry['fresh_until']}
+
+def _unpack_weather(entry: Dict) -> Dict:
+    # Entries written before weather was a record hold the raw Open-Meteo answer
+    weather = (CurrentWeather.from_open_meteo(entry['data']) if 'data' in entry
+               else CurrentWeather.unpack(entry['weather']))
+    return {'weather': weather, 'fresh_until': entry['fresh_until']}
+
+# One cache per namespace and process, shared by every agent instance (sync and async, and the
+# WeatherAgent the batcher creates per batch). The in-process tier holds records, the shared tier plain data.
+GEOCODE_CACHE = TwoTierCache(LRUCache(CONFIG['GEOCODE_CACHE_SIZE']), shared_cache('geocode'),
+                             unpack=_unpack_coordinates)
+WEATHER_CACHE = TwoTierCache(LRUCache(CONFIG['WEATHER_CACHE_SIZE']), shared_cache('weather'),
+                             pack=_pack_weather, unpack=_unpack_weather)
+PLACES_CACHE = TwoTierCache(LRUCache(CONFIG['PLACES_CACHE_SIZE']), shared_cache('places'),
+                            pack=pack_attractions, unpack=unpack_attractions)
+
+_CACHES = {'geocode': GEOCODE_CACHE, 'weather': WEATHER_CACHE, 'places': PLACES_CACHE}
+_BREAKER_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+REGISTRY.collect('tourism_cache_lookups_total', 'Cache lookups by outcome (local_hits, shared_hits, misses)',
+                 'counter', lambda: (('', {'cache': name, 'result': result}, cache.stats()[result])
+                                     for name, cache in _CACHES.items()
+                                     for result in ('local_hits', 'shared_hits', 'misses')))
+REGISTRY.collect('tourism_cache_hit_ratio', 'Share of cache lookups answered without an upstream call', 'gauge',
+                 lambda: (('', {'cache': name}, stats['hits'] / max(1, stats['hits'] + stats['misses']))
+                          for name, stats in ((name, cache.stats()) for name, cache in _CACHES.items())))
+REGISTRY.collect('tourism_tile_lookups_total', 'Precomputed tile lookups by outcome (hits, misses, stale)',
+                 'counter', lambda: (('', {'result': result}, value) for result, value in TILES.stats().items())
+                 if TILES is not None else ())
+REGISTRY.collect('tourism_places_index_lookups_total', 'Offline places index lookups by outcome (hits, uncovered)',
+                 'counter', lambda: (('', {'result': result}, value) for result, value in PLACES_INDEX.stats().items())
+                 if PLACES_INDEX is not None else ())
+REGISTRY.collect('tourism_circuit_state', 'Circuit breaker state per host (0 closed, 1 half-open, 2 open)',
+                 'gauge', lambda: (('', {'host': host}, _BREAKER_STATES[stats['state']])
+                                   for host, stats in CIRCUIT_BREAKERS.stats().items()))
+REGISTRY.collect('tourism_hedging_total', 'Hedged Overpass requests by event', 'counter',
+                 lambda: (('', {'event': event}, value) for event, value in HEDGING.stats().items()
+                          if isinstance(value, int)))
+REGISTRY.collect('tourism_hedge_win_ratio', 'Share of hedges that beat the primary', 'gauge',
+                 lambda: [('', {}, HEDGING.stats()['hedge_win_rate'])])
+REGISTRY.collect('tourism_rate_limit_wait_seconds_total', 'Time spent waiting for per-host rate limits', 'counter',
+                 lambda: (('', {'host': host}, stats['wait_seconds_total'])
+                          for host, stats in RATE_LIMITER.stats().items()))
+
 class BaseAgent:
     """Base class for all agents"""
     
     def __init__(self):
-        self.request_delay = float(CONFIG.get('REQUEST_DELAY', 1))
+        self.http = HTTP_CLIENT
+        self.single_flight = SINGLE_FLIGHT
     
     def make_request(self, url: str, params: Dict) -> Optional[Dict]:
         """Make HTTP request with rate limiting"""
         try:
-            time.sleep(self.request_delay)
-            headers = {
-                'User-Agent': 'TourismAgent/1.0 (https://github.com/yourusername/tourism-agent)'
-            }
-            response = requests.get(url, params=params, headers=headers, timeout=10)
+            response = self.http.get(url, params=params, timeout=10)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Request error for {url}: {e}")
+            logger.warning("Request error for %s: %s", url, e)
             return None
 
 class GeocodingService:
     """Service to get coordinates for a place using Nominatim API"""
     
-    def get_coordinates(self, place: str) -> Optional[Tuple[float, float]]:
+    def __init__(self):
+        self.http = HTTP_CLIENT
+        self.single_flight = SINGLE_FLIGHT
+        self.gazetteer = GAZETTEER
+        self.cache = GEOCODE_CACHE
+    
+    def get_coordinates(self, place: str) -> Optional[Coordinates]:
         """Get latitude and longitude for a place"""
-        params = {
-            'q': place,
-            'format': 'json',
-            'limit': 1
-        }
+        _, cached = self.probe(place)
+        if cached is not MISS:
+            return cached
         
-        headers = {
-            'User-Agent': 'TourismAgent/1.0 (https://github.com/yourusername/tourism-agent)'
-        }
+        key = normalize_key(place)
+        return self.single_flight.do(f"geocode:{key}", lambda: self._lookup(place, key),
+                                     recheck=lambda: self._from_cache(place, key))
+    
+    def probe(self, place: str, dry_run: bool = False) -> Tuple[Optional[str], Any]:
+        """('gazetteer' | 'cache', coordinates) when the place resolves without Nominatim, else (None, MISS).
         
+        Cached coordinates are None for a place Nominatim does not know. dry_run does not count the lookup.
+        """
+        local = self._from_gazetteer(place)
+        if local:
+            return 'gazetteer', local
+        key = normalize_key(place)
+        cached = self.cache.peek(key) if dry_run else self._from_cache(place, key)
+        return (None, MISS) if cached is MISS else ('cache', cached)
+    
+    def _lookup(self, place: str, key: str) -> Optional[Coordinates]:
+        """Ask Nominatim for a place and cache the answer"""
         try:
-            response = requests.get(CONFIG['NOMINATIM_URL'], params=params, headers=headers, timeout=10)
+            response = self.http.get(CONFIG['NOMINATIM_URL'], params=self._build_params(place), timeout=10)
             response.raise_for_status()
-            data = response.json()
-            
-            if data and len(data) > 0:
-                lat = float(data[0]['lat'])
-                lon = float(data[0]['lon'])
-                print(f"📍 Found coordinates for {place}: {lat}, {lon}")
-                return (lat, lon)
-            else:
-                print(f"❌ No coordinates found for {place}")
-                return None
+            return self._parse_response(place, key, response.json())
                 
         except requests.exceptions.RequestException as e:
-            print(f"Geocoding error: {e}")
+            logger.warning("Geocoding error: %s", e)
             return None
         except (KeyError, ValueError) as e:
-            print(f"Data parsing error: {e}")
+            logger.warning("Data parsing error: %s", e)
+            return None
+    
+    def _from_gazetteer(self, place: str) -> Optional[Coordinates]:
+        """Well-known places resolve from the local index without a network call"""
+        if self.gazetteer is None:
+            return None
+        coordinates = self.gazetteer.lookup(place)
+        if not coordinates:
             return None
+        logger.debug("Found coordinates for %s: %s, %s (gazetteer)", place, coordinates[0], coordinates[1])
+        return Coordinates(*coordinates)
+    
+    def _from_cache(self, place: str, key: str):
+        """Cached coordinates, None for a cached "not found" answer, or MISS"""
+        return self._cached(place, self.cache.get(key))
+    
+    def _cached(self, place: str, cached):
+        if cached is None:
+            logger.debug("No coordinates found for %s (cached)", place)
+        return cached
+    
+    def _build_params(self, place: str) -> Dict:
+        return {
+            'q': place,
+            'format': 'json',
+            'limit': 1
+        }
+    
+    def _parse_response(self, place: str, key: str, data) -> Optional[Coordinates]:
+        """Parse a Nominatim answer and cache it"""
+        coordinates, ttl = self._parse(place, data)
+        self.cache.set(key, coordinates, ttl)
+        return coordinates
+    
+    def _parse(self, place: str, data) -> Tuple[Optional[Coordinates], float]:
+        """Coordinates from a Nominatim answer and how long to cache them"""
+        if data and len(data) > 0:
+            coordinates = Coordinates(float(data[0]['lat']), float(data[0]['lon']))
+            logger.debug("Found coordinates for %s: %s, %s", place, coordinates.lat, coordinates.lon)
+            return coordinates, CONFIG['GEOCODE_CACHE_TTL']
+        else:
+            logger.info("No coordinates found for %s", place)
+            # Only a definitive empty answer is cached; network errors are retried next time
+            return None, CONFIG['GEOCODE_NEGATIVE_TTL']
+
+def weather_expiry(data: Dict, now: float) -> float:
+    """When Open-Meteo will publish the next value of `current`: the end of the interval it reports"""
+    current = data.get('current') or {}
+    interval = current.get('interval') or CONFIG['WEATHER_UPDATE_INTERVAL']
+    try:
+        # 'time' is the start of the interval in the location's local time
+        started = calendar.timegm(time.strptime(current['time'], '%Y-%m-%dT%H:%M')) - data.get('utc_offset_seconds', 0)
+        expires_at = started + interval
+    except (KeyError, TypeError, ValueError):
+        expires_at = (now // interval + 1) * interval
+    if expires_at <= now:
+        # Clock skew or an old model run: fall back to the next boundary on our own clock
+        expires_at = (now // interval + 1) * interval
+    return max(expires_at, now + CONFIG['WEATHER_MIN_TTL'])
 
 class WeatherAgent(BaseAgent):
     """Agent responsible for fetching weather information"""
     
-    def execute(self, place: str, coordinates: Tuple[float, float]) -> str:
+    def __init__(self):
+        super().__init__()
+        # Shared per process so concurrent requests from any agent instance land in the same batch
+        self.batcher = WEATHER_BATCHER
+        self.cache = WEATHER_CACHE
+        self.refresher = WEATHER_REFRESHER
+    
+    def execute(self, place: str, coordinates: Tuple[float, float]) -> WeatherResult:
         """Get current weather and forecast"""
-        lat, lon = coordinates
+        with STAGE_SECONDS.time('weather'):
+            return WeatherResult(place, self.get_weather(coordinates))
+    
+    def execute_uncached(self, place: str, coordinates: Tuple[float, float]) -> WeatherResult:
+        """execute() for coordinates that probe() found no cached weather for"""
+        with STAGE_SECONDS.time('weather'):
+            return WeatherResult(place, self._load(self._cache_key(coordinates), coordinates))
+    
+    def get_weather(self, coordinates: Tuple[float, float]) -> Optional[CurrentWeather]:
+        """Current weather for one location, cached per grid cell until the next model update"""
+        key = self._cache_key(coordinates)
+        cached = self._from_cache(key, coordinates)
+        if cached is not MISS:
+            return cached
+        return self._load(key, coordinates)
+    
+    def probe(self, coordinates: Tuple[float, float], dry_run: bool = False) -> Tuple[Optional[str], Any]:
+        """('cache' | 'stale', weather) when the weather for coordinates is cached, else (None, MISS).
         
-        params = {
-            'latitude': lat,
-            'longitude': lon,
+        A stale entry is refreshed in the background, unless dry_run is set; dry_run also does not count the lookup.
+        """
+        return self._probe(self._cache_key(coordinates), coordinates, dry_run)
+    
+    def _load(self, key: str, coordinates: Tuple[float, float]) -> Optional[CurrentWeather]:
+        return self.single_flight.do(f"weather:{key}", lambda: self._fetch_and_cache(key, coordinates),
+                                     recheck=lambda: self._fresh_from_cache(key))
+    
+    def get_weather_many(self, coordinates: List[Tuple[float, float]]) -> List[Optional[CurrentWeather]]:
+        """Like get_weather for many locations; cache misses are fetched in multi-location calls"""
+        keys = [self._cache_key(coords) for coords in coordinates]
+        results = [self._from_cache(key, coords) for key, coords in zip(keys, coordinates)]
+        missing = [i for i, result in enumerate(results) if result is MISS]
+        for i, data in zip(missing, self.fetch_many([coordinates[i] for i in missing])):
+            results[i] = self._store(keys[i], data)
+        return results
+    
+    def _fetch_and_cache(self, key: str, coordinates: Tuple[float, float]) -> Optional[CurrentWeather]:
+        return self._store(key, self.fetch(coordinates))
+    
+    def _cache_key(self, coordinates: Tuple[float, float]) -> str:
+        lat, lon = coordinates
+        return grid_key(lat, lon, CONFIG['WEATHER_CACHE_GRID'])
+    
+    def _from_cache(self, key: str, coordinates: Tuple[float, float]):
+        """Fresh cached data, stale data (refreshed in the background) when allowed, or MISS"""
+        return self._probe(key, coordinates)[1]
+    
+    def _probe(self, key: str, coordinates: Tuple[float, float], dry_run: bool = False) -> Tuple[Optional[str], Any]:
+        return self._probe_entry(key, coordinates, self.cache.peek(key) if dry_run else self.cache.get(key), dry_run)
+    
+    def _probe_entry(self, key: str, coordinates: Tuple[float, float], entry,
+                     dry_run: bool = False) -> Tuple[Optional[str], Any]:
+        if entry is MISS:
+            return None, MISS
+        if entry['fresh_until'] > time.time():
+            return 'cache', entry['weather']
+        if not CONFIG['WEATHER_STALE_WHILE_REVALIDATE']:
+            return None, MISS
+        if not dry_run:
+            self._revalidate(key, coordinates)
+        return 'stale', entry['weather']
+    
+    def _revalidate(self, key: str, coordinates: Tuple[float, float]):
+        self.refresher.submit(key, lambda: self.single_flight.do(f"weather:{key}",
+                                                                 lambda: self._fetch_and_cache(key, coordinates)))
+    
+    def _fresh_from_cache(self, key: str):
+        entry = self.cache.get(key)
+        if entry is MISS or entry['fresh_until'] <= time.time():
+            return MISS
+        return entry['weather']
+    
+    def _store(self, key: str, data: Optional[Dict]) -> Optional[CurrentWeather]:
+        """Parse an Open-Meteo answer and cache it until the next model update (plus the stale window)"""
+        parsed = self._parse(data)
+        if parsed is None:
+            return None
+        entry, ttl = parsed
+        self.cache.set(key, entry, ttl)
+        return entry['weather']
+    
+    def _parse(self, data: Optional[Dict]) -> Optional[Tuple[Dict, float]]:
+        """Cache entry and TTL for an Open-Meteo answer, or None for an error"""
+        if not data:
+            # Errors are retried on the next request
+            return None
+        try:
+            weather = CurrentWeather.from_open_meteo(data)
+        except AttributeError as e:
+            logger.warning("Unexpected weather data: %s", e)
+            return None
+        now = time.time()
+        fresh_until = weather_expiry(data, now)
+        ttl = fresh_until - now
+        if CONFIG['WEATHER_STALE_WHILE_REVALIDATE']:
+            ttl += CONFIG['WEATHER_STALE_TTL']
+        return {'weather': weather, 'fresh_until': fresh_until}, ttl
+    
+    def fetch(self, coordinates: Tuple[float, float]) -> Optional[Dict]:
+        """Open-Meteo data for one location, micro-batched with concurrent lookups when enabled"""
+        if CONFIG['WEATHER_BATCH_WINDOW'] > 0:
+            return self.batcher.call(coordinates)
+        return self.make_request(CONFIG['OPENMETEO_URL'], self._build_params(coordinates))
+    
+    def execute_many(self, targets: List[Tuple[str, Tuple[float, float]]]) -> List[WeatherResult]:
+        """Weather for many (place, coordinates) pairs, fetched in multi-location calls"""
+        coordinates = list(dict.fromkeys(coords for _, coords in targets))
+        weather = dict(zip(coordinates, self.get_weather_many(coordinates)))
+        return [WeatherResult(place, weather[coords]) for place, coords in targets]
+    
+    def fetch_many(self, coordinates: List[Tuple[float, float]]) -> List[Optional[Dict]]:
+        """Open-Meteo data for each coordinate pair, WEATHER_BATCH_SIZE locations per request"""
+        results = []
+        size = max(1, CONFIG['WEATHER_BATCH_SIZE'])
+        for start in range(0, len(coordinates), size):
+            chunk = coordinates[start:start + size]
+            data = self.make_request(CONFIG['OPENMETEO_URL'], self._build_params(*chunk))
+            # One location comes back as an object, several as a list in request order
+            if isinstance(data, dict):
+                data = [data]
+            if not isinstance(data, list) or len(data) != len(chunk):
+                data = [None] * len(chunk)
+            results.extend(data)
+        return results
+    
+    def _build_params(self, *coordinates: Tuple[float, float]) -> Dict:
+        return {
+            'latitude': ','.join(str(lat) for lat, _ in coordinates),
+            'longitude': ','.join(str(lon) for _, lon in coordinates),
             'current': 'temperature_2m,precipitation_probability,weather_code',
             'timezone': 'auto'
         }
-        
-        data = self.make_request(CONFIG['OPENMETEO_URL'], params)
-        
-        if not data:
-            return f"Unable to fetch weather data for {place}."
-        
-        try:
-            current = data.get('current', {})
-            temp = current.get('temperature_2m', 'N/A')
-            precip_prob = current.get('precipitation_probability', 0)
-            
-            # Handle cases where precipitation might be None
-            if precip_prob is None:
-                precip_prob = 0
-                
-            return f"In {place} it's currently {temp}°C with a chance of {precip_prob}% to rain."
-            
-        except Exception as e:
-            return f"Error processing weather data: {e}"
+
+WEATHER_REFRESHER = BackgroundRefresher()
+
+# One window per process; WeatherAgent.fetch_many splits anything larger than WEATHER_BATCH_SIZE
+WEATHER_BATCHER = MicroBatcher(lambda coordinates: WeatherAgent().fetch_many(coordinates),
+                               window=CONFIG['WEATHER_BATCH_WINDOW'],
+                               max_size=CONFIG['WEATHER_BATCH_SIZE'])
 
 class PlacesAgent(BaseAgent):
     """Agent responsible for fetching tourist attractions"""
     
-    def execute(self, place: str, coordinates: Tuple[float, float]) -> str:
+    def __init__(self):
+        super().__init__()
+        self.cache = PLACES_CACHE
+        self.tiles = TILES
+        self.places_index = PLACES_INDEX
+        self.query_builder = OverpassQueryBuilder(radius=CONFIG['OVERPASS_RADIUS'],
+                                                  limit=CONFIG['OVERPASS_LIMIT'],
+                                                  output=CONFIG['OVERPASS_OUTPUT'])
+    
+    def execute(self, place: str, coordinates: Tuple[float, float],
+                categories: Optional[Tuple[str, ...]] = None) -> PlacesResult:
         """Get tourist attractions using Overpass API"""
-        lat, lon = coordinates
-        
-        # Overpass QL query to find tourist attractions within 20km radius
-        # Prioritize specific tourism types: attraction, museum, monument, gallery, etc.
-        query = f"""
-        [out:json][timeout:25];
-        (
-          node["tourism"~"^(attraction|museum|monument|gallery|theme_park|zoo|aquarium|artwork|viewpoint|information)$"](around:20000,{lat},{lon});
-          way["tourism"~"^(attraction|museum|monument|gallery|theme_park|zoo|aquarium|artwork|viewpoint|information)$"](around:20000,{lat},{lon});
-          relation["tourism"~"^(attraction|museum|monument|gallery|theme_park|zoo|aquarium|artwork|viewpoint|information)$"](around:20000,{lat},{lon});
-          node["historic"](around:20000,{lat},{lon});
-          way["historic"](around:20000,{lat},{lon});
-          relation["historic"](around:20000,{lat},{lon});
-          node["leisure"~"^(park|nature_reserve|garden)$"](around:20000,{lat},{lon});
-          way["leisure"~"^(park|nature_reserve|garden)$"](around:20000,{lat},{lon});
-        );
-        out body;
-        >;
-        out skel qt;
-        """
-        
         try:
-            response = requests.post(CONFIG['OVERPASS_URL'], 
-                                   data={'data': query}, 
-                                   timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            places = self._extract_place_names(data)
-            
-            if places:
-                # Format: "In {place} these are the places you can go," (comma, no bullets for single query)
-                places_list = "\n\n".join([place for place in places[:5]])
-                return f"In {place} these are the places you can go,\n\n{places_list}"
-            else:
-                return f"No tourist attractions found for {place}."
-                
-        except requests.exceptions.RequestException as e:
-            return f"Error fetching places data: {e}"
+            return PlacesResult(place, self.get_places(coordinates, categories))
+        except Exception as e:
+            return PlacesResult(place, error=self._format_error(e))
+    
+    def execute_uncached(self, place: str, coordinates: Tuple[float, float],
+                         categories: Optional[Tuple[str, ...]] = None) -> PlacesResult:
+        """execute() for coordinates that probe() found no precomputed or cached places for"""
+        try:
+            return PlacesResult(place, self._load(self._cache_key(coordinates, categories), coordinates, categories))
         except Exception as e:
-            return f"Error processing places data: {e}"
+            return PlacesResult(place, error=self._format_error(e))
+    
+    def _format_error(self, error: Exception) -> str:
+        if isinstance(error, requests.exceptions.RequestException):
+            return f"Error fetching places data: {error}"
+        return f"Error processing places data: {error}"
+    
+    def get_places(self, coordinates: Tuple[float, float],
+                   categories: Optional[Tuple[str, ...]] = None) -> List[Attraction]:
+        """Ranked attraction names around coordinates: precomputed tile, else cached per geohash cell
+        and category set, else ranked from the offline places index or fetched from Overpass"""
+        key = self._cache_key(coordinates, categories)
+        _, cached = self._probe(key)
+        if cached is not MISS:
+            return cached
+        return self._load(key, coordinates, categories)
+    
+    def probe(self, coordinates: Tuple[float, float], categories: Optional[Tuple[str, ...]] = None,
+              dry_run: bool = False) -> Tuple[Optional[str], Any]:
+        """('tiles' | 'cache', attractions) when the places around coordinates are precomputed or cached,
+        else (None, MISS). dry_run does not count the lookup."""
+        return self._probe(self._cache_key(coordinates, categories), dry_run)
+    
+    def source_on_miss(self, coordinates: Tuple[float, float]) -> str:
+        """Where uncached places come from: 'index' when the offline index covers coordinates, else 'overpass'"""
+        lat, lon = coordinates
+        if self.places_index is not None and self.places_index.covers(lat, lon, self.query_builder.radius):
+            return 'index'
+        return 'overpass'
+    
+    def _probe(self, key: str, dry_run: bool = False) -> Tuple[Optional[str], Any]:
+        precomputed = self._from_tiles(key, dry_run)
+        if precomputed is not None:
+            return 'tiles', precomputed
+        cached = self.cache.peek(key) if dry_run else self.cache.get(key)
+        return (None, MISS) if cached is MISS else ('cache', cached)
+    
+    def _from_tiles(self, key: str, dry_run: bool = False) -> Optional[List[Attraction]]:
+        if self.tiles is None:
+            return None
+        return self.tiles.peek(key) if dry_run else self.tiles.get(key)
+    
+    def _load(self, key: str, coordinates: Tuple[float, float],
+              categories: Optional[Tuple[str, ...]] = None) -> List[Attraction]:
+        return self.single_flight.do(f"places:{key}", lambda: self._fetch_and_cache(key, coordinates, categories),
+                                     recheck=lambda: self.cache.get(key))
+    
+    def _from_index(self, coordinates: Tuple[float, float],
+                    categories: Optional[Tuple[str, ...]] = None) -> Optional[List[Attraction]]:
+        """Rank the places the offline index has around coordinates, or None where it has no coverage"""
+        if self.places_index is None:
+            return None
+        lat, lon = coordinates
+        with STAGE_SECONDS.time('places_index'):
+            places = self.places_index.nearby(lat, lon, self.query_builder.radius, categories, self.query_builder.limit)
+            if places is None:
+                return None
+            ranking = _PlaceRanking(self._get_english_name)
+            for place in places:
+                ranking.add_place(*place)
+            return ranking.top()
+    
+    def _fetch_and_cache(self, key: str, coordinates: Tuple[float, float],
+                         categories: Optional[Tuple[str, ...]] = None) -> List[Attraction]:
+        lat, lon = coordinates
+        places = self._from_index(coordinates, categories)
+        if places is None:
+            places = self._fetch_places(lat, lon, categories)
+        self.cache.set(key, places, CONFIG['PLACES_CACHE_TTL'])
+        return places
+    
+    def _cache_key(self, coordinates: Tuple[float, float], categories: Optional[Tuple[str, ...]] = None) -> str:
+        # Nearby coordinates (e.g. "Bangalore" and "Bengaluru") fall in the same cell and share one fetch
+        lat, lon = coordinates
+        key = geohash_encode(lat, lon, CONFIG['PLACES_CACHE_PRECISION'])
+        return f"{key}:{','.join(categories)}" if categories else key
+    
+    def _fetch_places(self, lat: float, lon: float, categories: Optional[Tuple[str, ...]] = None) -> List[Attraction]:
+        """Query Overpass and rank the results"""
+        streaming = CONFIG['OVERPASS_STREAMING']
+        # places_fetch runs to the response headers; places_parse covers reading and ranking the body
+        with STAGE_SECONDS.time('places_fetch'):
+            response = self.http.post(CONFIG['OVERPASS_URL'], 
+                                      data={'data': self._build_query(lat, lon, categories)}, 
+                                      timeout=CONFIG['OVERPASS_TIMEOUT'],
+                                      stream=streaming,
+                                      mirrors=CONFIG['OVERPASS_MIRRORS'])
+        with response, STAGE_SECONDS.time('places_parse'):
+            response.raise_for_status()
+            if streaming:
+                # Parse elements as they arrive and drop skeleton nodes, so memory does not grow with the payload
+                return self._rank_elements(iter_elements(response.iter_content(CONFIG['OVERPASS_CHUNK_SIZE'])))
+            return self._extract_place_names(response.json())
+    
+    def _build_query(self, lat: float, lon: float, categories: Optional[Tuple[str, ...]] = None) -> str:
+        # Tag-only output with one merged nwr statement per category; see OverpassQueryBuilder
+        return self.query_builder.build(lat, lon, categories)
     
     def _is_english_name(self, name: str) -> bool:
         """Check if a name is primarily in English (ASCII characters)"""
         if not name:
             return False
-        # Count ASCII characters (English) vs non-ASCII characters
-        ascii_count = sum(1 for c in name if ord(c) < 128 and c.isprintable())
-        total_chars = len([c for c in name if c.isprintable()])
+        # Fast path: pure-ASCII names only need at least one printable character
+        if name.isascii():
+            return name.isprintable() or any(map(str.isprintable, name))
+        # Count printable ASCII characters (English) vs all printable characters, without building lists
+        ascii_count = len(name) - len(name.translate(_DROP_PRINTABLE_ASCII))
+        total_chars = len(name) if name.isprintable() else sum(map(str.isprintable, name))
         if total_chars == 0:
             return False
         # Consider it English if at least 70% of characters are ASCII
         return (ascii_count / total_chars) >= 0.7
     
     def _get_english_name(self, tags: Dict) -> Optional[str]:
-        """Get English name from tags, preferring name:en, then checking name"""
-        # First try name:en (English name tag)
-        if 'name:en' in tags:
-            name = tags['name:en']
-            if name and len(name.strip()) > 0:
-                return name.strip()
-        
-        # Then try name:en:official or name:en:short
-        for key in ['name:en:official', 'name:en:short', 'official_name:en']:
-            if key in tags:
-                name = tags[key]
-                if name and len(name.strip()) > 0:
-                    return name.strip()
+        """Get English name from tags, preferring name:en, then name:en:official, name:en:short, official_name:en"""
+        for key in _ENGLISH_NAME_KEYS:
+            name = tags.get(key)
+            if name:
+                name = name.strip()
+                if name:
+                    return name
         
         # Finally check regular name, but only if it's English
-        if 'name' in tags:
-            name = tags['name']
-            if name and self._is_english_name(name):
-                return name.strip()
+        name = tags.get('name')
+        if name and self._is_english_name(name):
+            return name.strip()
         
         return None
     
-    def _extract_place_names(self, data: Dict) -> List[str]:
+    def _extract_place_names(self, data: Dict) -> List[Attraction]:
         """Extract place names from Overpass API response with prioritization"""
-        places = []
-        place_scores = {}  # Dictionary to score and rank places
-        
-        # Tourism type priority (higher = better)
-        tourism_priority = {
-            'attraction': 10,
-            'museum': 9,
-            'monument': 9,
-            'gallery': 8,
-            'theme_park': 8,
-            'zoo': 8,
-            'aquarium': 8,
-            'artwork': 7,
-            'viewpoint': 7,
-            'information': 6,
-            'historic': 9,
-            'park': 7,
-            'nature_reserve': 7,
-            'garden': 6
-        }
+        # A timed-out or out-of-memory query still answers 200 with partial elements
+        check_remark(data.get('remark'))
+        return self._rank_elements(data.get('elements', []))
+    
+    def _rank_elements(self, elements: Iterable[Dict]) -> List[Attraction]:
+        """Score and rank Overpass elements in a single pass, returning the top 5 places"""
+        ranking = _PlaceRanking(self._get_english_name)
+        for element in elements:
+            ranking.add(element)
+        return ranking.top()
+
+class _PlaceRanking:
+    """Incremental scorer for Overpass elements, so streamed responses can be ranked as they arrive"""
+    
+    def __init__(self, get_english_name):
+        self.get_english_name = get_english_name
+        self.places: Dict[str, Attraction] = {}  # Best-scoring record per name
+        # Broader candidates, in document order, used when there are fewer than 3 high-quality places.
+        # At most 2 of them can duplicate a ranked place, so the first 7 always fill the list to 5.
+        self.fallback: Dict[str, Attraction] = {}
+    
+    def add(self, element: Dict):
+        tags = element.get('tags')
+        if not tags:
+            return
         
-        # Words to exclude (generic or non-tourist places)
-        exclude_words = [
-            'residency', 'hotel', 'hostel', 'restaurant', 'cafe', 'bank',
-            'atm', 'parking', 'toilet', 'bench', 'waste', 'cross', 'junction',
-            'signal', 'traffic', 'bus stop', 'metro', 'station', 'mall',
-            'shop', 'store', 'market', 'commercial', 'office', 'building',
-            'apartment', 'residential', 'house', 'home', 'holiday home'
-        ]
-        
-        for element in data.get('elements', []):
-            if 'tags' not in element:
-                continue
-            
-            # Get English name (prefer name:en, fallback to name if English)
-            name = self._get_english_name(element['tags'])
-            if not name or len(name) == 0 or len(name) > 50:
-                continue
-            
-            # Skip if name contains exclude words
-            name_lower = name.lower()
-            if any(exclude_word in name_lower for exclude_word in exclude_words):
-                continue
-            
-            # Calculate score based on tourism type
-            score = 0
-            tourism_type = element['tags'].get('tourism', '')
-            historic_type = element['tags'].get('historic', '')
-            leisure_type = element['tags'].get('leisure', '')
-            
-            if tourism_type in tourism_priority:
-                score = tourism_priority[tourism_type]
-            elif historic_type:
-                score = tourism_priority.get('historic', 5)
-            elif leisure_type in tourism_priority:
-                score = tourism_priority[leisure_type]
-            else:
-                score = 3  # Default score for other tourism types
-            
-            # Bonus for having additional relevant tags
-            if 'wikidata' in element['tags'] or 'wikipedia' in element['tags']:
-                score += 2  # More likely to be well-known
-            
-            # Bonus for having name:en (official English name)
-            if 'name:en' in element['tags']:
-                score += 1
-            
-            if name not in place_scores or place_scores[name] < score:
-                place_scores[name] = score
+        # Get English name (prefer name:en, fallback to name if English)
+        name = self.get_english_name(tags)
+        if name:
+            categories = element_categories(tags)
+            self.add_place(name, place_score(tags), categories[0] if categories else None,
+                           bool(tags.get('wikidata') or tags.get('wikipedia')))
+    
+    def add_place(self, name: str, score: int, category: Optional[str] = None, notable: Optional[bool] = None):
+        """Add a place whose English name and score are already known (e.g. from the offline places index)"""
+        name_lower = name.lower()
+        attraction = None
+        
+        if len(self.fallback) < 7 and len(name) < 50 and name not in self.fallback:
+            # Still exclude obvious non-tourist places
+            if not _FALLBACK_EXCLUDE_MATCHER.search(name_lower):
+                attraction = self.fallback[name] = Attraction(name, score, category, notable)
+        
+        if len(name) > 50:
+            return
         
-        # Sort by score (descending) and return top places
-        sorted_places = sorted(place_scores.items(), key=lambda x: x[1], reverse=True)
-        places = [place[0] for place in sorted_places[:10]]  # Get top 10, then return top 5
+        # Skip if name contains exclude words
+        if _EXCLUDE_MATCHER.search(name_lower):
+            return
         
-        # If we don't have enough high-quality places, try a broader search
+        best = self.places.get(name)
+        if best is None or best.score < score:
+            self.places[name] = attraction or Attraction(name, score, category, notable)
+    
+    def top(self) -> List[Attraction]:
+        # Bounded heap instead of a full sort; ties keep first-seen order like a stable sort
+        places = heapq.nlargest(5, self.places.values(), key=_SCORE)
+        
+        # If we don't have enough high-quality places, include any tourism place that has an English name
         if len(places) < 3:
-            # Fallback: include any tourism place that has an English name
-            for element in data.get('elements', []):
-                if 'tags' not in element:
-                    continue
-                name = self._get_english_name(element['tags'])
-                if (name and len(name.strip()) > 0 and 
-                    name not in places and 
-                    len(name) < 50):
-                    name_lower = name.lower()
-                    # Still exclude obvious non-tourist places
-                    if not any(exclude_word in name_lower for exclude_word in ['residency', 'holiday home', 'bank', 'cross']):
-                        places.append(name)
-                        if len(places) >= 5:
-                            break
+            names = {place.name for place in places}
+            for attraction in self.fallback.values():
+                if attraction.name not in names:
+                    places.append(attraction)
+                    if len(places) >= 5:
+                        break
         
         return places[:5]
 
+_SCORE = attrgetter('score')
+
+# Tourism type priority (higher = better)
+TOURISM_PRIORITY = {
+    'attraction': 10,
+    'museum': 9,
+    'monument': 9,
+    'gallery': 8,
+    'theme_park': 8,
+    'zoo': 8,
+    'aquarium': 8,
+    'artwork': 7,
+    'viewpoint': 7,
+    'information': 6,
+    'historic': 9,
+    'park': 7,
+    'nature_reserve': 7,
+    'garden': 6
+}
+
+def place_score(tags: Dict) -> int:
+    """Ranking score of a place from its OSM tags"""
+    # Calculate score based on tourism type
+    tourism_type = tags.get('tourism', '')
+    if tourism_type in TOURISM_PRIORITY:
+        score = TOURISM_PRIORITY[tourism_type]
+    elif tags.get('historic', ''):
+        score = TOURISM_PRIORITY['historic']
+    else:
+        # Default score for other tourism types
+        score = TOURISM_PRIORITY.get(tags.get('leisure', ''), 3)
+    
+    # Bonus for having additional relevant tags
+    if 'wikidata' in tags or 'wikipedia' in tags:
+        score += 2  # More likely to be well-known
+    
+    # Bonus for having name:en (official English name)
+    if 'name:en' in tags:
+        score += 1
+    return score
+
+# Words to exclude (generic or non-tourist places)
+EXCLUDE_WORDS = [
+    'residency', 'hotel', 'hostel', 'restaurant', 'cafe', 'bank',
+    'atm', 'parking', 'toilet', 'bench', 'waste', 'cross', 'junction',
+    'signal', 'traffic', 'bus stop', 'metro', 'station', 'mall',
+    'shop', 'store', 'market', 'commercial', 'office', 'building',
+    'apartment', 'residential', 'house', 'home', 'holiday home'
+]
+FALLBACK_EXCLUDE_WORDS = ['residency', 'holiday home', 'bank', 'cross']
+
+_ENGLISH_NAME_KEYS = ('name:en', 'name:en:official', 'name:en:short', 'official_name:en')
+_DROP_PRINTABLE_ASCII = dict.fromkeys(range(0x20, 0x7f))
+
+# Place patterns in priority order (more specific first), compiled once at import
+_PLACE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    r"going to go to\s+([^,\.!?]+)",  # "I'm going to go to Bangalore"
+    r"going to\s+([^,\.!?]+)",        # "I'm going to Bangalore"
+    r"go to\s+([^,\.!?]+)",           # "go to Bangalore"
+    r"in\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)",  # "in Bangalore" or "in New York"
+    r"visit\s+([^,\.!?]+)",           # "visit Paris"
+    r"to\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)",  # "to Tokyo"
+    r"at\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)",  # "at London"
+]]
+_PLACE_STOPWORDS = re.compile(
+    r'\b(?:going|to|visit|travel|trip|plan|what|where|how|is|are|the|there|and|can|i|my|me|let\'s|lets)\b',
+    re.IGNORECASE
+)
+_TRAILING_TEXT = re.compile(r'[,\.!?].*$')
+_NON_WORD = re.compile(r'[^\w\s]')
+
+# Weather-related keywords
+WEATHER_KEYWORDS = [
+    'temperature', 'temp', 'weather', 'rain', 'forecast', 
+    'hot', 'cold', 'warm', 'cool', 'humid', 'precipitation',
+    'climate', 'sunny', 'cloudy', 'rainy'
+]
+
+# Places-related keywords (more specific phrases to avoid false positives)
+PLACES_PHRASES = [
+    'places to', 'place to', 'places i can', 'places you can',
+    'what places', 'which places', 'what are the places',
+    'attractions', 'tourist', 'sightseeing', 'sights',
+    'where to go', 'where to visit', 'what to see', 'what to visit',
+    'things to do', 'destinations', 'can visit', 'can go',
+    'should visit', 'should see', 'places i can visit',
+    'places can visit', 'places can go'
+]
+
+# Single word keywords (only if not part of "going to")
+PLACES_SINGLE_WORDS = ['visit', 'see']
+
+def _keyword_matcher(keywords: List[str]) -> re.Pattern:
+    """One alternation per keyword list: a single C-level scan that stops at the first hit"""
+    return re.compile('|'.join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)))
+
+_EXCLUDE_MATCHER = _keyword_matcher(EXCLUDE_WORDS)
+_FALLBACK_EXCLUDE_MATCHER = _keyword_matcher(FALLBACK_EXCLUDE_WORDS)
+_WEATHER_MATCHER = _keyword_matcher(WEATHER_KEYWORDS)
+_PLACES_MATCHER = _keyword_matcher(PLACES_PHRASES)
+_TRIP_PLANNING_MATCHER = _keyword_matcher(['plan', 'trip', 'going to go to'])
+
+# Words that narrow the places query to some categories. Generic wording ("attractions", "places",
+# "sights") asks for everything, so it is not listed.
+CATEGORY_KEYWORDS = {
+    'attractions': ['museum', 'gallery', 'galleries', 'zoo', 'aquarium', 'theme park', 'amusement',
+                    'viewpoint', 'art'],
+    'historic': ['history', 'historic', 'heritage', 'monument', 'castle', 'fort', 'palace', 'ruins',
+                 'temple', 'memorial'],
+    'nature': ['park', 'garden', 'nature', 'hike', 'hiking', 'outdoor', 'greenery'],
+}
+_CATEGORY_MATCHERS = {category: re.compile(r'\b(?:' + _keyword_matcher(keywords).pattern + r')s?\b')
+                      for category, keywords in CATEGORY_KEYWORDS.items()}
+_GOING_TO_WORD = {word: re.compile(rf'going\s+to\s+[^,\.!?]*\b{word}\b') for word in PLACES_SINGLE_WORDS}
+
+# Execution plan of a request: each node and the nodes whose output it needs
+PLAN_GRAPH = {'geocode': (), 'weather': ('geocode',), 'places': ('geocode',), 'format': ('weather', 'places')}
+# Upstream host a node calls when its output is not cached or available locally
+PLAN_UPSTREAMS = {'geocode': 'nominatim', 'weather': 'openmeteo', 'places': 'overpass'}
+
+# Keys of a structured response (TourismAIAgent.process_structured), in output order
+STRUCTURED_FIELDS = ('place', 'coordinates', 'weather', 'places', 'response')
+
+# Result of a batch lookup that did not finish before the batch deadline
+UNFINISHED = object()
+
+def _map_bounded(fn, items: List, workers: int, deadline: Optional[float] = None) -> List:
+    """fn over items with at most `workers` calls in flight, results in input order.
+    
+    Items not done by deadline (a time.monotonic() value) are UNFINISHED; calls already running carry
+    on in the background and still fill the caches.
+    """
+    if not items:
+        return []
+    if deadline is None and (len(items) == 1 or workers <= 1):
+        return [fn(item) for item in items]
+    # With a deadline even a single call runs on the pool, so the caller can stop waiting for it
+    pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(items))), thread_name_prefix='tourism-batch')
+    futures = [pool.submit(fn, item) for item in items]
+    wait(futures, timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+    pool.shutdown(wait=False, cancel_futures=True)
+    return [future.result() if future.done() and not future.cancelled() else UNFINISHED for future in futures]
+
 class TourismAIAgent:
     """Parent agent that orchestrates the tourism system"""
     
@@ -288,51 +865,24 @@ class TourismAIAgent:
         self.geocoding_service = GeocodingService()
         self.weather_agent = WeatherAgent()
         self.places_agent = PlacesAgent()
+        self._executor = ThreadPoolExecutor(max_workers=CONFIG['AGENT_WORKERS'],
+                                            thread_name_prefix='tourism-agent')
     
     def extract_place(self, user_input: str) -> Optional[str]:
         """Extract place name from user input"""
-        input_lower = user_input.lower()
-        
-        # Enhanced patterns for place extraction (order matters - more specific first)
-        patterns = [
-            r"going to go to\s+([^,\.!?]+)",  # "I'm going to go to Bangalore"
-            r"going to\s+([^,\.!?]+)",        # "I'm going to Bangalore"
-            r"go to\s+([^,\.!?]+)",           # "go to Bangalore"
-            r"in\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)",  # "in Bangalore" or "in New York"
-            r"visit\s+([^,\.!?]+)",           # "visit Paris"
-            r"to\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)",  # "to Tokyo"
-            r"at\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)",  # "at London"
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, user_input, re.IGNORECASE)
+        for pattern in _PLACE_PATTERNS:
+            match = pattern.search(user_input)
             if match:
-                potential_place = match.group(1).strip()
-                # Clean up the place name - remove common question words and verbs
-                potential_place = re.sub(
-                    r'\b(?:going|to|visit|travel|trip|plan|what|where|how|is|are|the|there|and|can|i|my|me|let\'s|lets)\b', 
-                    '', 
-                    potential_place, 
-                    flags=re.IGNORECASE
-                ).strip()
-                
-                # Remove trailing punctuation and extra words
-                potential_place = re.sub(r'[,\.!?].*$', '', potential_place).strip()
-                
-                # Split and take the first significant word(s) as place name
-                words = potential_place.split()
-                if words:
-                    # Take up to 3 words (for places like "New York" or "Los Angeles")
-                    place = ' '.join(words[:3]).strip()
-                    if len(place) > 1:
-                        return place.title()
+                place = self._clean_place(match.group(1))
+                if place:
+                    return place
         
         # Fallback: Look for capitalized words that might be place names
         words = user_input.split()
         capitalized_words = []
         for word in words:
             # Remove punctuation
-            clean_word = re.sub(r'[^\w\s]', '', word)
+            clean_word = _NON_WORD.sub('', word)
             if clean_word and clean_word[0].isupper() and len(clean_word) > 2:
                 capitalized_words.append(clean_word)
         
@@ -342,46 +892,38 @@ class TourismAIAgent:
         
         return None
     
+    def _clean_place(self, potential_place: str) -> Optional[str]:
+        """Clean up a captured place name - remove common question words and verbs"""
+        potential_place = _PLACE_STOPWORDS.sub('', potential_place.strip()).strip()
+        
+        # Remove trailing punctuation and extra words
+        potential_place = _TRAILING_TEXT.sub('', potential_place).strip()
+        
+        # Split and take the first significant word(s) as place name
+        words = potential_place.split()
+        if words:
+            # Take up to 3 words (for places like "New York" or "Los Angeles")
+            place = ' '.join(words[:3]).strip()
+            if len(place) > 1:
+                return place.title()
+        return None
+    
     def analyze_intent(self, user_input: str) -> Dict[str, bool]:
         """Analyze user intent from input"""
         input_lower = user_input.lower()
         
-        # Weather-related keywords
-        weather_keywords = [
-            'temperature', 'temp', 'weather', 'rain', 'forecast', 
-            'hot', 'cold', 'warm', 'cool', 'humid', 'precipitation',
-            'climate', 'sunny', 'cloudy', 'rainy'
-        ]
-        
-        # Places-related keywords (more specific phrases to avoid false positives)
-        places_phrases = [
-            'places to', 'place to', 'places i can', 'places you can',
-            'what places', 'which places', 'what are the places',
-            'attractions', 'tourist', 'sightseeing', 'sights',
-            'where to go', 'where to visit', 'what to see', 'what to visit',
-            'things to do', 'destinations', 'can visit', 'can go',
-            'should visit', 'should see', 'places i can visit',
-            'places can visit', 'places can go'
-        ]
-        
-        # Single word keywords (only if not part of "going to")
-        places_single_words = ['visit', 'see']
-        
         # Check for weather intent
-        has_weather = any(keyword in input_lower for keyword in weather_keywords)
+        has_weather = _WEATHER_MATCHER.search(input_lower) is not None
         
         # Check for places intent - use phrases first (more reliable)
-        has_places = any(phrase in input_lower for phrase in places_phrases)
+        has_places = _PLACES_MATCHER.search(input_lower) is not None
         
         # Also check single words, but exclude if they're part of "going to" pattern
         if not has_places:
-            for word in places_single_words:
-                if word in input_lower:
-                    # Make sure it's not part of "going to [place]"
-                    pattern = rf'going\s+to\s+[^,\.!?]*\b{word}\b'
-                    if not re.search(pattern, input_lower):
-                        has_places = True
-                        break
+            for word in PLACES_SINGLE_WORDS:
+                if word in input_lower and not _GOING_TO_WORD[word].search(input_lower):
+                    has_places = True
+                    break
         
         # Special case: "plan my trip" or "plan trip" strongly indicates places
         if 'plan' in input_lower and ('trip' in input_lower or 'visit' in input_lower):
@@ -396,79 +938,446 @@ class TourismAIAgent:
             'both': has_both
         }
     
+    def place_categories(self, user_input: str, place: Optional[str] = None) -> Optional[Tuple[str, ...]]:
+        """Place categories the user asked for, or None for all of them"""
+        input_lower = user_input.lower()
+        if place:
+            # "Fort Worth" or "Hyde Park" name the destination, not the kind of place wanted
+            input_lower = input_lower.replace(place.lower(), ' ')
+        categories = tuple(category for category in PLACE_CATEGORIES
+                           if _CATEGORY_MATCHERS[category].search(input_lower))
+        if not categories or len(categories) == len(PLACE_CATEGORIES):
+            return None
+        return categories
+    
     def process_request(self, user_input: str) -> str:
         """Main method to process user request"""
-        print(f"🔍 Processing: {user_input}")
+        reply, plan = self._prepare(user_input)
+        if reply:
+            return reply
         
-        # Extract place from input
+        # Execute appropriate agents based on intent
+        weather_result, places_result = self._run_agents(plan['place'], plan['coordinates'], plan['run_weather'],
+                                                         plan['run_places'], plan['categories'])
+        
+        with STAGE_SECONDS.time('format'):
+            return self._format_response(plan['place'], plan['intent'], weather_result, places_result)
+    
+    def stream_request(self, user_input: str) -> Iterator[Dict]:
+        """Like process_request, but yields each agent's result as soon as it is ready.
+        
+        Events are {'type': 'start', 'place', 'agents'}, then {'type': 'weather' | 'places', 'text'} in
+        completion order, and finally {'type': 'response', 'text'} with the same text process_request returns.
+        """
+        reply, plan = self._prepare(user_input)
+        if reply:
+            yield {'type': 'response', 'text': reply}
+            return
+        
+        agents = [agent for agent, selected in (('weather', plan['run_weather']), ('places', plan['run_places']))
+                  if selected]
+        yield {'type': 'start', 'place': plan['place'], 'agents': agents}
+        
+        results = {}
+        for agent, result in self._iter_agents(plan['place'], plan['coordinates'], plan['run_weather'],
+                                               plan['run_places'], plan['categories']):
+            results[agent] = result
+            yield {'type': agent, 'text': self._format_result(result)}
+        
+        with STAGE_SECONDS.time('format'):
+            text = self._format_response(plan['place'], plan['intent'], results.get('weather'), results.get('places'))
+        yield {'type': 'response', 'text': text}
+    
+    def process_structured(self, user_input: str, fields: Optional[Iterable[str]] = None,
+                           places_limit: Optional[int] = None) -> Dict:
+        """Like process_request, but returns the agents' typed results as a JSON-ready dict.
+        
+        fields selects keys from STRUCTURED_FIELDS (all by default). Naming 'weather' or 'places' runs
+        that agent whatever the message asks for, and leaving it out skips its upstream calls unless the
+        'response' text needs it. places_limit keeps only the top N attractions.
+        """
+        reply, plan = self._prepare(user_input)
+        if reply:
+            return self._structured_reply(reply, fields)
+        
+        run_weather, run_places = self._structured_agents(plan, fields)
+        weather_result, places_result = self._run_agents(plan['place'], plan['coordinates'], run_weather,
+                                                         run_places, plan['categories'])
+        
+        with STAGE_SECONDS.time('format'):
+            return self._structured_payload(plan, fields, places_limit, weather_result, places_result)
+    
+    def explain(self, user_input: str) -> Dict:
+        """Dry run of process_request: its execution plan and the upstream calls it would make, without making them.
+        
+        Each node lists the nodes it needs and its source: where its output would come from ('gazetteer',
+        'cache', 'stale', 'tiles', 'index', or the upstream host), or 'skipped' when the intent does not need it.
+        A stale weather entry is answered from the cache and refreshed in the background, which still costs a call.
+        While the place is not geocoded, weather and places are estimated as upstream calls.
+        """
         place = self.extract_place(user_input)
+        if not place:
+            return {'place': None, 'nodes': [], 'upstream_calls': dict.fromkeys(PLAN_UPSTREAMS.values(), 0)}
+        
+        plan = self._plan(user_input, place)
+        source, coordinates = self.geocoding_service.probe(place, dry_run=True)
+        nodes = {'geocode': source or PLAN_UPSTREAMS['geocode']}
+        for agent, selected in (('weather', plan['run_weather']), ('places', plan['run_places'])):
+            if not selected or coordinates is None:
+                # Nothing to fetch for an unknown place
+                nodes[agent] = 'skipped'
+            elif coordinates is MISS:
+                nodes[agent] = PLAN_UPSTREAMS[agent]
+            else:
+                nodes[agent] = self._probe_node(agent, coordinates, plan['categories'])
+        nodes['format'] = 'local'
+        
+        upstream_calls = dict.fromkeys(PLAN_UPSTREAMS.values(), 0)
+        for node, source in nodes.items():
+            if source in (PLAN_UPSTREAMS.get(node), 'stale'):
+                upstream_calls[PLAN_UPSTREAMS[node]] += 1
+        return {
+            'place': place,
+            'intent': plan['intent'],
+            'categories': plan['categories'],
+            'nodes': [{'node': node, 'needs': [need for need in PLAN_GRAPH[node] if nodes[need] != 'skipped'],
+                       'source': source}
+                      for node, source in nodes.items()],
+            'upstream_calls': upstream_calls
+        }
+    
+    def _probe_node(self, agent: str, coordinates: Tuple[float, float],
+                    categories: Optional[Tuple[str, ...]]) -> str:
+        """Where a dry run's weather or places node would get its output"""
+        if agent == 'weather':
+            source, _ = self.weather_agent.probe(coordinates, dry_run=True)
+            return source or PLAN_UPSTREAMS['weather']
+        source, _ = self.places_agent.probe(coordinates, categories, dry_run=True)
+        return source or self.places_agent.source_on_miss(coordinates)
+    
+    def process_batch(self, messages: List[str]) -> List[str]:
+        """Answer many messages at once, returning responses in input order.
+        
+        Places are deduplicated after extraction, so each unique place is geocoded once, weather for
+        all of them comes from multi-location Open-Meteo calls, and Overpass lookups run with bounded
+        concurrency. Lookups still running after BATCH_DEADLINE seconds are left to finish in the
+        background, and their messages are answered with the usual "taking too long" text.
+        """
+        logger.debug("Processing batch of %d messages", len(messages))
+        deadline = time.monotonic() + CONFIG['BATCH_DEADLINE']
+        places = [self.extract_place(message) for message in messages]
+        
+        unique_places = {}
+        for place in places:
+            if place:
+                unique_places.setdefault(normalize_key(place), place)
+        geocoded = dict(zip(unique_places, _map_bounded(self.geocoding_service.get_coordinates,
+                                                        list(unique_places.values()),
+                                                        CONFIG['BATCH_GEOCODE_WORKERS'], deadline)))
+        replies, plans = self._batch_plans(messages, places, geocoded)
+        
+        weather_coordinates = list(dict.fromkeys(plan['coordinates'] for plan in plans if plan and plan['run_weather']))
+        # One bounded call: the multi-location Open-Meteo requests share the batch deadline
+        fetched = _map_bounded(self.weather_agent.get_weather_many, [weather_coordinates] if weather_coordinates else [],
+                               1, deadline)
+        if fetched and fetched[0] is not UNFINISHED:
+            weather = dict(zip(weather_coordinates, fetched[0]))
+        else:
+            weather = dict.fromkeys(weather_coordinates, UNFINISHED)
+        
+        places_jobs = list(dict.fromkeys((plan['coordinates'], plan['categories'])
+                                         for plan in plans if plan and plan['run_places']))
+        found = dict(zip(places_jobs, _map_bounded(self._get_places_or_error, places_jobs,
+                                                   CONFIG['BATCH_PLACES_WORKERS'], deadline)))
+        return self._batch_replies(replies, plans, weather, found)
+    
+    def _batch_plans(self, messages: List[str], places: List[Optional[str]],
+                     geocoded: Dict[str, Any]) -> Tuple[List[Optional[str]], List[Optional[Dict]]]:
+        """Early replies and agent plans of a batch's messages, from their geocoded places"""
+        replies: List[Optional[str]] = [None] * len(messages)
+        plans: List[Optional[Dict]] = [None] * len(messages)
+        for i, (message, place) in enumerate(zip(messages, places)):
+            coordinates = geocoded[normalize_key(place)] if place else None
+            if not place:
+                replies[i] = "I couldn't determine which place you're interested in. Please specify a location like 'Paris' or 'What to see in London?'"
+            elif coordinates is UNFINISHED:
+                replies[i] = f"Looking up {place} is taking too long, please try again shortly."
+            elif not coordinates:
+                replies[i] = f"It doesn't know this place exist."
+            else:
+                plans[i] = self._plan(message, place, coordinates)
+        return replies, plans
+    
+    def _batch_replies(self, replies: List[Optional[str]], plans: List[Optional[Dict]], weather: Dict,
+                       found: Dict) -> List[str]:
+        """Fill in the replies of planned messages from the batch's weather and places lookups"""
+        for i, plan in enumerate(plans):
+            if plan is None:
+                continue
+            weather_result = None
+            places_result = None
+            if plan['run_weather']:
+                result = weather[plan['coordinates']]
+                if result is UNFINISHED:
+                    weather_result = self._error_result('weather', plan['place'],
+                                                        self._timeout_message('weather', plan['place']))
+                else:
+                    weather_result = WeatherResult(plan['place'], result)
+            if plan['run_places']:
+                result = found[(plan['coordinates'], plan['categories'])]
+                if result is UNFINISHED:
+                    places_result = self._error_result('places', plan['place'],
+                                                       self._timeout_message('places', plan['place']))
+                elif isinstance(result, Exception):
+                    places_result = PlacesResult(plan['place'], error=self.places_agent._format_error(result))
+                else:
+                    places_result = PlacesResult(plan['place'], result)
+            replies[i] = self._format_response(plan['place'], plan['intent'], weather_result, places_result)
+        return replies
+    
+    def _get_places_or_error(self, job: Tuple[Tuple[float, float], Optional[Tuple[str, ...]]]):
+        """Places for one batch job; errors are returned so one failure does not sink the batch"""
+        coordinates, categories = job
+        try:
+            return self.places_agent.get_places(coordinates, categories)
+        except Exception as e:
+            return e
+    
+    def _prepare(self, user_input: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """Resolve place, coordinates and intent; returns (early reply, None) or (None, plan)"""
+        logger.debug("Processing: %s", user_input)
+        
+        # Extract place from input
+        with STAGE_SECONDS.time('extract_place'):
+            place = self.extract_place(user_input)
         
         if not place:
-            return "I couldn't determine which place you're interested in. Please specify a location like 'Paris' or 'What to see in London?'"
+            return "I couldn't determine which place you're interested in. Please specify a location like 'Paris' or 'What to see in London?'", None
+        
+        logger.debug("Identified place: %s", place)
         
-        print(f"📍 Identified place: {place}")
+        # The intent needs only the message, so the plan is known before geocoding
+        plan = self._plan(user_input, place)
         
         # Get coordinates for the place
-        coordinates = self.geocoding_service.get_coordinates(place)
+        with STAGE_SECONDS.time('geocode'):
+            coordinates = self.geocoding_service.get_coordinates(place)
         
         if not coordinates:
-            return f"It doesn't know this place exist."
+            return f"It doesn't know this place exist.", None
         
+        plan['coordinates'] = coordinates
+        return None, plan
+    
+    def _plan(self, user_input: str, place: str, coordinates: Optional[Tuple[float, float]] = None) -> Dict:
+        """Decide which agents to run for a place; coordinates are filled in once it is geocoded"""
         # Analyze user intent
-        intent = self.analyze_intent(user_input)
-        print(f"🎯 Detected intent: {intent}")
-        
-        # Execute appropriate agents based on intent
-        results = []
-        weather_result = None
-        places_result = None
+        with STAGE_SECONDS.time('analyze_intent'):
+            intent = self.analyze_intent(user_input)
+        logger.debug("Detected intent: %s", intent)
         
+        run_weather, run_places = self._select_agents(user_input, intent)
+        return {
+            'place': place,
+            'coordinates': coordinates,
+            'intent': intent,
+            'run_weather': run_weather,
+            'run_places': run_places,
+            'categories': self.place_categories(user_input, place) if run_places else None
+        }
+    
+    def _structured_agents(self, plan: Dict, fields: Optional[Iterable[str]]) -> Tuple[bool, bool]:
+        """(run_weather, run_places) for a structured request"""
+        if fields is None:
+            return plan['run_weather'], plan['run_places']
+        text = 'response' in fields
+        return ('weather' in fields or (text and plan['run_weather']),
+                'places' in fields or (text and plan['run_places']))
+    
+    def _structured_reply(self, reply: str, fields: Optional[Iterable[str]]) -> Dict:
+        """Structured form of an early reply (no place found, or it could not be geocoded)"""
+        payload = {'response': reply} if fields is None or 'response' in fields else {}
+        payload['errors'] = {'place': reply}
+        return payload
+    
+    def _structured_payload(self, plan: Dict, fields: Optional[Iterable[str]], places_limit: Optional[int],
+                            weather_result: Optional[WeatherResult], places_result: Optional[PlacesResult]) -> Dict:
+        """Serialize only the requested fields; agents that did not run are null"""
+        fields = STRUCTURED_FIELDS if fields is None else fields
+        payload = {}
+        errors = {}
+        if 'place' in fields:
+            payload['place'] = plan['place']
+        if 'coordinates' in fields:
+            lat, lon = plan['coordinates']
+            payload['coordinates'] = {'lat': lat, 'lon': lon}
+        if 'weather' in fields:
+            weather = weather_result.weather if weather_result and not weather_result.error else None
+            payload['weather'] = weather.as_dict() if weather else None
+            if weather_result and weather is None:
+                errors['weather'] = self._format_weather(weather_result)
+        if 'places' in fields:
+            payload['places'] = None
+            if places_result and places_result.error:
+                errors['places'] = places_result.error
+            elif places_result:
+                payload['places'] = [attraction.as_dict() for attraction in places_result.attractions[:places_limit]]
+        if 'response' in fields:
+            # The text covers what the message asked for, like process_request
+            payload['response'] = self._format_response(plan['place'], plan['intent'],
+                                                        weather_result if plan['run_weather'] else None,
+                                                        places_result if plan['run_places'] else None)
+        if errors:
+            payload['errors'] = errors
+        return payload
+    
+    def _select_agents(self, user_input: str, intent: Dict[str, bool]) -> Tuple[bool, bool]:
+        """Decide which agents to run; returns (run_weather, run_places)"""
         # If no specific intent detected, check for trip planning keywords
         if not any([intent['weather'], intent['places'], intent['both']]):
             # Check if it's a general trip planning query
-            input_lower = user_input.lower()
-            if any(phrase in input_lower for phrase in ['plan', 'trip', 'going to go to']):
-                print("🔍 Detected trip planning query, fetching places...")
-                places_result = self.places_agent.execute(place, coordinates)
-                results.append(places_result)
+            if _TRIP_PLANNING_MATCHER.search(user_input.lower()):
+                logger.debug("Detected trip planning query, fetching places")
+                return False, True
+            # Default: fetch both
+            logger.debug("No specific intent detected, fetching both weather and places")
+            return True, True
+        
+        # Handle specific intents
+        return intent['weather'] or intent['both'], intent['places'] or intent['both']
+    
+    def _run_agents(self, place: str, coordinates: Tuple[float, float], run_weather: bool, run_places: bool,
+                    categories: Optional[Tuple[str, ...]] = None
+                    ) -> Tuple[Optional[WeatherResult], Optional[PlacesResult]]:
+        """Run the selected agents, concurrently when enabled"""
+        results = dict(self._iter_agents(place, coordinates, run_weather, run_places, categories))
+        return results.get('weather'), results.get('places')
+    
+    def _iter_agents(self, place: str, coordinates: Tuple[float, float], run_weather: bool, run_places: bool,
+                     categories: Optional[Tuple[str, ...]] = None
+                     ) -> Iterator[Tuple[str, Union[WeatherResult, PlacesResult]]]:
+        """Yield (agent, result) as each selected agent finishes or misses its deadline.
+        
+        Agents whose answer is already cached are answered inline; only the others are dispatched.
+        """
+        uncached = []
+        for agent, result in self._cached_results(place, coordinates, run_weather, run_places, categories):
+            if result is None:
+                uncached.append(agent)
             else:
-                # Default: fetch both
-                print("🔍 No specific intent detected, fetching both weather and places...")
-                weather_result = self.weather_agent.execute(place, coordinates)
-                places_result = self.places_agent.execute(place, coordinates)
-                results.extend([weather_result, places_result])
-        else:
-            # Handle specific intents
-            if intent['weather'] or intent['both']:
-                print("🌤️ Fetching weather data...")
-                weather_result = self.weather_agent.execute(place, coordinates)
-                results.append(weather_result)
-            
-            if intent['places'] or intent['both']:
-                print("🏛️ Fetching tourist places...")
-                places_result = self.places_agent.execute(place, coordinates)
-                results.append(places_result)
+                yield agent, result
+        
+        if not CONFIG['CONCURRENT_AGENTS']:
+            if 'weather' in uncached:
+                logger.debug("Fetching weather data")
+                yield 'weather', self.weather_agent.execute_uncached(place, coordinates)
+            if 'places' in uncached:
+                logger.debug("Fetching tourist places")
+                yield 'places', self.places_agent.execute_uncached(place, coordinates, categories)
+            return
         
-        # Format the response based on the examples
-        if intent['both'] or (weather_result and places_result):
+        # Dispatch both agents at once so a slow Overpass call overlaps the weather lookup
+        started = time.monotonic()
+        pending = {}
+        if 'weather' in uncached:
+            logger.debug("Fetching weather data")
+            pending[self._executor.submit(self.weather_agent.execute_uncached, place, coordinates)] = 'weather'
+        if 'places' in uncached:
+            logger.debug("Fetching tourist places")
+            pending[self._executor.submit(self.places_agent.execute_uncached, place, coordinates, categories)] = 'places'
+        deadlines = {'weather': started + CONFIG['WEATHER_DEADLINE'], 'places': started + CONFIG['PLACES_DEADLINE']}
+        
+        while pending:
+            next_deadline = min(deadlines[agent] for agent in pending.values())
+            done, _ = wait(pending, timeout=max(0.0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future in list(pending):
+                agent = pending[future]
+                if future in done or deadlines[agent] <= now:
+                    del pending[future]
+                    # A finished future returns at once; an overdue one yields the timeout message
+                    yield agent, self._wait_for(future, now, agent, place)
+    
+    def _cached_results(self, place: str, coordinates: Tuple[float, float], run_weather: bool, run_places: bool,
+                        categories: Optional[Tuple[str, ...]] = None
+                        ) -> Iterator[Tuple[str, Union[WeatherResult, PlacesResult, None]]]:
+        """(agent, result) for each selected agent, with None for those whose answer is not cached"""
+        if run_weather:
+            started = time.perf_counter()
+            _, weather = self.weather_agent.probe(coordinates)
+            if weather is MISS:
+                yield 'weather', None
+            else:
+                # execute_uncached() times the misses
+                STAGE_SECONDS.observe(time.perf_counter() - started, 'weather')
+                yield 'weather', WeatherResult(place, weather)
+        if run_places:
+            _, attractions = self.places_agent.probe(coordinates, categories)
+            yield 'places', None if attractions is MISS else PlacesResult(place, attractions)
+    
+    def _wait_for(self, future, deadline: float, agent: str, place: str) -> Union[WeatherResult, PlacesResult]:
+        """Wait for an agent until its deadline, returning a fallback message if it misses it"""
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            # The agent keeps running in the pool; we just stop waiting for it
+            timeout_message = self._timeout_message(agent, place)
+            logger.info("%s", timeout_message)
+            return self._error_result(agent, place, timeout_message)
+        except Exception as e:
+            return self._error_result(agent, place, f"Error running agent: {e}")
+    
+    def _timeout_message(self, agent: str, place: str) -> str:
+        if agent == 'weather':
+            return f"Weather data for {place} is taking too long to load, please try again shortly."
+        return f"Tourist attractions for {place} are taking too long to load, please try again shortly."
+    
+    def _error_result(self, agent: str, place: str, message: str) -> Union[WeatherResult, PlacesResult]:
+        if agent == 'weather':
+            return WeatherResult(place, error=message)
+        return PlacesResult(place, error=message)
+    
+    def _format_result(self, result: Union[WeatherResult, PlacesResult]) -> str:
+        if isinstance(result, WeatherResult):
+            return self._format_weather(result)
+        return self._format_places(result)
+    
+    def _format_weather(self, result: WeatherResult) -> str:
+        if result.error:
+            return result.error
+        weather = result.weather
+        if weather is None:
+            return f"Unable to fetch weather data for {result.place}."
+        temp = 'N/A' if weather.temperature is None else weather.temperature
+        return f"In {result.place} it's currently {temp}°C with a chance of {weather.precipitation_probability}% to rain."
+    
+    def _format_places(self, result: PlacesResult) -> str:
+        if result.error:
+            return result.error
+        if not result.attractions:
+            return f"No tourist attractions found for {result.place}."
+        # Format: "In {place} these are the places you can go," (comma, no bullets for single query)
+        places_list = "\n\n".join(attraction.name for attraction in result.attractions[:5])
+        return f"In {result.place} these are the places you can go,\n\n{places_list}"
+    
+    def _format_response(self, place: str, intent: Dict[str, bool],
+                         weather_result: Optional[WeatherResult], places_result: Optional[PlacesResult]) -> str:
+        """Render the agents' results as the reply text, once, based on the examples"""
+        weather_text = self._format_weather(weather_result) if weather_result else None
+        
+        if weather_result and places_result:
             # Combined response format: "In X it's... And these are the places..."
-            if weather_result and places_result:
+            if places_result.attractions and not places_result.error:
                 # For combined queries, format with bullets and colon
-                if f"In {place} these are the places you can go," in places_result:
-                    # Extract places list (remove the header)
-                    places_text = places_result.replace(f"In {place} these are the places you can go,\n\n", "")
-                    # Format with bullets for combined query
-                    places_lines = [line.strip() for line in places_text.split("\n\n") if line.strip()]
-                    places_list = "\n".join([f"• {p}" for p in places_lines[:5]])
-                    places_formatted = f"And these are the places you can go:\n{places_list}"
-                else:
-                    places_formatted = places_result
-                
-                # Combine with proper spacing
-                return f"{weather_result} {places_formatted}"
+                places_list = "\n".join(f"• {attraction.name}" for attraction in places_result.attractions[:5])
+                return f"{weather_text} And these are the places you can go:\n{places_list}"
+            # Combine with proper spacing
+            return f"{weather_text} {self._format_places(places_result)}"
         
-        # Return single result or combined results
-        return " ".join(results)
+        # Return single result
+        if weather_result:
+            return weather_text
+        return self._format_places(places_result) if places_result else ""
 
 def main():
     """Main application loop"""